@@ -12,7 +12,7 @@ https://docs.djangoproject.com/en/4.0/ref/settings/
 
 from pathlib import Path
 
-from decouple import config
+from decouple import Csv, config
 
 import dj_database_url
 import os
@@ -49,9 +49,11 @@ INSTALLED_APPS = [
 
     'rest_framework',
     'account',
+    'esusu',
 ]
 
 MIDDLEWARE = [
+    'helpers.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -64,8 +66,127 @@ MIDDLEWARE = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
-    )
+        'account.authentication.ClaimsJWTAuthentication',
+    ),
+    'DEFAULT_THROTTLE_CLASSES': (
+        'account.throttling.IPThrottle',
+        'account.throttling.EmailThrottle',
+        'account.throttling.UserThrottle',
+    ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'helpers.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'helpers.parsers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
+    # Proxies in front of the app that append to X-Forwarded-For, so
+    # IPThrottle keys on the address the nearest one saw (Heroku's router is
+    # one). Left unset DRF keys on the whole header, which clients make up.
+    'NUM_PROXIES': config('NUM_PROXIES', default=1 if 'DYNO' in os.environ else 0, cast=int),
+}
+
+# Serve the account endpoints that have one with their async variant, see
+# account.async_views. Credity.asgi turns it on.
+ASYNC_VIEWS = config('ASYNC_VIEWS', default=False, cast=bool)
+
+# Under ASGI, the same middleware with hooks that run on the event loop
+# rather than on a thread each, see helpers.middleware
+if ASYNC_VIEWS:
+    MIDDLEWARE = [
+        'helpers.metrics.MetricsMiddleware',
+        'helpers.middleware.SecurityMiddleware',
+        'helpers.staticfiles.WhiteNoiseMiddleware',
+        'helpers.middleware.SessionMiddleware',
+        'helpers.middleware.CommonMiddleware',
+        'helpers.middleware.CsrfViewMiddleware',
+        'helpers.middleware.AuthenticationMiddleware',
+        'helpers.middleware.MessageMiddleware',
+        'helpers.middleware.XFrameOptionsMiddleware',
+    ]
+
+# Token bucket rates per view throttle_scope and client key, see
+# account.throttling. Use SharedMemoryBucketStore to share the counts between
+# the gunicorn workers on a host. THROTTLE_ENABLED=False turns them off, for
+# load tests that come from a single address.
+ACCOUNT_THROTTLE = {
+    'BACKEND': config('THROTTLE_BACKEND', default='account.throttling.LocalBucketStore'),
+    'RATES': {
+        'token_ip': '30/min',
+        'token_email': '10/min',
+        'register_ip': '10/min',
+        'change_auth_ip': '30/min',
+        'change_auth_user': '5/min',
+    } if config('THROTTLE_ENABLED', default=True, cast=bool) else {},
+}
+
+SIMPLE_JWT = {
+    'TOKEN_OBTAIN_SERIALIZER': 'account.serializers.TokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'account.serializers.TokenRefreshSerializer',
+}
+
+# Revoked tokens are checked in memory (see account.revocation); each worker
+# polls for revocations made by the others this often, in seconds.
+TOKEN_REVOCATION = {
+    'POLL_INTERVAL': config('TOKEN_REVOCATION_POLL_INTERVAL', default=5.0, cast=float),
+}
+
+# Nothing of ours uses the default cache, Django only requires one: auth
+# versions go out through the revocations (see account.revocation), which
+# every worker polls. "responses" holds rendered per-user read responses (see
+# account.response_cache), bounded by entries and bytes with the least
+# recently used evicted first. For one cache shared by the workers of a host,
+# a local stand-in for Redis or Memcached, set RESPONSE_CACHE_BACKEND to
+# django.core.cache.backends.filebased.FileBasedCache and
+# RESPONSE_CACHE_LOCATION to a directory, in /dev/shm preferably.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'responses': {
+        'BACKEND': config('RESPONSE_CACHE_BACKEND', default='helpers.cache.BoundedLocMemCache'),
+        'LOCATION': config('RESPONSE_CACHE_LOCATION', default='responses'),
+        # Entries are keyed by version and never go stale, this only bounds
+        # how long an unused one is kept
+        'TIMEOUT': config('RESPONSE_CACHE_TIMEOUT', default=3600, cast=int),
+        'OPTIONS': {
+            'MAX_ENTRIES': config('RESPONSE_CACHE_MAX_ENTRIES', default=10000, cast=int),
+            # BoundedLocMemCache only
+            'MAX_BYTES': config('RESPONSE_CACHE_MAX_BYTES', default=4 * 1024 * 1024, cast=int),
+        },
+    },
+}
+
+# Per-route request metrics (see helpers.metrics), served at /metrics to
+# staff users, ALLOWED_IPS, and requests with an X-Metrics-Token header.
+METRICS = {
+    # Where workers dump their samples to be merged; None for a directory in
+    # /dev/shm shared by the workers of one gunicorn master. Dumps of dead
+    # workers are removed by pid, so it must be local to the host.
+    'DIRECTORY': config('METRICS_DIR', default=None),
+    'FLUSH_INTERVAL': config('METRICS_FLUSH_INTERVAL', default=10.0, cast=float),
+    # Matched against REMOTE_ADDR, so empty by default: behind the local
+    # reverse proxy every request comes from the loopback address.
+    'ALLOWED_IPS': config('METRICS_ALLOWED_IPS', default='', cast=Csv()),
+    'TOKEN': config('METRICS_TOKEN', default=''),
+}
+
+# Bulk contributions (see esusu.importers): the most items one request may
+# post, and how many are validated and written per transaction.
+ESUSU_CONTRIBUTIONS = {
+    'MAX_ITEMS': config('ESUSU_CONTRIBUTIONS_MAX_ITEMS', default=10000, cast=int),
+    'CHUNK_SIZE': config('ESUSU_CONTRIBUTIONS_CHUNK_SIZE', default=2000, cast=int),
+}
+
+# How postings move the balance snapshots (see esusu.ledger): LockedSnapshots,
+# ShardedSnapshots for pots a whole group pays into at once before a
+# deadline, or VersionedSnapshots. OPTIONS go to the class, e.g. shards or
+# retries.
+ESUSU_LEDGER = {
+    'SNAPSHOTS': config('ESUSU_SNAPSHOTS', default='esusu.ledger.LockedSnapshots'),
+    'OPTIONS': {},
 }
 
 # Whitenoise gzip compression support
@@ -118,6 +239,11 @@ if os.environ.get('GITHUB_WORKFLOW'):
         }
     }
 
+# Any other database as a URL, e.g. sqlite:////tmp/credity.sqlite3 for the
+# load tests in benchmarks.loadtest
+if config('DATABASE_URL', default='') and 'DYNO' not in os.environ:
+    DATABASES['default'] = dj_database_url.parse(config('DATABASE_URL'), conn_max_age=600)
+
 # Check if running on heroku and set the database accordingly
 # Can use any environment variable but DYNO seems to be the most heroku-specific
 if 'DYNO' in os.environ:
@@ -143,9 +269,44 @@ AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'account.validators.PunctuationValidator',
     },
+    {
+        'NAME': 'account.validators.BreachedPasswordValidator',
+        'OPTIONS': {
+            # A filter built with `manage.py build_password_filter`, the
+            # bundled list of common passwords by default
+            'path': config('PASSWORD_FILTER_PATH', default=None),
+        },
+    },
 ]
 
 
+# Password hashing
+# https://docs.djangoproject.com/en/4.0/topics/auth/passwords/
+
+PASSWORD_HASHERS = [
+    'account.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
+# Hashing runs in a per-worker process pool (see account.hashers). By default
+# the host's cores are split between the gunicorn workers; 0 hashes inline.
+PASSWORD_HASH_POOL_SIZE = config(
+    'PASSWORD_HASH_POOL_SIZE',
+    default=max(1, (os.cpu_count() or 1) // config('WEB_CONCURRENCY', default=1, cast=int)),
+    cast=int,
+)
+
+PASSWORD_HASHING = {
+    'ITERATIONS': config('PASSWORD_HASH_ITERATIONS', default=320000, cast=int),
+    'POOL_SIZE': PASSWORD_HASH_POOL_SIZE,
+    'MAX_PENDING': config('PASSWORD_HASH_MAX_PENDING', default=4 * max(1, PASSWORD_HASH_POOL_SIZE), cast=int),
+    'TIMEOUT': config('PASSWORD_HASH_TIMEOUT', default=10.0, cast=float),
+}
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/4.0/topics/i18n/
 
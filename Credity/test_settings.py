@@ -0,0 +1,25 @@
+"""
+Settings for the test suite, used by `manage.py test` unless
+DJANGO_SETTINGS_MODULE says otherwise. The database is the one the regular
+settings pick (DATABASE_URL, the CI Postgres, ...).
+"""
+import tempfile
+
+from Credity.settings import *  # noqa: F401,F403
+
+
+# Hashing dominates the suite. A single PBKDF2 iteration, computed inline
+# instead of in a process pool, keeps the real hasher and hashing service
+# code paths at a fraction of the cost. Tests of the work factor or the
+# pool override these.
+PASSWORD_HASHING = {
+    **PASSWORD_HASHING,
+    'ITERATIONS': 1,
+    'POOL_SIZE': 0,
+}
+
+# Keep worker dumps out of the directory shared with a running server
+METRICS = {
+    **METRICS,
+    'DIRECTORY': tempfile.mkdtemp(prefix='credity-test-metrics-'),
+}
@@ -15,8 +15,11 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
+from helpers.views import MetricsView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/account/', include("account.urls")),
+    path('api/esusu/', include("esusu.urls")),
+    path('metrics', MetricsView.as_view(), name="metrics"),
 ]
@@ -0,0 +1,75 @@
+"""
+Async variants of the account endpoints, which account.urls routes to under
+ASGI (see Credity.asgi). They answer exactly like their counterparts in
+account.views, whose permissions, throttle scopes and query budgets they
+inherit; what differs is that no request holds a thread while it waits.
+
+Django 4.0 has no async ORM, so queries go through
+database_sync_to_async(), which is what its async querysets come down to in
+later versions too. Registering hashes the password in the hashing
+service's processes with the event loop awaiting the result. Changing the
+password checks the old one while loading the user, on the request's
+thread.
+"""
+from django.utils.cache import get_conditional_response
+from rest_framework import response, status
+
+from account import views
+from account.serializers import ChangeAuthSerializer, DeleteSerializer, RegisterSerializer, UpdateSerializer
+from account.views import user_validators
+from helpers.async_views import AsyncAPIView
+from helpers.database import database_sync_to_async
+
+
+class AsyncRegisterAPIView(AsyncAPIView, views.RegisterAPIView):
+
+    async def post(self, request):
+        serializer = RegisterSerializer(data=request.data, context=self.get_serializer_context())
+        serializer.is_valid(raise_exception=True)
+        await serializer.asave()
+        return response.Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+class AsyncDetailAPIView(AsyncAPIView, views.DetailAPIView):
+
+    async def get(self, request):
+        # Served from the token's claims or the response cache, nothing blocks
+        return super().get(request)
+
+
+class AsyncUpdateAPIView(AsyncAPIView, views.UpdateAPIView):
+
+    async def put(self, request):
+        user = request.user
+        etag, last_modified = user_validators(user)
+        conditional = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if conditional is not None:
+            return conditional
+
+        serializer = UpdateSerializer(user, data=request.data)
+
+        if serializer.is_valid():
+            return await database_sync_to_async(self.save)(request, serializer)
+        return response.Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class AsyncChangeAuthView(AsyncAPIView, views.ChangeAuthView):
+
+    async def put(self, request):
+        serializer = ChangeAuthSerializer(request.user, data=request.data)
+
+        if await database_sync_to_async(serializer.is_valid)():
+            await database_sync_to_async(serializer.save)()
+            return response.Response({"message": "Success"})
+        return response.Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class AsyncDeleteAPIView(AsyncAPIView, views.DeleteAPIView):
+
+    async def delete(self, request):
+        serializer = DeleteSerializer(request.user)
+
+        if serializer.is_valid():
+            await database_sync_to_async(serializer.save)()
+            return response.Response(status=status.HTTP_204_NO_CONTENT)
+        return response.Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
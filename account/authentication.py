@@ -0,0 +1,126 @@
+import datetime
+
+from django.utils.functional import LazyObject, empty
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+
+from account.revocation import get_revocations
+from helpers.database import database_sync_to_async
+
+
+# User fields copied into every token, enough to serve read-only endpoints
+# without loading the user.
+USER_CLAIMS = ("email", "first_name", "last_name", "is_active", "auth_version")
+
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def to_microseconds(value):
+    # Exact, unlike datetime.timestamp(), so ETags made from the claim and
+    # from the row agree
+    return (value - EPOCH) // datetime.timedelta(microseconds=1)
+
+
+def add_user_claims(token, user):
+    for claim in USER_CLAIMS:
+        token[claim] = getattr(user, claim)
+    # For conditional requests, see account.views.user_validators
+    token["updated_at"] = to_microseconds(user.updated_at)
+    return token
+
+
+class LazyUser(LazyObject):
+    """
+    request.user backed by token claims. Claimed attributes are answered from
+    the token; anything else (saving, checking the password, ...) loads the
+    user from the database first.
+    """
+
+    def __init__(self, user_class, claims, loader):
+        self.__dict__["_user_class"] = user_class
+        self.__dict__["_claims"] = claims
+        self.__dict__["_loader"] = loader
+        super().__init__()
+
+    def _setup(self):
+        self._wrapped = self._loader()
+
+    def __getattr__(self, name):
+        if self._wrapped is empty and name in self._claims:
+            return self._claims[name]
+        return super().__getattr__(name)
+
+    def __bool__(self):
+        return True
+
+    # isinstance() checks (DRF does them while serializing) shouldn't load the user
+    @property
+    def __class__(self):
+        if self._wrapped is empty:
+            return self._user_class
+        return self._wrapped.__class__
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that builds request.user from the token's claims
+    instead of querying for it on every request.
+
+    A token is stale once its auth_version is behind the user's, which is
+    bumped by every account write. Writes record the new version with the
+    revocations (see account.revocation.Revocations.mark_stale), so stale
+    tokens are rejected up front by the worker that made the change at once,
+    and by every other worker from its next poll, within POLL_INTERVAL
+    seconds. Until then they're answered from their claims, but rejected
+    whenever the user is loaded, as it is by every write. Revoked tokens are
+    rejected before anything else.
+    """
+
+    def get_user(self, validated_token):
+        revocations = get_revocations()
+        if revocations.is_revoked(validated_token):
+            raise AuthenticationFailed(_("Token has been revoked"), code="token_revoked")
+
+        if "auth_version" not in validated_token:
+            # Issued before tokens carried claims.
+            return super().get_user(validated_token)
+
+        user_id = validated_token[api_settings.USER_ID_CLAIM]
+        if revocations.is_stale(validated_token):
+            raise AuthenticationFailed(_("Token is stale"), code="token_stale")
+        if not validated_token["is_active"]:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        claims = {claim: validated_token[claim] for claim in USER_CLAIMS}
+        if "updated_at" in validated_token:
+            claims["updated_at"] = EPOCH + datetime.timedelta(microseconds=validated_token["updated_at"])
+        claims.update(id=user_id, pk=user_id, is_authenticated=True, is_anonymous=False)
+        return LazyUser(self.user_model, claims, lambda: self.load_user(validated_token))
+
+    async def authenticate_async(self, request):
+        """
+        authenticate() for async views. Tokens with claims need no query
+        except for the periodic revocation poll, which runs on a thread.
+        """
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+
+        revocations = get_revocations()
+        if "auth_version" not in validated_token:
+            return await database_sync_to_async(self.get_user)(validated_token), validated_token
+        if revocations.sync_due():
+            await database_sync_to_async(revocations.sync)()
+        return self.get_user(validated_token), validated_token
+
+    def load_user(self, validated_token):
+        user = super().get_user(validated_token)
+        if user.auth_version != validated_token["auth_version"]:
+            raise AuthenticationFailed(_("Token is stale"), code="token_stale")
+        return user
@@ -0,0 +1,267 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+
+import django
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from helpers import metrics
+
+
+logger = logging.getLogger(__name__)
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    """
+    PBKDF2 hasher whose work factor comes from settings. Raising
+    PASSWORD_HASHING["ITERATIONS"] makes must_update() true for older hashes,
+    so they get rehashed the next time their owner logs in.
+    """
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_HASHING["ITERATIONS"]
+
+
+class HashingServiceBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "The server is busy, please try again shortly."
+    default_code = "hashing_service_busy"
+
+
+def _setup_worker(settings_module):
+    # Forked workers inherit configured settings, spawned ones have to load them.
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", settings_module)
+    django.setup()
+
+
+def _make_password(password, salt):
+    return hashers.make_password(password, salt)
+
+
+def _check_password(password, encoded):
+    return hashers.check_password(password, encoded)
+
+
+class HashingService:
+    """
+    Runs password hashing in a bounded process pool so the request thread only
+    waits on the result instead of burning its own CPU.
+
+    At most `max_pending` calls may be queued or running at once; callers that
+    can't get a slot within `timeout` seconds get HashingServiceBusy (503).
+    A pool size of 0 hashes inline in the calling thread.
+    """
+
+    def __init__(self, pool_size, max_pending, timeout):
+        self.pool_size = pool_size
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.calls = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.pool_size,
+                    initializer=_setup_worker,
+                    initargs=(os.environ.get("DJANGO_SETTINGS_MODULE", "Credity.settings"),),
+                )
+            return self._executor
+
+    def _record(self, name, elapsed):
+        with self._lock:
+            self.calls += 1
+            self.total_time += elapsed
+            self.max_time = max(self.max_time, elapsed)
+        metrics.record_phase("password_hashing", elapsed)
+        logger.debug("%s took %.1fms", name, elapsed * 1000)
+
+    def _submit(self, func, *args):
+        # Submit a call holding a slot. The slot is given back once the call
+        # is done, not when its caller stops waiting: cancelling only stops
+        # calls that haven't started, so one that timed out keeps its slot
+        # until it has actually finished.
+        try:
+            future = self._get_executor().submit(func, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda future: self._slots.release())
+        return future
+
+    def run(self, func, *args):
+        start = time.perf_counter()
+        if not self.pool_size:
+            try:
+                return func(*args)
+            finally:
+                self._record(func.__name__, time.perf_counter() - start)
+
+        if not self._slots.acquire(timeout=self.timeout):
+            raise HashingServiceBusy()
+        try:
+            future = self._submit(func, *args)
+            try:
+                return future.result(timeout=self.timeout)
+            except TimeoutError:
+                future.cancel()
+                raise HashingServiceBusy()
+        finally:
+            self._record(func.__name__, time.perf_counter() - start)
+
+    async def arun(self, func, *args):
+        """
+        run() for async callers. The event loop waits on the pool without
+        blocking, or on a thread when hashing inline.
+        """
+        start = time.perf_counter()
+        if not self.pool_size:
+            try:
+                return await sync_to_async(func, thread_sensitive=False)(*args)
+            finally:
+                self._record(func.__name__, time.perf_counter() - start)
+
+        # Only wait for a slot on a thread when there isn't one free
+        if not self._slots.acquire(blocking=False):
+            if not await sync_to_async(self._slots.acquire, thread_sensitive=False)(timeout=self.timeout):
+                raise HashingServiceBusy()
+        try:
+            future = self._submit(func, *args)
+            try:
+                return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+            except asyncio.TimeoutError:
+                future.cancel()
+                raise HashingServiceBusy()
+        finally:
+            self._record(func.__name__, time.perf_counter() - start)
+
+    def map(self, func, *iterables):
+        """
+        Run func over the argument lists across the whole pool and return the
+        results as a list. The batch holds a single slot.
+        """
+        start = time.perf_counter()
+        if not self.pool_size:
+            try:
+                return list(map(func, *iterables))
+            finally:
+                self._record(func.__name__, time.perf_counter() - start)
+
+        if not self._slots.acquire(timeout=self.timeout):
+            raise HashingServiceBusy()
+        try:
+            chunksize = max(1, len(iterables[0]) // (4 * self.pool_size))
+            return list(self._get_executor().map(func, *iterables, chunksize=chunksize))
+        finally:
+            self._slots.release()
+            self._record(func.__name__, time.perf_counter() - start)
+
+    def reset(self):
+        """
+        Drop the pool without waiting on it. Called in forked children, which
+        can't use the parent's worker processes.
+        """
+        self._executor = None
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(cancel_futures=True)
+                self._executor = None
+
+
+_service = None
+
+
+def get_hashing_service():
+    global _service
+    if _service is None:
+        config = settings.PASSWORD_HASHING
+        _service = HashingService(
+            pool_size=config["POOL_SIZE"],
+            max_pending=config["MAX_PENDING"],
+            timeout=config["TIMEOUT"],
+        )
+    return _service
+
+
+@receiver(setting_changed)
+def reset_hashing_service(*, setting, **kwargs):
+    global _service
+    if setting == "PASSWORD_HASHING" and _service is not None:
+        _service.shutdown()
+        _service = None
+
+
+def _reset_after_fork():
+    if _service is not None:
+        _service.reset()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def make_password(password, salt=None):
+    """
+    Same as django.contrib.auth.hashers.make_password, computed in the pool.
+    """
+    if password is None:
+        return hashers.make_password(None)
+    return get_hashing_service().run(_make_password, password, salt)
+
+
+async def amake_password(password, salt=None):
+    """
+    make_password() for async callers, see HashingService.arun().
+    """
+    if password is None:
+        return hashers.make_password(None)
+    return await get_hashing_service().arun(_make_password, password, salt)
+
+
+def make_passwords(passwords):
+    """
+    Hash many passwords at once, spread over the whole pool.
+    """
+    passwords = list(passwords)
+    if not passwords:
+        return []
+    return get_hashing_service().map(_make_password, passwords, [None] * len(passwords))
+
+
+def check_password(password, encoded, setter=None):
+    """
+    Same as django.contrib.auth.hashers.check_password, computed in the pool.
+    The setter is called in the calling process when the hash needs upgrading.
+    """
+    if password is None or not hashers.is_password_usable(encoded):
+        return False
+    try:
+        hasher = hashers.identify_hasher(encoded)
+    except ValueError:
+        return False
+
+    is_correct = get_hashing_service().run(_check_password, password, encoded)
+
+    if setter and is_correct:
+        preferred = hashers.get_hasher("default")
+        if hasher.algorithm != preferred.algorithm or preferred.must_update(encoded):
+            setter(password)
+    return is_correct
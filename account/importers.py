@@ -0,0 +1,153 @@
+import csv
+import json
+import time
+from itertools import islice
+
+from django.db.models.functions import Lower
+
+from account import hashers
+from account.models import User
+from account.password_policy import get_password_policy
+from account.serializers import RegisterSerializer
+
+
+FORMATS = ("csv", "ndjson")
+
+
+def read_rows(stream, format):
+    """
+    Lazily parse a text stream of users, one dict per row. Rows that can't be
+    parsed at all are yielded as the exception instead.
+    """
+    if format == "csv":
+        yield from csv.DictReader(stream)
+    elif format == "ndjson":
+        for line in stream:
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield e
+                continue
+            yield row if isinstance(row, dict) else ValueError("Expected a JSON object")
+    else:
+        raise ValueError(f"Unsupported format {format!r}, expected one of {', '.join(FORMATS)}")
+
+
+def guess_format(filename):
+    return "ndjson" if filename.endswith((".ndjson", ".jsonl")) else "csv"
+
+
+class ImportReport:
+
+    def __init__(self, max_errors):
+        self.max_errors = max_errors
+        self.rows = 0
+        self.created = 0
+        self.failed = 0
+        self.errors = []
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def add_error(self, row_number, errors):
+        self.failed += 1
+        # Keep memory bounded however bad the file is
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"row": row_number, "errors": errors})
+
+    def as_dict(self):
+        return {
+            "rows": self.rows,
+            "created": self.created,
+            "failed": self.failed,
+            "seconds": round(self.elapsed, 3),
+            "rows_per_second": round(self.rows / self.elapsed, 1) if self.elapsed else None,
+            "errors": self.errors,
+        }
+
+
+def import_users(rows, chunk_size=1000, max_errors=1000):
+    """
+    Validate and create users from an iterable of row dicts, chunk_size rows
+    at a time, so memory stays bounded whatever the number of rows. Invalid
+    rows are reported without stopping the import.
+    """
+    report = ImportReport(max_errors)
+    rows = enumerate(rows, start=1)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        _import_chunk(chunk, report, chunk_size)
+    report.elapsed = time.perf_counter() - report.started
+    return report
+
+
+def _import_chunk(chunk, report, batch_size):
+    report.rows += len(chunk)
+    email_field = User._meta.get_field("email")
+    unique_message = email_field.error_messages["unique"] % {
+        "model_name": User._meta.verbose_name,
+        "field_label": email_field.verbose_name,
+    }
+
+    parsed = []
+    invalid = []
+    for row_number, row in chunk:
+        if isinstance(row, Exception):
+            invalid.append((row_number, {"non_field_errors": [str(row)]}))
+            continue
+        serializer = RegisterSerializer(data=row, context={"defer_password_validation": True})
+        if not serializer.is_valid():
+            invalid.append((row_number, serializer.errors))
+            continue
+        parsed.append((row_number, serializer.validated_data))
+
+    # The password policy checks the whole chunk in one go
+    violations = get_password_policy().validate_many(data["password"] for _, data in parsed)
+    for (row_number, _), errors in zip(parsed, violations):
+        if errors:
+            invalid.append((row_number, {"password": [message for error in errors for message in error.messages]}))
+    for row_number, errors in sorted(invalid, key=lambda failure: failure[0]):
+        report.add_error(row_number, errors)
+
+    valid = {}
+    for (row_number, data), errors in zip(parsed, violations):
+        if errors:
+            continue
+        data["email"] = User.objects.normalize_email(data["email"])
+        # Emails are unique regardless of case
+        key = data["email"].lower()
+        if key in valid:
+            report.add_error(row_number, {"email": [unique_message]})
+            continue
+        valid[key] = (row_number, data)
+
+    # One query per chunk for emails that are already registered
+    taken = User.objects.annotate(email_lower=Lower("email")).filter(email_lower__in=valid)
+    for key in taken.values_list("email_lower", flat=True):
+        if key in valid:
+            row_number, _ = valid.pop(key)
+            report.add_error(row_number, {"email": [unique_message]})
+
+    if not valid:
+        return
+    passwords = hashers.make_passwords(data["password"] for _, data in valid.values())
+    users = [
+        User(email=data["email"], first_name=data["first_name"], last_name=data["last_name"], password=password)
+        for (_, data), password in zip(valid.values(), passwords)
+    ]
+    # Rows that lose a race with a concurrent registration are skipped
+    User.objects.bulk_create(users, batch_size=batch_size, ignore_conflicts=True)
+    # and told apart by their password hashes, salted so that no other row
+    # has the same one
+    inserted = set(
+        User.objects.annotate(email_lower=Lower("email")).filter(email_lower__in=valid)
+        .values_list("email_lower", "password")
+    )
+    for key, user in zip(valid, users):
+        if (key, user.password) in inserted:
+            report.created += 1
+        else:
+            report.add_error(valid[key][0], {"email": [unique_message]})
@@ -0,0 +1,72 @@
+import gzip
+import sys
+from pathlib import Path
+
+import django.contrib.auth
+from django.core.management.base import BaseCommand, CommandError
+
+from account.password_filter import build_filter, error_rate, parameters
+from account.validators import BreachedPasswordValidator
+
+
+# The list CommonPasswordValidator uses
+COMMON_PASSWORDS = Path(django.contrib.auth.__file__).resolve().parent / "common-passwords.txt.gz"
+
+
+class Command(BaseCommand):
+    help = (
+        "Build the breached password filter from a plain text list, one password per line, "
+        "optionally gzipped. The list is streamed, never held in memory."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "source", nargs="?", default=str(COMMON_PASSWORDS),
+            help='Password list, or "-" for standard input. Django\'s common passwords by default.',
+        )
+        parser.add_argument(
+            "--output", default=str(BreachedPasswordValidator.DEFAULT_FILTER_PATH),
+            help="Filter file to write, replaced atomically. Point PASSWORD_FILTER_PATH at it.",
+        )
+        parser.add_argument(
+            "--count", type=int,
+            help="Passwords in the list, to size the filter. Counted in a first pass when not given.",
+        )
+        parser.add_argument("--error-rate", type=float, default=0.001, help="Target false positive rate.")
+
+    def open(self, source):
+        if source == "-":
+            return sys.stdin
+        opener = gzip.open if source.endswith(".gz") else open
+        try:
+            # Leaked lists aren't all valid UTF-8; those lines can't be typed in anyway
+            return opener(source, "rt", encoding="utf-8", errors="replace")
+        except OSError as e:
+            raise CommandError(e)
+
+    def handle(self, *args, **options):
+        source = options["source"]
+        count = options["count"]
+        if count is None:
+            if source == "-":
+                raise CommandError("--count is required when reading standard input")
+            with self.open(source) as stream:
+                count = sum(1 for line in stream if line.strip())
+
+        stream = self.open(source)
+        try:
+            added = build_filter(
+                (line.rstrip("\r\n") for line in stream),
+                options["output"],
+                count,
+                options["error_rate"],
+            )
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        words, bits = parameters(count, options["error_rate"])
+        self.stdout.write(
+            f"Wrote {added} passwords to {options['output']}: {words * 8} bytes of filter, "
+            f"expected false positive rate {error_rate(max(1, added), words, bits):.5f}"
+        )
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from account.exporters import FILTERS, FORMATS, export_users, get_queryset, parse_fields, parse_timestamp
+
+
+class Command(BaseCommand):
+    help = "Export users as CSV or NDJSON, streaming them from the database."
+
+    def add_arguments(self, parser):
+        parser.add_argument("-o", "--output", default="-", help='File to write, or "-" for standard output.')
+        parser.add_argument("--format", choices=FORMATS, default="csv")
+        parser.add_argument("--fields", help="Comma-separated fields to export, all of them by default.")
+        parser.add_argument("--chunk-size", type=int, default=2000, help="Rows fetched from the cursor at a time.")
+        for name in FILTERS:
+            parser.add_argument(f"--{name.replace('_', '-')}", help="ISO 8601 date or datetime.")
+
+    def handle(self, *args, **options):
+        try:
+            fields = parse_fields(options["fields"])
+            filters = {
+                name: parse_timestamp(options[name]) if options[name] else None
+                for name in FILTERS
+            }
+        except ValueError as e:
+            raise CommandError(e)
+
+        chunks = export_users(get_queryset(**filters), fields, options["format"], options["chunk_size"])
+        if options["output"] == "-":
+            for chunk in chunks:
+                self.stdout.write(chunk, ending="")
+        else:
+            with open(options["output"], "w", newline="", encoding="utf-8") as output:
+                output.writelines(chunks)
@@ -0,0 +1,109 @@
+import json
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+# Run in the fresh interpreter: import the application, print how long it took
+SCRIPT = "import time; start = time.perf_counter(); import {module}; print(time.perf_counter() - start)"
+
+
+def parse_importtime(output):
+    """
+    (module, self, cumulative) for each line of `python -X importtime`'s
+    report, times in microseconds.
+    """
+    modules = []
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        try:
+            self_us, cumulative_us, module = line[len("import time:"):].split("|")
+            modules.append((module.strip(), int(self_us), int(cumulative_us)))
+        except ValueError:
+            # The header, or something else writing to stderr
+            continue
+    return modules
+
+
+class Command(BaseCommand):
+    help = (
+        "Time a cold start: import the application in a fresh interpreter under -X importtime "
+        "and report what the import spent its time on. Best of --repeat runs, per module."
+    )
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument("--application", default="Credity.wsgi", help="Module to import, e.g. Credity.asgi.")
+        parser.add_argument("--repeat", type=int, default=3, help="Runs, the fastest of each counting.")
+        parser.add_argument("--limit", type=int, default=25, help="Modules to list, 0 for all.")
+        parser.add_argument(
+            "--sort", choices=("self", "cumulative"), default="self",
+            help="Order by time in the module itself, or including what it imported.",
+        )
+        parser.add_argument(
+            "--by-package", action="store_true",
+            help="Add up the modules' own times by top level package.",
+        )
+        parser.add_argument("--json", action="store_true", help="Print the report as JSON.")
+
+    def run(self, module):
+        start = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", SCRIPT.format(module=module)],
+            cwd=settings.BASE_DIR, capture_output=True, text=True,
+        )
+        process = time.perf_counter() - start
+        if result.returncode:
+            raise CommandError(f"Importing {module} failed:\n{result.stderr.strip().splitlines()[-1]}")
+        return float(result.stdout.strip().splitlines()[-1]), process, parse_importtime(result.stderr)
+
+    def handle(self, *args, **options):
+        application = options["application"]
+        import_seconds = process_seconds = None
+        best = {}
+        for _ in range(max(1, options["repeat"])):
+            imported, process, modules = self.run(application)
+            import_seconds = imported if import_seconds is None else min(import_seconds, imported)
+            process_seconds = process if process_seconds is None else min(process_seconds, process)
+            for module, self_us, cumulative_us in modules:
+                if module in best:
+                    self_us = min(self_us, best[module][0])
+                    cumulative_us = min(cumulative_us, best[module][1])
+                best[module] = (self_us, cumulative_us)
+
+        if options["by_package"]:
+            packages = {}
+            for module, (self_us, _) in best.items():
+                package = module.split(".")[0]
+                packages[package] = packages.get(package, 0) + self_us
+            rows = [(package, self_us, self_us) for package, self_us in packages.items()]
+        else:
+            rows = [(module, self_us, cumulative_us) for module, (self_us, cumulative_us) in best.items()]
+        rows.sort(key=lambda row: row[1] if options["sort"] == "self" else row[2], reverse=True)
+        if options["limit"]:
+            rows = rows[:options["limit"]]
+
+        if options["json"]:
+            self.stdout.write(json.dumps({
+                "application": application,
+                "import_ms": round(import_seconds * 1000, 1),
+                "process_ms": round(process_seconds * 1000, 1),
+                "modules": [
+                    {"module": module, "self_ms": round(self_us / 1000, 1), "cumulative_ms": round(cumulative_us / 1000, 1)}
+                    for module, self_us, cumulative_us in rows
+                ],
+            }, indent=2))
+            return
+
+        self.stdout.write(
+            f"Imported {application} in {import_seconds * 1000:.1f} ms, "
+            f"{process_seconds * 1000:.1f} ms with the interpreter's own start"
+        )
+        self.stdout.write(f"{'self ms':>9} {'cumul ms':>9}  {'package' if options['by_package'] else 'module'}")
+        for module, self_us, cumulative_us in rows:
+            cumulative = "" if options["by_package"] else f"{cumulative_us / 1000:.1f}"
+            self.stdout.write(f"{self_us / 1000:>9.1f} {cumulative:>9}  {module}")
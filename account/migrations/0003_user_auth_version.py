@@ -0,0 +1,18 @@
+# Generated by Django 4.0.6 on 2026-10-18 19:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0002_alter_user_email_verified'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='auth_version',
+            field=models.PositiveIntegerField(default=0, help_text='Bumped on every account change; tokens minted for an older version are rejected.', verbose_name='auth version'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.0.6 on 2026-10-18 19:19
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import Lower
+import django.db.models.functions.text
+
+
+def check_email_collisions(apps, schema_editor):
+    """
+    Refuse to add the constraint while emails differing only by case exist,
+    listing them so the accounts can be merged or renamed first.
+    """
+    User = apps.get_model("account", "User")
+    collisions = list(
+        User.objects.using(schema_editor.connection.alias)
+        .annotate(email_lower=Lower("email"))
+        .values("email_lower")
+        .annotate(accounts=Count("id"))
+        .filter(accounts__gt=1)
+        .values_list("email_lower", flat=True)
+    )
+    if collisions:
+        raise RuntimeError(
+            "Cannot make emails case-insensitive, these are used by more than "
+            "one account: " + ", ".join(sorted(collisions))
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0004_user_created_id_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_email_collisions, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='user',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('email'), name='account_user_email_ci_uniq'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.0.6 on 2026-10-18 21:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0006_revokedtoken'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='revokedtoken',
+            name='access_only',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -1,17 +1,30 @@
 from django.contrib.auth.models import (PermissionsMixin, UserManager, AbstractBaseUser)
-from django.contrib.auth.hashers import make_password
-from django.db import models
+from django.db import IntegrityError, connections, models, transaction
+from django.db.models import Value
+from django.db.models.functions import Lower
+from django.db.models.lookups import Exact
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
-from helpers.models import TrackingModel
+from helpers.database import database_sync_to_async, insert_returning
+from helpers.models import TrackingModel, TrackingQuerySet
+from account import hashers
 
 
-class CustomUserManager(UserManager):
+# The expression of the account_user_email_ci_uniq index, for ON CONFLICT
+EMAIL_CONFLICT_TARGET = 'LOWER("email")'
+
+
+class CustomUserManager(UserManager.from_queryset(TrackingQuerySet)):
     
-    def _create_user(self, email, password, **extra_fields):
+    def _build_user(self, email, password, **extra_fields):
         """
-        Create and save a user with the given email, and password.
+        Build an unsaved user with the given email, and password.
         """
+        user = self._build_user_without_password(email, **extra_fields)
+        user.password = hashers.make_password(password)
+        return user
+
+    def _build_user_without_password(self, email, **extra_fields):
         if not email:
             raise ValueError("The given email must be set")
         if not "first_name" in extra_fields or not extra_fields["first_name"]:
@@ -21,16 +34,86 @@ class CustomUserManager(UserManager):
 
         email = self.normalize_email(email)
 
-        user = self.model(email=email, **extra_fields)
-        user.password = make_password(password)
+        return self.model(email=email, **extra_fields)
+
+    def _create_user(self, email, password, **extra_fields):
+        """
+        Create and save a user with the given email, and password.
+        """
+        user = self._build_user(email, password, **extra_fields)
         user.save(using=self._db)
         return user
 
+    def _insert_if_new(self, user):
+        """
+        Insert the user unless its email is taken, in a single INSERT ... ON
+        CONFLICT (lower(email)) DO NOTHING RETURNING id. Only the email's
+        conflicts are ignored: a row that breaks any other constraint still
+        raises, rather than passing for a taken email. Return whether the
+        user was inserted.
+
+        Only PostgreSQL and SQLite 3.35+ can both name the conflict and
+        return the id: on other backends the INSERT goes in a savepoint and
+        the IntegrityError is caught instead, whichever constraint it's for.
+        """
+        connection = connections[self.db]
+        if connection.vendor not in ("postgresql", "sqlite") or not connection.features.can_return_rows_from_bulk_insert:
+            try:
+                with transaction.atomic(using=self.db):
+                    user.save(force_insert=True, using=self.db)
+            except IntegrityError:
+                return False
+            return True
+
+        fields = [field for field in self.model._meta.concrete_fields if not field.primary_key]
+        row = tuple(field.get_db_prep_save(field.pre_save(user, True), connection) for field in fields)
+        inserted = insert_returning(
+            self.model, [field.attname for field in fields], [row], ignore_conflicts=True,
+            conflict_target=[EMAIL_CONFLICT_TARGET], using=self.db,
+        )
+        if not inserted:
+            return False
+        user.pk = inserted[0][0]
+        user._state.adding = False
+        user._state.db = self.db
+        return True
+
+    def filter_by_email(self, email):
+        """
+        Match emails case-insensitively, through the lower(email) index.
+        """
+        return self.filter(Exact(Lower("email"), Lower(Value(email))))
+
+    def get_by_natural_key(self, username):
+        return self.filter_by_email(username).get()
+
     def create_user(self, email, password=None, **extra_fields):
         extra_fields.setdefault("is_staff", False)
         extra_fields.setdefault("is_superuser", False)
         return self._create_user(email, password, **extra_fields)
 
+    def create_user_if_new(self, email, password=None, **extra_fields):
+        """
+        Create a user, or return None if one with this email already exists.
+        Unlike checking first, this holds up under concurrent registrations.
+        """
+        extra_fields.setdefault("is_staff", False)
+        extra_fields.setdefault("is_superuser", False)
+        user = self._build_user(email, password, **extra_fields)
+        return user if self._insert_if_new(user) else None
+
+    async def acreate_user_if_new(self, email, password=None, **extra_fields):
+        """
+        create_user_if_new() for async callers: the password is hashed
+        without blocking the event loop and the INSERT runs on a thread.
+        """
+        extra_fields.setdefault("is_staff", False)
+        extra_fields.setdefault("is_superuser", False)
+        user = self._build_user_without_password(email, **extra_fields)
+        user.password = await hashers.amake_password(password)
+        inserted = await database_sync_to_async(self._insert_if_new)(user)
+        return user if inserted else None
+
     def create_superuser(self, email, password=None, **extra_fields):
         extra_fields.setdefault("is_staff", True)
         extra_fields.setdefault("is_superuser", True)
@@ -70,9 +153,61 @@ class User(AbstractBaseUser, PermissionsMixin, TrackingModel):
             "Designates whether this user's email is verified."
         ),
     )
+    auth_version = models.PositiveIntegerField(
+        _("auth version"),
+        default=0,
+        help_text=_(
+            "Bumped on every account change; tokens minted for an older version are rejected."
+        ),
+    )
 
     objects = CustomUserManager()
 
     EMAIL_FIELD = "email"
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = ["first_name", "last_name"]
+
+    class Meta:
+        constraints = [
+            # Emails are unique regardless of case, see CustomUserManager.get_by_natural_key
+            models.UniqueConstraint(Lower("email"), name="account_user_email_ci_uniq"),
+        ]
+        indexes = [
+            # Keyset pagination over (created_at, id), see account.pagination
+            models.Index(fields=["created_at", "id"], name="account_user_created_id_idx"),
+        ]
+
+    def set_password(self, raw_password):
+        self.password = hashers.make_password(raw_password)
+        self._password = raw_password
+
+    def check_password(self, raw_password):
+        """
+        Same as AbstractBaseUser.check_password, with the hashing done by the
+        hashing service instead of the request thread.
+        """
+
+        def setter(raw_password):
+            self.set_password(raw_password)
+            # Password hash upgrades shouldn't be considered password changes.
+            self._password = None
+            self.save(update_fields=["password"])
+
+        return hashers.check_password(raw_password, self.password, setter)
+
+
+class RevokedToken(models.Model):
+    """
+    A revoked token, by jti, or every token of a user minted before an auth
+    version, or with access_only, only its access tokens, made stale by a
+    change of the user's details. Rows are only needed until the tokens they
+    revoke expire. Loaded into memory by account.revocation, which polls for
+    new rows.
+    """
+
+    jti = models.CharField(max_length=255, blank=True)
+    user_id = models.BigIntegerField(null=True)
+    auth_version = models.PositiveIntegerField(null=True)
+    access_only = models.BooleanField(default=False)
+    expires_at = models.DateTimeField(db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
@@ -0,0 +1,169 @@
+"""
+A filter of breached or common passwords, in a file that's memory mapped
+read-only.
+
+It's a pattern blocked bloom filter: a password picks one 64 bit word of the
+filter and one of a table of bit patterns, and is in the filter if every bit
+of its pattern is set in its word. A lookup is two checksums, two array
+reads and a comparison, and touches one cache line of the file.
+
+Nothing is read when the filter is opened: pages come in from the page
+cache as lookups touch them, and every gunicorn worker maps the same cached
+pages instead of holding a copy.
+
+Passwords are compared lower cased and stripped, like Django's
+CommonPasswordValidator. A lookup can find a password that isn't in the list
+at about the error rate the filter was built for, but never misses one that
+is.
+"""
+import math
+import mmap
+import os
+import random
+import struct
+import sys
+import tempfile
+import threading
+from zlib import adler32, crc32
+
+
+MAGIC = b"CRDPWFLT"
+VERSION = 1
+# magic, version, bits per pattern, words, passwords
+HEADER = struct.Struct("<8sIIQQ")
+HEADER_SIZE = 64
+PATTERNS = 4096
+PATTERN_BYTES = PATTERNS * 8
+
+
+def _locate(password):
+    data = password.lower().strip().encode()
+    # The pattern comes from a second, cheaper checksum so it doesn't follow
+    # the word; multiplying spreads adler32's few busy bits over the index.
+    return crc32(data), adler32(data) * 2654435761 >> 20 & (PATTERNS - 1)
+
+
+def error_rate(count, words, bits):
+    """
+    Expected false positive rate of `count` passwords in `words` words with
+    `bits` bits per pattern. Passwords per word follow a Poisson law.
+    """
+    load = count / words
+    unset = 1 - bits / 64
+    spread = 12 * math.sqrt(load) + 20
+    return sum(
+        math.exp(-load + n * math.log(load) - math.lgamma(n + 1)) * (1 - unset ** n) ** bits
+        for n in range(max(0, int(load - spread)), int(load + spread))
+    )
+
+
+def parameters(count, target):
+    """
+    The fewest words, and the bits per pattern that go with them, to hold
+    `count` passwords at a false positive rate of at most `target`.
+    """
+    count = max(1, count)
+    best = None
+    for bits in range(1, 17):
+        low = high = 1
+        while error_rate(count, high, bits) > target:
+            high *= 2
+        while low < high:
+            middle = (low + high) // 2
+            if error_rate(count, middle, bits) <= target:
+                high = middle
+            else:
+                low = middle + 1
+        if best is None or low < best[0]:
+            best = (low, bits)
+    return best
+
+
+class PasswordFilter:
+
+    def __init__(self, path):
+        self.path = path
+        self._map = None
+        self._lock = threading.Lock()
+
+    def _open(self):
+        with self._lock:
+            if self._map is not None:
+                return
+            with open(self.path, "rb") as f:
+                # The mapping keeps its own reference to the file
+                map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                if len(map) < HEADER_SIZE or map[:len(MAGIC)] != MAGIC:
+                    raise ValueError(f"{self.path} isn't a password filter")
+                _, version, self.bits, self.words, self.count = HEADER.unpack_from(map)
+                if version != VERSION:
+                    raise ValueError(f"{self.path} is a version {version} password filter, expected {VERSION}")
+                if len(map) != HEADER_SIZE + PATTERN_BYTES + self.words * 8:
+                    raise ValueError(f"{self.path} is truncated")
+                if sys.byteorder != "little":
+                    raise ValueError("Password filters are little-endian")
+            except ValueError:
+                map.close()
+                raise
+            view = memoryview(map)
+            self._patterns = view[HEADER_SIZE:HEADER_SIZE + PATTERN_BYTES].cast("Q")
+            self._words = view[HEADER_SIZE + PATTERN_BYTES:].cast("Q")
+            self._map = map
+
+    def __contains__(self, password):
+        if self._map is None:
+            self._open()
+        # _locate() inlined, a call costs as much as the rest
+        data = password.lower().strip().encode()
+        pattern = self._patterns[adler32(data) * 2654435761 >> 20 & (PATTERNS - 1)]
+        return self._words[crc32(data) % self.words] & pattern == pattern
+
+    def close(self):
+        with self._lock:
+            if self._map is not None:
+                self._patterns.release()
+                self._words.release()
+                self._map.close()
+                self._map = None
+
+
+def build_filter(passwords, path, count, target=0.001):
+    """
+    Write a filter of the passwords (any iterable of strings, read once) to
+    path, sized for `count` of them at a false positive rate of `target`.
+    Bits are set in a mapping of the new file, so memory use doesn't grow
+    with the list, and the file replaces path once complete. Returns the
+    number of passwords added.
+    """
+    words, bits = parameters(count, target)
+    size = HEADER_SIZE + PATTERN_BYTES + words * 8
+    # Any patterns will do, they're stored with the filter
+    rng = random.Random(f"{words}:{bits}")
+    patterns = [sum(1 << bit for bit in rng.sample(range(64), bits)) for _ in range(PATTERNS)]
+
+    fd, temporary = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+    added = 0
+    try:
+        with os.fdopen(fd, "r+b") as f:
+            f.truncate(size)
+            with mmap.mmap(f.fileno(), size) as map:
+                struct.pack_into(f"<{PATTERNS}Q", map, HEADER_SIZE, *patterns)
+                filter = memoryview(map)[HEADER_SIZE + PATTERN_BYTES:].cast("Q")
+                try:
+                    for password in passwords:
+                        if not password.strip():
+                            continue
+                        word, pattern = _locate(password)
+                        filter[word % words] |= patterns[pattern]
+                        added += 1
+                finally:
+                    filter.release()
+                HEADER.pack_into(map, 0, MAGIC, VERSION, bits, words, added)
+                map.flush()
+        os.chmod(temporary, 0o644)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+    return added
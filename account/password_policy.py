@@ -0,0 +1,130 @@
+"""
+AUTH_PASSWORD_VALIDATORS compiled into a single check.
+
+Django's validate_password calls every validator in turn, and each of the
+character class validators walks the password on its own. The policy instead
+maps every character the classes care about to a marker character in one
+translation table, so a single str.translate() pass tells which classes the
+password covers. Length minimums are a len() comparison. Validators the
+policy doesn't know are still called as they are.
+
+Errors are the ones the validators themselves raise, so messages and codes
+are exactly those of validate_password, all of them at once and in the
+configured order.
+"""
+from django.contrib.auth.password_validation import MinimumLengthValidator, get_default_password_validators
+from django.core.exceptions import ValidationError
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.translation import get_language
+
+from account.validators import CharacterClassValidator
+
+
+# Markers live in a private use plane; the same code points in a password are
+# dropped by the table so they can't pass for a marker.
+MARKER_BASE = 0xF0000
+
+_LENGTH, _CLASS, _CALL = range(3)
+
+
+class PasswordPolicy:
+
+    def __init__(self, validators):
+        self.validators = list(validators)
+        classes = [
+            validator for validator in self.validators
+            if isinstance(validator, CharacterClassValidator) and validator.characters
+        ]
+
+        # Characters by the set of classes they belong to, one marker per set
+        masks = {}
+        for bit, validator in enumerate(classes):
+            for character in validator.characters:
+                masks[character] = masks.get(character, 0) | (1 << bit)
+        markers = {mask: chr(MARKER_BASE + n) for n, mask in enumerate(sorted(set(masks.values())))}
+        self._table = {ord(character): markers[mask] for character, mask in masks.items()}
+        self._table.update({ord(marker): None for marker in markers.values()})
+
+        self._rules = []
+        for validator in self.validators:
+            if type(validator) is MinimumLengthValidator:
+                self._rules.append((validator, _LENGTH, validator.min_length))
+            elif validator in classes:
+                bit = 1 << classes.index(validator)
+                self._rules.append((validator, _CLASS, frozenset(
+                    marker for mask, marker in markers.items() if mask & bit
+                )))
+            else:
+                self._rules.append((validator, _CALL, None))
+        self._has_classes = bool(classes)
+        self._errors = {}
+
+    def violations(self, password, user=None):
+        """
+        Every ValidationError the configured validators raise for the
+        password, in their order. Empty if it's acceptable.
+        """
+        found = set(password.translate(self._table)) if self._has_classes else None
+        errors = []
+        for validator, kind, rule in self._rules:
+            if kind is _LENGTH:
+                if len(password) >= rule:
+                    continue
+            elif kind is _CLASS:
+                if not found.isdisjoint(rule):
+                    continue
+            else:
+                try:
+                    validator.validate(password, user)
+                except ValidationError as error:
+                    errors.append(error)
+                continue
+            errors.append(self._error(validator, password, user))
+        return errors
+
+    def _error(self, validator, password, user):
+        # A compiled rule's error only depends on the language, so it's built
+        # by the validator once per language and reused.
+        key = (id(validator), get_language())
+        error = self._errors.get(key)
+        if error is None:
+            try:
+                validator.validate(password, user)
+            except ValidationError as e:
+                # Without the traceback, which would keep the password alive
+                error = self._errors[key] = e.with_traceback(None)
+        return error
+
+    def validate(self, password, user=None):
+        """
+        Drop-in for django.contrib.auth.password_validation.validate_password.
+        """
+        errors = self.violations(password, user)
+        if errors:
+            raise ValidationError(errors)
+
+    def validate_many(self, passwords, user=None):
+        """
+        Violations for each of the passwords, as a list of error lists in the
+        same order, for bulk imports.
+        """
+        violations = self.violations
+        return [violations(password, user) for password in passwords]
+
+
+_policy = None
+
+
+def get_password_policy():
+    global _policy
+    if _policy is None:
+        _policy = PasswordPolicy(get_default_password_validators())
+    return _policy
+
+
+@receiver(setting_changed)
+def reset_password_policy(*, setting, **kwargs):
+    global _policy
+    if setting == "AUTH_PASSWORD_VALIDATORS":
+        _policy = None
@@ -0,0 +1,90 @@
+import threading
+
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from account.authentication import to_microseconds
+from helpers import metrics
+from helpers.renderers import ORJSONRenderer
+
+
+# The CACHES alias rendered responses are kept in
+CACHE_ALIAS = "responses"
+
+
+_local = threading.local()
+
+
+def get_cache():
+    """
+    The responses cache for this thread. caches[] hands out one per thread
+    too, but looking it up costs about as much as the lookup in the cache.
+    """
+    try:
+        return _local.cache
+    except AttributeError:
+        cache = _local.cache = caches[CACHE_ALIAS]
+        return cache
+
+
+@receiver(setting_changed)
+def reset_cache(*, setting, **kwargs):
+    global _local
+    if setting == "CACHES":
+        _local = threading.local()
+
+
+def response_cache_key(name, user_id, version):
+    return f"account:response:{name}:{user_id}:{version}"
+
+
+def user_version(user):
+    # updated_at moves on every account write, see account.views.user_validators
+    return to_microseconds(user.updated_at)
+
+
+class UserResponseCache:
+    """
+    Rendered JSON bodies of a per-user read endpoint, keyed by the user and
+    the user's version. A body is only ever looked up with the version of the
+    token asking for it, so an entry can't outlive the account state it was
+    rendered from; writes still replace it (see AuthVersionMixin) so the new
+    version is a hit straight away and the old one doesn't take up room.
+    """
+
+    renderer = ORJSONRenderer()
+
+    def __init__(self, name, serializer_class):
+        self.name = name
+        self.serializer_class = serializer_class
+        self._labels = {
+            hit: (("cache", name), ("result", "hit" if hit else "miss"))
+            for hit in (True, False)
+        }
+
+    def render(self, user):
+        return self.renderer.render(self.serializer_class(user).data)
+
+    def get(self, user):
+        """
+        The user's body, rendered and cached on a miss.
+        """
+        key = response_cache_key(self.name, user.pk, user_version(user))
+        cache = get_cache()
+        content = cache.get(key)
+        metrics.registry.inc("credity_response_cache_requests_total", self._labels[content is not None])
+        if content is None:
+            content = self.render(user)
+            cache.set(key, content)
+        return content
+
+    def replace(self, user, old_version):
+        """
+        Write-through after the user was saved: drop the body of the old
+        version and, while the account is active, store the new one.
+        """
+        cache = get_cache()
+        cache.delete(response_cache_key(self.name, user.pk, old_version))
+        if user.is_active:
+            cache.set(response_cache_key(self.name, user.pk, user_version(user)), self.render(user))
@@ -0,0 +1,250 @@
+import datetime
+import hashlib
+import threading
+import time
+from array import array
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+
+from account.models import RevokedToken
+
+
+def _jti_key(jti):
+    # 8 bytes per jti instead of the 32 character string; a collision would
+    # only revoke a token early.
+    return int.from_bytes(hashlib.blake2b(jti.encode(), digest_size=8).digest(), "little")
+
+
+class RevocationSet:
+    """
+    Revoked tokens held in memory: single tokens by jti, and every token of a
+    user whose auth_version is below a minimum. Stale access tokens too, of
+    users whose details changed since they were minted: those are rejected
+    while refresh tokens of the same version still bring them up to date.
+
+    Entries are filed in buckets by the minute they expire in, so pruning
+    drops whole buckets once they're in the past and memory only holds tokens
+    that could still be presented. A jti costs about 120 bytes: its dict
+    slot, the int objects of its key and bucket, and 8 bytes in its bucket's
+    array. A million revoked tokens take some 120MB in every worker.
+    """
+
+    bucket_seconds = 60
+
+    def __init__(self):
+        self._tokens = {}  # jti key -> bucket
+        self._users = {}  # user id -> (minimum auth version, bucket)
+        self._stale = {}  # user id -> (minimum auth version of access tokens, bucket)
+        self._buckets = {}  # bucket -> (array of jti keys, list of user ids, list of stale user ids)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._tokens) + len(self._users) + len(self._stale)
+
+    def _bucket(self, expires):
+        return int(expires // self.bucket_seconds) + 1
+
+    def _file(self, bucket):
+        entries = self._buckets.get(bucket)
+        if entries is None:
+            entries = self._buckets[bucket] = (array("Q"), [], [])
+        return entries
+
+    def add_token(self, jti, expires):
+        """
+        Revoke the token with this jti until `expires` (a unix timestamp).
+        """
+        bucket = self._bucket(expires)
+        key = _jti_key(jti)
+        with self._lock:
+            if self._tokens.get(key, 0) < bucket:
+                self._tokens[key] = bucket
+                self._file(bucket)[0].append(key)
+
+    def add_user(self, user_id, auth_version, expires, access_only=False):
+        """
+        Revoke the user's tokens with an auth_version below `auth_version`,
+        or with access_only, only mark its access tokens stale.
+        """
+        bucket = self._bucket(expires)
+        users, filed = (self._stale, 2) if access_only else (self._users, 1)
+        with self._lock:
+            current_version, current_bucket = users.get(user_id, (0, 0))
+            users[user_id] = (max(auth_version, current_version), max(bucket, current_bucket))
+            if current_bucket < bucket:
+                self._file(bucket)[filed].append(user_id)
+
+    def is_revoked(self, jti, user_id=None, auth_version=None):
+        if self._tokens and jti is not None and _jti_key(jti) in self._tokens:
+            return True
+        if auth_version is not None and self._users:
+            return auth_version < self._users.get(user_id, (0, 0))[0]
+        return False
+
+    def is_stale(self, user_id, auth_version):
+        """
+        Whether an access token of this auth_version predates a change of
+        its user.
+        """
+        if not self._stale:
+            return False
+        return auth_version < self._stale.get(user_id, (0, 0))[0]
+
+    def prune(self, now=None):
+        """
+        Drop entries for tokens that have expired.
+        """
+        now = time.time() if now is None else now
+        current = self._bucket(now) - 1
+        with self._lock:
+            for bucket in [bucket for bucket in self._buckets if bucket <= current]:
+                keys, user_ids, stale_ids = self._buckets.pop(bucket)
+                for key in keys:
+                    # Keys re-filed under a later bucket stay
+                    if self._tokens.get(key) == bucket:
+                        del self._tokens[key]
+                for users, ids in ((self._users, user_ids), (self._stale, stale_ids)):
+                    for user_id in ids:
+                        if users.get(user_id, (0, 0))[1] == bucket:
+                            del users[user_id]
+
+    def clear(self):
+        with self._lock:
+            self._tokens.clear()
+            self._users.clear()
+            self._stale.clear()
+            self._buckets.clear()
+
+
+class Revocations:
+    """
+    The process's RevocationSet, kept in step with the RevokedToken table.
+
+    Revoking writes a row and updates this process at once. Other workers
+    pick the row up on their next poll, at most once every POLL_INTERVAL
+    seconds, which reads the rows created since the last one, by created_at.
+    Checks between polls don't touch the database.
+    """
+
+    # A row is stamped before its transaction commits, and by the clock of
+    # whichever host wrote it, so it can become visible after a poll that
+    # started later than its created_at. Each poll reads this far back
+    # before the previous one started to catch those; rows read twice are
+    # added again, which changes nothing.
+    overlap = datetime.timedelta(minutes=1)
+
+    def __init__(self, poll_interval):
+        self.poll_interval = poll_interval
+        self.set = RevocationSet()
+        self._since = None
+        self._last_poll = None
+        self._lock = threading.Lock()
+
+    def sync_due(self):
+        return self._last_poll is None or time.monotonic() - self._last_poll >= self.poll_interval
+
+    def sync(self, force=False):
+        if not force and not self.sync_due():
+            return
+        now = time.monotonic()
+        if not self._lock.acquire(blocking=False):
+            # Another thread is already polling
+            return
+        try:
+            self._last_poll = now
+            started = timezone.now()
+            rows = RevokedToken.objects.filter(expires_at__gt=started)
+            if self._since is not None:
+                rows = rows.filter(created_at__gte=self._since)
+            for jti, user_id, auth_version, access_only, expires_at in rows.values_list(
+                "jti", "user_id", "auth_version", "access_only", "expires_at",
+            ).iterator():
+                self._add(jti, user_id, auth_version, access_only, expires_at.timestamp())
+            self._since = started - self.overlap
+            self.set.prune()
+        finally:
+            self._lock.release()
+
+    def _add(self, jti, user_id, auth_version, access_only, expires):
+        if jti:
+            self.set.add_token(jti, expires)
+        if auth_version is not None:
+            self.set.add_user(user_id, auth_version, expires, access_only)
+
+    def is_revoked(self, token):
+        """
+        Whether a validated token has been revoked, by its jti or its user's
+        auth version.
+        """
+        self.sync()
+        return self.set.is_revoked(
+            token.get(api_settings.JTI_CLAIM),
+            token.get(api_settings.USER_ID_CLAIM),
+            token.get("auth_version"),
+        )
+
+    def is_stale(self, token):
+        """
+        Whether a validated access token predates a change of its user's
+        details, by its auth version.
+        """
+        self.sync()
+        return self.set.is_stale(token.get(api_settings.USER_ID_CLAIM), token.get("auth_version"))
+
+    def revoke_token(self, token):
+        jti = token[api_settings.JTI_CLAIM]
+        expires = token["exp"]
+        RevokedToken.objects.create(
+            jti=jti,
+            user_id=token.get(api_settings.USER_ID_CLAIM),
+            expires_at=datetime.datetime.fromtimestamp(expires, datetime.timezone.utc),
+        )
+        self.set.add_token(jti, expires)
+
+    def revoke_user(self, user):
+        """
+        Revoke every token minted for the user before its current auth
+        version, until the longest lived of them has expired.
+        """
+        lifetime = max(api_settings.ACCESS_TOKEN_LIFETIME, api_settings.REFRESH_TOKEN_LIFETIME)
+        expires_at = timezone.now() + lifetime
+        RevokedToken.objects.create(user_id=user.pk, auth_version=user.auth_version, expires_at=expires_at)
+        self.set.add_user(user.pk, user.auth_version, expires_at.timestamp())
+
+    def mark_stale(self, user):
+        """
+        Reject the user's access tokens minted before its current auth
+        version, until they have expired. Its refresh tokens still work.
+        """
+        expires_at = timezone.now() + api_settings.ACCESS_TOKEN_LIFETIME
+        RevokedToken.objects.create(
+            user_id=user.pk, auth_version=user.auth_version, access_only=True, expires_at=expires_at,
+        )
+        self.set.add_user(user.pk, user.auth_version, expires_at.timestamp(), access_only=True)
+
+    def clear(self):
+        with self._lock:
+            self.set.clear()
+            self._since = None
+            self._last_poll = None
+
+
+_revocations = None
+
+
+def get_revocations():
+    global _revocations
+    if _revocations is None:
+        _revocations = Revocations(poll_interval=settings.TOKEN_REVOCATION["POLL_INTERVAL"])
+    return _revocations
+
+
+@receiver(setting_changed)
+def reset_revocations(*, setting, **kwargs):
+    global _revocations
+    if setting == "TOKEN_REVOCATION":
+        _revocations = None
@@ -1,11 +1,23 @@
 from rest_framework import serializers
+from rest_framework_simplejwt import serializers as jwt_serializers
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from account.authentication import add_user_claims
+from account.password_policy import get_password_policy
+from account.response_cache import UserResponseCache, user_version
+from account.revocation import get_revocations
 from account.models import User
 from django.core import exceptions
-import django.contrib.auth.password_validation as validators
+from helpers import metrics
+from helpers.serializers import CompiledSerializerMixin
 
 
 class RegisterSerializer(serializers.ModelSerializer):
 
+    # Declared so ModelSerializer doesn't add a UniqueValidator query, the
+    # INSERT in create() enforces uniqueness instead.
+    email = serializers.EmailField(max_length=254)
     password = serializers.CharField(max_length=255, min_length=8, write_only=True)
 
     class Meta:
@@ -13,20 +25,40 @@ class RegisterSerializer(serializers.ModelSerializer):
         fields = ("email", "first_name", "last_name", "password")
 
     def create(self, validated_data):
-        return User.objects.create_user(**validated_data)
+        user = User.objects.create_user_if_new(**validated_data)
+        if user is None:
+            raise self.email_taken()
+        return user
+
+    async def asave(self):
+        """
+        save() for async views, which only ever create.
+        """
+        self.instance = await User.objects.acreate_user_if_new(**self.validated_data)
+        if self.instance is None:
+            raise self.email_taken()
+        return self.instance
+
+    def email_taken(self):
+        # Same error the UniqueValidator would have given
+        field = User._meta.get_field("email")
+        message = field.error_messages["unique"] % {
+            "model_name": User._meta.verbose_name,
+            "field_label": field.verbose_name,
+        }
+        return serializers.ValidationError({"email": [message]}, code="unique")
 
     def validate(self, data):
-        # here data has all the fields which have validated values
-        # so we can create a User instance out of it
-        user = User(**data)
-         
         # get the password from the data
         password = data.get('password')
          
         errors = dict() 
         try:
-            # validate the password and catch the exception
-            validators.validate_password(password=password)
+            # validate the password and catch the exception, unless the
+            # caller checks passwords in bulk (see account.importers)
+            if not self.context.get("defer_password_validation"):
+                with metrics.timer("password_validation"):
+                    get_password_policy().validate(password)
         # the exception raised here is different than serializers.ValidationError
         except exceptions.ValidationError as e:
             errors['password'] = list(e.messages)
@@ -37,7 +69,7 @@ class RegisterSerializer(serializers.ModelSerializer):
         return super(RegisterSerializer, self).validate(data)
 
 
-class DetailSerializer(serializers.ModelSerializer):
+class DetailSerializer(CompiledSerializerMixin, serializers.ModelSerializer):
 
     email = serializers.EmailField(read_only=True)
     first_name = serializers.CharField(read_only=True)
@@ -48,7 +80,40 @@ class DetailSerializer(serializers.ModelSerializer):
         fields = ("email", "first_name", "last_name")
 
 
-class UpdateSerializer(serializers.ModelSerializer):
+detail_responses = UserResponseCache("detail", DetailSerializer)
+
+
+class AuthVersionMixin:
+    """
+    Bumps the user's auth version on save, so access tokens minted before the
+    change are rejected as stale, in every worker. With revoke_tokens set they
+    are revoked outright, refresh tokens included. The cached detail response moves to the new
+    version.
+    """
+
+    revoke_tokens = False
+
+    def update(self, instance, validated_data):
+        instance.auth_version += 1
+        version = user_version(instance)
+        instance = super().update(instance, validated_data)
+        if self.revoke_tokens:
+            get_revocations().revoke_user(instance)
+        else:
+            get_revocations().mark_stale(instance)
+        detail_responses.replace(instance, version)
+        return instance
+
+
+class UserListSerializer(CompiledSerializerMixin, serializers.ModelSerializer):
+
+    class Meta:
+        model = User
+        fields = ("id", "email", "first_name", "last_name", "is_active", "created_at")
+        read_only_fields = fields
+
+
+class UpdateSerializer(AuthVersionMixin, serializers.ModelSerializer):
 
     email = serializers.EmailField(read_only=True)
     first_name = serializers.CharField(required=True)
@@ -59,8 +124,9 @@ class UpdateSerializer(serializers.ModelSerializer):
         fields = ("email", "first_name", "last_name")
 
 
-class ChangeAuthSerializer(serializers.ModelSerializer):
+class ChangeAuthSerializer(AuthVersionMixin, serializers.ModelSerializer):
     
+    revoke_tokens = True
     old_password = serializers.CharField(write_only=True, required=True)
     new_password = serializers.CharField(write_only=True, required=True)
 
@@ -70,8 +136,7 @@ class ChangeAuthSerializer(serializers.ModelSerializer):
 
     def update(self, instance, validated_data):
         instance.set_password(validated_data["new_password"])
-        instance.save()
-        return instance
+        return super().update(instance, {})
 
     def validate(self, data):
         errors = dict() 
@@ -82,7 +147,8 @@ class ChangeAuthSerializer(serializers.ModelSerializer):
 
         try:
             # validate the new password and catch the exception
-            validators.validate_password(password=data["new_password"])
+            with metrics.timer("password_validation"):
+                get_password_policy().validate(data["new_password"])
         # the exception raised here is different than serializers.ValidationError
         except exceptions.ValidationError as e:
             errors["new_password"] = list(e.messages)
@@ -93,8 +159,9 @@ class ChangeAuthSerializer(serializers.ModelSerializer):
         return super(ChangeAuthSerializer, self).validate(data)
 
 
-class DeleteSerializer(serializers.ModelSerializer):
+class DeleteSerializer(AuthVersionMixin, serializers.ModelSerializer):
 
+    revoke_tokens = True
     is_active = serializers.BooleanField(write_only=True)
 
     def __init__(self, instance, data={"is_active": False}):
@@ -103,3 +170,58 @@ class DeleteSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ("is_active",)
+
+
+class LogoutSerializer(serializers.Serializer):
+
+    refresh = serializers.CharField(required=False)
+
+    def validate_refresh(self, value):
+        try:
+            refresh = RefreshToken(value)
+        except TokenError as e:
+            raise serializers.ValidationError(e.args[0])
+        if refresh[api_settings.USER_ID_CLAIM] != self.context["request"].user.pk:
+            raise serializers.ValidationError("Token belongs to another user")
+        return refresh
+
+
+class TokenObtainPairSerializer(jwt_serializers.TokenObtainPairSerializer):
+
+    @classmethod
+    def get_token(cls, user):
+        return add_user_claims(super().get_token(user), user)
+
+
+class TokenRefreshSerializer(jwt_serializers.TokenRefreshSerializer):
+
+    default_error_messages = {
+        "no_active_account": "No active account found for the given token",
+        "token_revoked": "Token has been revoked",
+    }
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs["refresh"])
+        revocations = get_revocations()
+        if revocations.is_revoked(refresh):
+            raise AuthenticationFailed(self.error_messages["token_revoked"], "token_revoked")
+
+        # Refreshing is the one place claims are brought up to date, so it
+        # always reads the user.
+        user = User.objects.filter(pk=refresh[api_settings.USER_ID_CLAIM], is_active=True).first()
+        if user is None:
+            raise AuthenticationFailed(self.error_messages["no_active_account"], "no_active_account")
+        add_user_claims(refresh, user)
+
+        data = {"access": str(refresh.access_token)}
+
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                revocations.revoke_token(self.token_class(attrs["refresh"]))
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+
+            data["refresh"] = str(refresh)
+
+        return data
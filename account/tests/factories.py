@@ -0,0 +1,42 @@
+"""
+Builders for test data that skip the slow parts of going through the API:
+users get a password hash computed once per password, and tokens are minted
+directly instead of logging in.
+"""
+import itertools
+from functools import lru_cache
+
+from django.contrib.auth.hashers import make_password
+
+from account.models import User
+from account.serializers import TokenObtainPairSerializer
+
+
+PASSWORD = "aA1-K+4fX"
+
+_numbers = itertools.count()
+
+
+@lru_cache(maxsize=None)
+def password_hash(password):
+    return make_password(password)
+
+
+def create_user(email=None, password=PASSWORD, **fields):
+    """
+    Save a user with a precomputed password hash. Emails default to unique
+    ones, names to "First" and "Last".
+    """
+    fields.setdefault("first_name", "First")
+    fields.setdefault("last_name", "Last")
+    if email is None:
+        email = f"user{next(_numbers)}@example.com"
+    return User.objects.create(email=email, password=password_hash(password), **fields)
+
+
+def tokens_for(user):
+    """
+    An (access, refresh) pair for the user, the same as logging in returns.
+    """
+    refresh = TokenObtainPairSerializer.get_token(user)
+    return str(refresh.access_token), str(refresh)
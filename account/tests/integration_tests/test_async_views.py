@@ -0,0 +1,59 @@
+"""
+The endpoint tests of test_urls, run against the async views that
+account.urls routes to under ASGI.
+"""
+from asgiref.sync import iscoroutinefunction
+from django.test import override_settings
+from django.urls import include, path
+from account import async_views, urls
+from account.tests.integration_tests import test_urls
+
+
+ASYNC_VIEWS = {
+    "register": async_views.AsyncRegisterAPIView,
+    "user_detail": async_views.AsyncDetailAPIView,
+    "user_update": async_views.AsyncUpdateAPIView,
+    "change_auth": async_views.AsyncChangeAuthView,
+    "user_delete": async_views.AsyncDeleteAPIView,
+}
+
+urlpatterns = [
+    path("api/account/", include([
+        path(str(pattern.pattern), ASYNC_VIEWS[pattern.name].as_view(), name=pattern.name)
+        if pattern.name in ASYNC_VIEWS else pattern
+        for pattern in urls.urlpatterns
+    ])),
+]
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class AsyncRegisterTests(test_urls.RegisterTests):
+    pass
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class AsyncUserDetailTests(test_urls.UserDetailTests):
+    pass
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class AsyncUserUpdateTests(test_urls.UserUpdateTests):
+    pass
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class AsyncChangeAuthTests(test_urls.ChangeAuthTests):
+    pass
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class AsyncUserDeleteTests(test_urls.UserDeleteTests):
+    pass
+
+
+class AsyncViewTests(test_urls.AccountAPITestCase):
+
+    def test_async_views_are_coroutines(self):
+        for view_class in ASYNC_VIEWS.values():
+            with self.subTest(view_class.__name__):
+                self.assertTrue(iscoroutinefunction(view_class.as_view()))
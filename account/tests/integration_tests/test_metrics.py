@@ -0,0 +1,120 @@
+import os
+import subprocess
+import sys
+import tempfile
+
+from django.conf import settings
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from account.models import User
+from helpers import metrics
+
+
+class MetricsTests(APITestCase):
+
+    test_data = {
+        "email": "test@example.com",
+        "password": "aA1-K+4fX",
+        "first_name": "First",
+        "last_name": "Last",
+    }
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        overrides = override_settings(METRICS={
+            "DIRECTORY": directory.name,
+            "FLUSH_INTERVAL": 60.0,
+            "ALLOWED_IPS": (),
+            "TOKEN": "secret",
+        })
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        metrics.registry.reset()
+
+    def get_metrics(self):
+        response = self.client.get(reverse("metrics"), HTTP_X_METRICS_TOKEN="secret")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        return response.content.decode()
+
+    def test_register_is_recorded(self):
+        self.client.post(reverse("register"), self.test_data, format='json')
+        body = self.get_metrics()
+
+        labels = 'route="api/account/register",method="POST"'
+        self.assertIn(f'credity_http_requests_total{{{labels},status="201"}} 1', body)
+        self.assertIn(f'credity_http_request_duration_seconds_count{{{labels}}} 1', body)
+        self.assertIn(f'credity_http_request_duration_seconds_bucket{{{labels},le="+Inf"}} 1', body)
+        self.assertIn(f'credity_db_queries_per_request_bucket{{{labels},le="1"}} 1', body)
+        self.assertIn(f'credity_request_phase_calls_total{{{labels},phase="password_hashing"}} 1', body)
+        self.assertIn(f'credity_request_phase_calls_total{{{labels},phase="password_validation"}} 1', body)
+        self.assertIn(f'credity_http_response_size_bytes_count{{{labels}}} 1', body)
+
+    def test_histogram_buckets_are_cumulative(self):
+        samples = {
+            ("credity_db_queries_per_request", (("route", "r"),), 1): 2.0,
+            ("credity_db_queries_per_request", (("route", "r"),), 5): 1.0,
+            ("credity_db_queries_per_request_sum", (("route", "r"),), None): 7.0,
+        }
+        body = metrics.render(samples)
+        self.assertIn('credity_db_queries_per_request_bucket{route="r",le="0"} 0', body)
+        self.assertIn('credity_db_queries_per_request_bucket{route="r",le="3"} 2', body)
+        self.assertIn('credity_db_queries_per_request_bucket{route="r",le="+Inf"} 3', body)
+        self.assertIn('credity_db_queries_per_request_sum{route="r"} 7', body)
+        self.assertIn('credity_db_queries_per_request_count{route="r"} 3', body)
+
+    def test_samples_of_other_workers_are_merged(self):
+        labels = (("route", "api/account/detail"), ("method", "GET"), ("status", 200))
+        metrics.registry.inc("credity_http_requests_total", labels)
+        # Dump and rename it as if another worker had written it
+        directory = metrics.get_directory()
+        metrics.registry.flush(directory)
+        os.rename(os.path.join(directory, f"{os.getpid()}.json"), os.path.join(directory, f"{os.getppid()}.json"))
+        metrics.registry.reset()
+        metrics.registry.inc("credity_http_requests_total", labels)
+
+        body = self.get_metrics()
+        self.assertIn('credity_http_requests_total{route="api/account/detail",method="GET",status="200"} 2', body)
+
+    def test_dumps_of_dead_workers_are_removed(self):
+        process = subprocess.Popen([sys.executable, "-c", ""])
+        process.wait()
+        labels = (("route", "api/account/detail"), ("method", "GET"), ("status", 200))
+        metrics.registry.inc("credity_http_requests_total", labels)
+        directory = metrics.get_directory()
+        metrics.registry.flush(directory)
+        os.rename(os.path.join(directory, f"{os.getpid()}.json"), os.path.join(directory, f"{process.pid}.json"))
+        # Killed mid-write
+        open(os.path.join(directory, f"{process.pid}.abc123.tmp"), "w").close()
+        metrics.registry.reset()
+
+        body = self.get_metrics()
+        self.assertNotIn("api/account/detail", body)
+        self.assertEqual(os.listdir(directory), [f"{os.getpid()}.json"])
+
+    def test_unmatched_paths_share_a_label(self):
+        self.client.get("/no/such/path")
+        self.client.get("/another/missing/path")
+        body = self.get_metrics()
+        self.assertIn('credity_http_requests_total{route="unmatched",method="GET",status="404"} 2', body)
+
+    def test_metrics_forbidden_without_token(self):
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_metrics_allowed_for_listed_addresses(self):
+        with self.settings(METRICS={**settings.METRICS, "ALLOWED_IPS": ("127.0.0.1",)}):
+            response = self.client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_metrics_allowed_for_staff(self):
+        User.objects.create_superuser(**self.test_data)
+        response = self.client.post(reverse("token_obtain_pair"), {
+            "email": self.test_data["email"], "password": self.test_data["password"],
+        }, format='json')
+        response = self.client.get(reverse("metrics"), HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
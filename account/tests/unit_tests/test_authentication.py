@@ -0,0 +1,85 @@
+from rest_framework.test import APIRequestFactory, APITestCase
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import AccessToken
+from account.authentication import ClaimsJWTAuthentication, LazyUser
+from account.revocation import get_revocations
+from account.models import User
+from account.serializers import TokenObtainPairSerializer
+
+
+class ClaimsJWTAuthenticationTests(APITestCase):
+
+    test_data = {
+        "email": "test@example.com",
+        "password": "aA1-K+4fX",
+        "first_name": "First",
+        "last_name": "Last",
+    }
+
+    def setUp(self):
+        get_revocations().clear()
+        get_revocations().sync(force=True)
+        self.user = User.objects.create_user(**self.test_data)
+        self.authentication = ClaimsJWTAuthentication()
+
+    def get_access_token(self):
+        return TokenObtainPairSerializer.get_token(self.user).access_token
+
+    def test_claimed_attributes_are_read_without_queries(self):
+        token = self.get_access_token()
+        with self.assertNumQueries(0):
+            user = self.authentication.get_user(token)
+            self.assertTrue(user.is_authenticated)
+            self.assertEqual(user.pk, self.user.pk)
+            self.assertEqual(user.email, self.user.email)
+            self.assertEqual(user.first_name, self.user.first_name)
+
+    def test_updated_at_is_read_from_claims_exactly(self):
+        token = self.get_access_token()
+        self.user.refresh_from_db()
+        with self.assertNumQueries(0):
+            user = self.authentication.get_user(token)
+            self.assertEqual(user.updated_at, self.user.updated_at)
+
+    def test_other_attributes_load_the_user(self):
+        user = self.authentication.get_user(self.get_access_token())
+        with self.assertNumQueries(1):
+            self.assertTrue(user.check_password(self.test_data["password"]))
+
+    def test_stale_token_is_rejected_without_queries_once_marked(self):
+        token = self.get_access_token()
+        self.user.auth_version += 1
+        self.user.save()
+        get_revocations().mark_stale(self.user)
+        with self.assertNumQueries(0), self.assertRaises(AuthenticationFailed):
+            self.authentication.get_user(token)
+
+    def test_stale_token_is_rejected_when_user_is_loaded(self):
+        token = self.get_access_token()
+        User.objects.filter(pk=self.user.pk).update(auth_version=1)
+        user = self.authentication.get_user(token)
+        with self.assertRaises(AuthenticationFailed):
+            user.save()
+
+    def test_token_without_claims_loads_the_user(self):
+        token = AccessToken.for_user(self.user)
+        with self.assertNumQueries(1):
+            user = self.authentication.get_user(token)
+        self.assertIsInstance(user, User)
+
+    async def test_authenticates_async_callers_from_claims(self):
+        token = self.get_access_token()
+        request = APIRequestFactory().get("/", HTTP_AUTHORIZATION=f"Bearer {token}")
+        user, validated_token = await self.authentication.authenticate_async(request)
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertEqual(validated_token["auth_version"], self.user.auth_version)
+        self.assertIsInstance(user, LazyUser)
+
+    async def test_authenticates_async_callers_without_claims(self):
+        token = AccessToken.for_user(self.user)
+        request = APIRequestFactory().get("/", HTTP_AUTHORIZATION=f"Bearer {token}")
+        user, _ = await self.authentication.authenticate_async(request)
+        self.assertIs(type(user), User)
+
+    async def test_ignores_async_requests_without_a_token(self):
+        self.assertIsNone(await self.authentication.authenticate_async(APIRequestFactory().get("/")))
@@ -0,0 +1,71 @@
+from django.test import TestCase
+
+from account.models import User
+from account.views import DetailAPIView, RegisterAPIView
+from helpers.budgets import QueryBudget, QueryBudgetExceeded, capture_queries, get_view_budget
+
+
+class QueryBudgetTests(TestCase):
+
+    def setUp(self):
+        for n in range(3):
+            User.objects.create_user(email=f"user{n}@example.com", password="aA1-K+4fX", first_name="First", last_name="Last")
+
+    def test_queries_and_rows_are_captured(self):
+        with capture_queries() as capture:
+            list(User.objects.all())
+            User.objects.filter(email="user0@example.com").update(first_name="New")
+        self.assertEqual(len(capture.queries), 2)
+        self.assertEqual(capture.queries[0].rows, 3)
+        self.assertEqual(capture.queries[1].rows, 1)
+        self.assertEqual(capture.rows, 4)
+
+    def test_origin_is_the_calling_project_line(self):
+        with capture_queries() as capture:
+            User.objects.count()
+        self.assertIn("test_budgets.py", capture.queries[0].origin)
+        self.assertIn("test_origin_is_the_calling_project_line", capture.queries[0].origin)
+
+    def test_within_budget(self):
+        with QueryBudget(queries=1, rows=3):
+            list(User.objects.all())
+
+    def test_over_budget_reports_the_queries(self):
+        with self.assertRaises(QueryBudgetExceeded) as cm:
+            with QueryBudget(queries=1):
+                User.objects.count()
+                User.objects.count()
+        self.assertIn("2 queries, budget 1", str(cm.exception))
+        self.assertIn("Duplicate, run 2 times", str(cm.exception))
+
+    def test_over_row_budget(self):
+        with self.assertRaisesMessage(QueryBudgetExceeded, "3 rows, budget 2"):
+            with QueryBudget(queries=1, rows=2):
+                list(User.objects.all())
+
+    def test_n_plus_one_patterns_are_reported(self):
+        with capture_queries() as capture:
+            for user in User.objects.all():
+                User.objects.filter(pk=user.pk).exists()
+        patterns = capture.repeated()["patterns"]
+        self.assertEqual(len(patterns), 1)
+        self.assertEqual(patterns[0][1], 3)
+        self.assertEqual(capture.repeated()["duplicates"], [])
+
+    def test_in_lists_of_any_length_share_a_pattern(self):
+        with capture_queries() as capture:
+            list(User.objects.filter(pk__in=[1, 2]))
+            list(User.objects.filter(pk__in=[1, 2, 3]))
+        self.assertEqual(capture.queries[0].pattern, capture.queries[1].pattern)
+
+    def test_as_decorator(self):
+        @QueryBudget(queries=0)
+        def query():
+            User.objects.count()
+
+        with self.assertRaises(QueryBudgetExceeded):
+            query()
+
+    def test_view_budgets(self):
+        self.assertEqual(get_view_budget(DetailAPIView, "get").queries, 0)
+        self.assertEqual(get_view_budget(RegisterAPIView, "POST").queries, 1)
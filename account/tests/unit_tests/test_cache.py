@@ -0,0 +1,131 @@
+import datetime
+import os
+import pickle
+import tempfile
+import orjson
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+from django.utils import timezone
+from account.models import User
+from account.response_cache import get_cache, response_cache_key, user_version
+from account.serializers import detail_responses
+from helpers import metrics
+from helpers.cache import BoundedLocMemCache
+
+
+class BoundedLocMemCacheTests(SimpleTestCase):
+
+    test_data = {
+        "value": b"x" * 100,
+    }
+
+    def make_cache(self, **options):
+        cache = BoundedLocMemCache(f"test-{self.id()}", {"OPTIONS": options})
+        self.addCleanup(cache.clear)
+        return cache
+
+    def size(self):
+        return len(pickle.dumps(self.test_data["value"], pickle.HIGHEST_PROTOCOL))
+
+    def test_evicts_least_recently_used_past_max_entries(self):
+        cache = self.make_cache(MAX_ENTRIES=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), 3)
+
+    def test_evicts_least_recently_used_past_max_bytes(self):
+        cache = self.make_cache(MAX_BYTES=2 * self.size())
+        cache.set("a", self.test_data["value"])
+        cache.set("b", self.test_data["value"])
+        cache.get("a")
+        cache.set("c", self.test_data["value"])
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("c"))
+
+    def test_overwriting_and_deleting_keep_the_size(self):
+        cache = self.make_cache(MAX_BYTES=2 * self.size())
+        for _ in range(5):
+            cache.set("a", self.test_data["value"])
+        cache.set("b", self.test_data["value"])
+        cache.delete("b")
+        cache.set("c", self.test_data["value"])
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNotNone(cache.get("c"))
+
+    def test_does_not_keep_values_bigger_than_max_bytes(self):
+        cache = self.make_cache(MAX_BYTES=self.size() - 1)
+        cache.set("a", self.test_data["value"])
+        self.assertIsNone(cache.get("a"))
+
+    def test_incr_keeps_the_expiry(self):
+        cache = self.make_cache()
+        cache.set("a", 1, timeout=60)
+        expires = cache._expire_info[cache.make_key("a")]
+        self.assertEqual(cache.incr("a", 10), 11)
+        self.assertEqual(cache.get("a"), 11)
+        self.assertEqual(cache._expire_info[cache.make_key("a")], expires)
+
+    def test_counts_evictions(self):
+        cache = self.make_cache(MAX_ENTRIES=1)
+        labels = (("cache", f"test-{self.id()}"),)
+        before = metrics.registry.snapshot()[("credity_cache_evictions_total", labels, None)]
+        cache.set("a", 1)
+        cache.set("b", 2)
+        after = metrics.registry.snapshot()[("credity_cache_evictions_total", labels, None)]
+        self.assertEqual(after - before, 1)
+
+
+class UserResponseCacheTests(SimpleTestCase):
+
+    test_data = {
+        "email": "test@example.com",
+        "first_name": "First",
+        "last_name": "Last",
+    }
+
+    def setUp(self):
+        self.user = User(id=7, updated_at=timezone.now(), **self.test_data)
+        get_cache().clear()
+
+    def lookups(self, result):
+        labels = (("cache", "detail"), ("result", result))
+        return metrics.registry.snapshot()[("credity_response_cache_requests_total", labels, None)]
+
+    def test_counts_hits_and_misses(self):
+        hits, misses = self.lookups("hit"), self.lookups("miss")
+        first = detail_responses.get(self.user)
+        second = detail_responses.get(self.user)
+        self.assertEqual(first, second)
+        self.assertEqual(orjson.loads(first), self.test_data)
+        self.assertEqual(self.lookups("hit") - hits, 1)
+        self.assertEqual(self.lookups("miss") - misses, 1)
+
+    def test_replace_moves_to_the_new_version(self):
+        detail_responses.get(self.user)
+        old_version = user_version(self.user)
+        self.user.first_name = "NewFirst"
+        self.user.updated_at += datetime.timedelta(microseconds=1)
+        detail_responses.replace(self.user, old_version)
+
+        self.assertIsNone(get_cache().get(response_cache_key("detail", self.user.pk, old_version)))
+        self.assertEqual(orjson.loads(detail_responses.get(self.user))["first_name"], "NewFirst")
+
+    def test_works_with_a_shared_file_based_cache(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(CACHES={
+                **settings.CACHES,
+                "responses": {
+                    "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                    "LOCATION": directory,
+                },
+            }):
+                hits = self.lookups("hit")
+                detail_responses.get(self.user)
+                detail_responses.get(self.user)
+                self.assertEqual(self.lookups("hit") - hits, 1)
+                self.assertTrue(os.listdir(directory))
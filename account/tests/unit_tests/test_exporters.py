@@ -0,0 +1,57 @@
+import csv
+import datetime
+import io
+import json
+import os
+import tempfile
+from django.core.management import call_command
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from account.exporters import export_users, get_queryset, parse_fields, parse_timestamp
+from account.models import User
+
+
+class ExportUsersTests(APITestCase):
+
+    def setUp(self):
+        for i in range(3):
+            User.objects.create_user(email=f"test{i}@example.com", password="aA1-K+4fX", first_name="First", last_name="Last")
+
+    def test_exports_csv(self):
+        output = "".join(export_users(get_queryset(), ("email", "first_name"), "csv"))
+        rows = list(csv.reader(io.StringIO(output)))
+        self.assertEqual(rows[0], ["email", "first_name"])
+        self.assertEqual(rows[1:], [[f"test{i}@example.com", "First"] for i in range(3)])
+
+    def test_exports_ndjson(self):
+        output = "".join(export_users(get_queryset(), ("email", "created_at"), "ndjson"))
+        rows = [json.loads(line) for line in output.splitlines()]
+        self.assertEqual([row["email"] for row in rows], [f"test{i}@example.com" for i in range(3)])
+        self.assertIn("created_at", rows[0])
+
+    def test_exports_in_chunks(self):
+        chunks = list(export_users(get_queryset(), ("email",), "ndjson", chunk_size=2))
+        self.assertEqual(len(chunks), 2)
+
+    def test_filters_by_timestamps(self):
+        User.objects.filter(email="test0@example.com").update(created_at=timezone.now() - datetime.timedelta(days=2))
+        yesterday = timezone.now() - datetime.timedelta(days=1)
+        self.assertEqual(get_queryset(created_after=yesterday).count(), 2)
+        self.assertEqual(get_queryset(created_before=yesterday).count(), 1)
+
+    def test_parses_dates_and_datetimes(self):
+        self.assertEqual(parse_timestamp("2022-07-22"), datetime.datetime(2022, 7, 22, tzinfo=datetime.timezone.utc))
+        self.assertEqual(parse_timestamp("2022-07-22T10:00:00Z").hour, 10)
+        with self.assertRaises(ValueError):
+            parse_timestamp("yesterday")
+
+    def test_never_exports_unknown_fields(self):
+        with self.assertRaises(ValueError):
+            parse_fields("email,password")
+
+    def test_command_exports_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "users.ndjson")
+            call_command("export_users", "--format", "ndjson", "--fields", "email", "-o", path)
+            with open(path) as f:
+                self.assertEqual(len(f.readlines()), 3)
@@ -0,0 +1,104 @@
+import multiprocessing
+from concurrent.futures import Future
+from unittest import mock
+from django.conf import settings
+from django.contrib.auth.hashers import identify_hasher
+from django.test import override_settings
+from rest_framework.test import APITestCase
+from account import hashers
+from account.models import User
+
+
+def hashing_settings(**options):
+    return override_settings(PASSWORD_HASHING={**settings.PASSWORD_HASHING, **options})
+
+
+class HashingServiceTests(APITestCase):
+
+    password = "aA1-K+4fX"
+
+    @hashing_settings(POOL_SIZE=0, ITERATIONS=1000)
+    def test_hashes_inline_if_pool_size_is_zero(self):
+        encoded = hashers.make_password(self.password)
+        self.assertTrue(hashers.check_password(self.password, encoded))
+        self.assertFalse(hashers.check_password("wrong", encoded))
+        self.assertIsNone(hashers.get_hashing_service()._executor)
+
+    @hashing_settings(POOL_SIZE=1, ITERATIONS=1000)
+    def test_hashes_in_process_pool(self):
+        if multiprocessing.current_process().daemon:
+            self.skipTest("The parallel test runner's workers can't start processes")
+        encoded = hashers.make_password(self.password)
+        self.assertTrue(hashers.check_password(self.password, encoded))
+        self.assertFalse(hashers.check_password("wrong", encoded))
+        self.assertIsNotNone(hashers.get_hashing_service()._executor)
+
+    @hashing_settings(POOL_SIZE=0, ITERATIONS=1000)
+    def test_records_call_timings(self):
+        service = hashers.get_hashing_service()
+        hashers.make_password(self.password)
+        self.assertEqual(service.calls, 1)
+        self.assertGreater(service.total_time, 0)
+
+    @hashing_settings(POOL_SIZE=1, MAX_PENDING=1, TIMEOUT=0.01)
+    def test_raises_busy_when_no_slot_is_free(self):
+        service = hashers.get_hashing_service()
+        service._slots.acquire()
+        with self.assertRaises(hashers.HashingServiceBusy):
+            hashers.make_password(self.password)
+
+    @hashing_settings(POOL_SIZE=0, ITERATIONS=1000)
+    async def test_hashes_for_async_callers(self):
+        encoded = await hashers.amake_password(self.password)
+        self.assertEqual(hashers.get_hashing_service().calls, 1)
+        self.assertTrue(hashers.check_password(self.password, encoded))
+
+    @hashing_settings(POOL_SIZE=1, MAX_PENDING=1, TIMEOUT=0.01)
+    async def test_raises_busy_for_async_callers_when_no_slot_is_free(self):
+        service = hashers.get_hashing_service()
+        service._slots.acquire()
+        with self.assertRaises(hashers.HashingServiceBusy):
+            await hashers.amake_password(self.password)
+
+    @hashing_settings(POOL_SIZE=1, MAX_PENDING=1, TIMEOUT=0.01)
+    def test_a_call_that_timed_out_keeps_its_slot_until_it_finishes(self):
+        service = hashers.get_hashing_service()
+        running = Future()
+        running.set_running_or_notify_cancel()
+        executor = mock.Mock(submit=mock.Mock(return_value=running))
+        with mock.patch.object(service, "_get_executor", return_value=executor):
+            with self.assertRaises(hashers.HashingServiceBusy):
+                hashers.make_password(self.password)
+        self.assertFalse(service._slots.acquire(blocking=False))
+        running.set_result("done")
+        self.assertTrue(service._slots.acquire(blocking=False))
+
+    def test_unusable_password_never_checks(self):
+        self.assertFalse(hashers.check_password(self.password, hashers.make_password(None)))
+
+
+class RehashOnLoginTests(APITestCase):
+
+    password = "aA1-K+4fX"
+
+    @hashing_settings(POOL_SIZE=0, ITERATIONS=1000)
+    def test_password_is_rehashed_when_work_factor_changes(self):
+        user = User.objects.create_user(email="test@example.com", password=self.password, first_name="First", last_name="Last")
+        self.assertEqual(identify_hasher(user.password).decode(user.password)["iterations"], 1000)
+
+        with hashing_settings(ITERATIONS=2000):
+            self.assertTrue(user.check_password(self.password))
+
+        user.refresh_from_db()
+        self.assertEqual(identify_hasher(user.password).decode(user.password)["iterations"], 2000)
+
+    @hashing_settings(POOL_SIZE=0, ITERATIONS=1000)
+    def test_password_is_not_rehashed_on_failed_login(self):
+        user = User.objects.create_user(email="test@example.com", password=self.password, first_name="First", last_name="Last")
+        encoded = user.password
+
+        with hashing_settings(ITERATIONS=2000):
+            self.assertFalse(user.check_password("wrong"))
+
+        user.refresh_from_db()
+        self.assertEqual(user.password, encoded)
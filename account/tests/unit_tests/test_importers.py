@@ -0,0 +1,116 @@
+import io
+import json
+import os
+import tempfile
+from unittest import mock
+from django.core.management import call_command
+from rest_framework.test import APITestCase
+from account import hashers
+from account.importers import import_users, read_rows
+from account.models import User
+
+
+class ImportUsersTests(APITestCase):
+
+    test_data = {
+        "email": "test@example.com",
+        "password": "aA1-K+4fX",
+        "first_name": "First",
+        "last_name": "Last",
+    }
+
+    def make_rows(self, count):
+        rows = []
+        for i in range(count):
+            data = self.test_data.copy()
+            data["email"] = f"test{i}@example.com"
+            rows.append(data)
+        return rows
+
+    def test_imports_csv(self):
+        stream = io.StringIO(
+            "email,first_name,last_name,password\n"
+            "one@example.com,First,Last,aA1-K+4fX\n"
+            "two@example.com,First,Last,aA1-K+4fX\n"
+        )
+        report = import_users(read_rows(stream, "csv"))
+        self.assertEqual(report.created, 2)
+        self.assertEqual(User.objects.count(), 2)
+        self.assertTrue(User.objects.get(email="one@example.com").check_password("aA1-K+4fX"))
+
+    def test_imports_ndjson(self):
+        stream = io.StringIO("\n".join(json.dumps(row) for row in self.make_rows(3)))
+        report = import_users(read_rows(stream, "ndjson"))
+        self.assertEqual(report.created, 3)
+        self.assertEqual(User.objects.count(), 3)
+
+    def test_imports_in_chunks(self):
+        report = import_users(self.make_rows(5), chunk_size=2)
+        self.assertEqual(report.rows, 5)
+        self.assertEqual(report.created, 5)
+        self.assertEqual(User.objects.count(), 5)
+
+    def test_reports_invalid_rows_without_aborting(self):
+        rows = self.make_rows(3)
+        rows[1]["password"] = "password"
+        rows[2]["first_name"] = ""
+        report = import_users(rows)
+        self.assertEqual(report.created, 1)
+        self.assertEqual(report.failed, 2)
+        self.assertEqual([error["row"] for error in report.errors], [2, 3])
+        self.assertIn("password", report.errors[0]["errors"])
+        self.assertIn("first_name", report.errors[1]["errors"])
+
+    def test_reports_unparseable_rows(self):
+        stream = io.StringIO(json.dumps(self.test_data) + "\n{not json\n[]\n")
+        report = import_users(read_rows(stream, "ndjson"))
+        self.assertEqual(report.created, 1)
+        self.assertEqual([error["row"] for error in report.errors], [2, 3])
+
+    def test_reports_duplicate_emails(self):
+        User.objects.create_user(**self.test_data)
+        rows = self.make_rows(2) + [self.test_data.copy(), self.make_rows(1)[0]]
+        report = import_users(rows, chunk_size=10)
+        self.assertEqual(report.created, 2)
+        self.assertCountEqual([error["row"] for error in report.errors], [3, 4])
+        for error in report.errors:
+            self.assertIn("email", error["errors"])
+
+    def test_reports_duplicate_emails_regardless_of_case(self):
+        User.objects.create_user(**self.test_data)
+        rows = self.make_rows(1) + [self.test_data.copy(), self.make_rows(1)[0]]
+        rows[1]["email"] = rows[1]["email"].upper()
+        rows[2]["email"] = rows[2]["email"].upper()
+        report = import_users(rows)
+        self.assertEqual(report.created, 1)
+        self.assertCountEqual([error["row"] for error in report.errors], [2, 3])
+
+    def test_reports_emails_registered_while_importing(self):
+        make_passwords = hashers.make_passwords
+
+        def register_concurrently(passwords):
+            User.objects.create_user(**{**self.test_data, "email": "TEST1@example.com"})
+            return make_passwords(passwords)
+
+        with mock.patch("account.hashers.make_passwords", side_effect=register_concurrently):
+            report = import_users(self.make_rows(3))
+        self.assertEqual((report.created, report.failed), (2, 1))
+        self.assertEqual(report.errors[0]["row"], 2)
+        self.assertIn("email", report.errors[0]["errors"])
+        self.assertEqual(User.objects.count(), 3)
+
+    def test_caps_reported_errors(self):
+        rows = [{"email": ""} for _ in range(5)]
+        report = import_users(rows, max_errors=2)
+        self.assertEqual(report.failed, 5)
+        self.assertEqual(len(report.errors), 2)
+
+    def test_command_imports_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "users.ndjson")
+            with open(path, "w") as f:
+                f.write("\n".join(json.dumps(row) for row in self.make_rows(2)))
+            stdout = io.StringIO()
+            call_command("import_users", path, stdout=stdout)
+        self.assertEqual(json.loads(stdout.getvalue())["created"], 2)
+        self.assertEqual(User.objects.count(), 2)
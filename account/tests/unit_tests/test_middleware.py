@@ -0,0 +1,57 @@
+from unittest import mock
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.messages import add_message, constants
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from helpers import middleware
+
+
+@override_settings(MESSAGE_STORAGE="django.contrib.messages.storage.cookie.CookieStorage")
+class InlineMiddlewareTests(SimpleTestCase):
+
+    def setUp(self):
+        self.request = RequestFactory().get("/")
+
+    def get_middleware(self, middleware_class, view=None):
+        async def get_response(request):
+            if view is not None:
+                view(request)
+            return HttpResponse("ok")
+        return middleware_class(get_response)
+
+    async def test_hooks_run_without_threads(self):
+        with mock.patch("helpers.middleware.sync_to_async") as to_thread:
+            for middleware_class in (
+                middleware.SecurityMiddleware, middleware.SessionMiddleware, middleware.CommonMiddleware,
+                middleware.CsrfViewMiddleware, middleware.MessageMiddleware, middleware.XFrameOptionsMiddleware,
+            ):
+                with self.subTest(middleware_class.__name__):
+                    response = await self.get_middleware(middleware_class)(self.request)
+                    self.assertEqual(response.content, b"ok")
+        to_thread.assert_not_called()
+
+    async def test_sessions_that_were_read_are_saved_on_a_thread(self):
+        def view(request):
+            request.session.accessed = True
+        session = self.get_middleware(middleware.SessionMiddleware, view)
+        with mock.patch("helpers.middleware.sync_to_async", wraps=sync_to_async) as to_thread:
+            await session(self.request)
+        to_thread.assert_called_once_with(session.process_response, thread_sensitive=True)
+
+    async def test_messages_are_stored_on_a_thread(self):
+        def view(request):
+            add_message(request, constants.INFO, "Saved")
+        messages = self.get_middleware(middleware.MessageMiddleware, view)
+        with mock.patch("helpers.middleware.sync_to_async", wraps=sync_to_async) as to_thread:
+            await messages(self.request)
+        to_thread.assert_called_once_with(messages.process_response, thread_sensitive=True)
+
+    @override_settings(CSRF_USE_SESSIONS=True)
+    def test_csrf_tokens_in_sessions_block(self):
+        csrf = self.get_middleware(middleware.CsrfViewMiddleware)
+        self.assertTrue(csrf.request_blocks(self.request))
+
+    def test_only_replace_the_stock_middleware_under_asgi(self):
+        inline = [path for path in settings.MIDDLEWARE if path.startswith("helpers.middleware.")]
+        self.assertEqual(bool(inline), settings.ASYNC_VIEWS)
@@ -1,3 +1,5 @@
+from unittest import mock
+from django.db import IntegrityError, connection
 from rest_framework.test import APITestCase
 from account.models import User
 
@@ -50,3 +52,56 @@ class UserModelTests(APITestCase):
     def test_creates_superuser_with_is_superuser_status_as_false(self):
         with self.assertRaisesMessage(ValueError, "Superuser must have is_superuser=True."):
             User.objects.create_superuser(email="test@example.com", password="testpassword", first_name="First", last_name="Last", is_superuser=False)
+
+
+class UserEmailTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(email="Test@Example.com", password="testpassword", first_name="First", last_name="Last")
+
+    def test_keeps_email_as_given(self):
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.email, "Test@example.com")
+
+    def test_finds_user_by_email_regardless_of_case(self):
+        self.assertEqual(User.objects.get_by_natural_key("test@EXAMPLE.com"), self.user)
+
+    def test_raises_error_if_email_differs_only_by_case(self):
+        with self.assertRaises(IntegrityError):
+            User.objects.create_user(email="TEST@example.com", password="testpassword", first_name="First", last_name="Last")
+
+    def test_lookup_by_email_uses_the_case_insensitive_index(self):
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                # The test table is tiny, don't let the planner pick a seq scan
+                cursor.execute("SET LOCAL enable_seqscan = off")
+        plan = User.objects.filter_by_email("test@example.com").explain()
+        self.assertIn("account_user_email_ci_uniq", plan)
+
+
+class CreateUserIfNewTests(APITestCase):
+
+    def create(self, email):
+        return User.objects.create_user_if_new(email=email, password="testpassword", first_name="First", last_name="Last")
+
+    def test_creates_a_new_user(self):
+        with self.assertNumQueries(1):
+            user = self.create("test@example.com")
+        self.assertEqual(User.objects.get(pk=user.pk).email, "test@example.com")
+        self.assertFalse(user._state.adding)
+
+    def test_returns_none_if_the_email_is_taken(self):
+        self.create("test@example.com")
+        self.assertIsNone(self.create("TEST@example.com"))
+        self.assertEqual(User.objects.count(), 1)
+
+    def test_catches_the_conflict_on_backends_that_cannot_name_it(self):
+        with mock.patch.object(connection, "vendor", "mysql"):
+            user = self.create("test@example.com")
+            self.assertIsNone(self.create("TEST@example.com"))
+        self.assertEqual(User.objects.get().pk, user.pk)
+
+    def test_only_ignores_conflicts_on_the_email(self):
+        user = User(email="test@example.com", first_name="First", last_name=None, password="!")
+        with self.assertRaises(IntegrityError):
+            User.objects._insert_if_new(user)
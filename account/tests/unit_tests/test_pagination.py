@@ -0,0 +1,57 @@
+import datetime
+from django.utils import timezone
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, APITestCase
+from account.models import User
+from account.pagination import KeysetPagination
+
+
+class KeysetPaginationTests(APITestCase):
+
+    def setUp(self):
+        now = timezone.now()
+        users = [
+            User(email=f"test{i}@example.com", first_name="First", last_name="Last", password="!")
+            for i in range(7)
+        ]
+        User.objects.bulk_create(users)
+        # Three users share a timestamp, so paging has to break ties on id
+        for i, user in enumerate(User.objects.order_by("id")):
+            created_at = now - datetime.timedelta(minutes=min(i, 3))
+            User.objects.filter(pk=user.pk).update(created_at=created_at)
+        self.expected = list(User.objects.order_by("-created_at", "-id"))
+
+    def paginate(self, **params):
+        request = Request(APIRequestFactory().get("/users", params))
+        paginator = KeysetPagination()
+        return paginator, paginator.paginate_queryset(User.objects.all(), request)
+
+    def test_walks_all_pages_in_order(self):
+        seen = []
+        params = {"page_size": 2}
+        while True:
+            paginator, page = self.paginate(**params)
+            seen.extend(page)
+            if paginator.next_cursor is None:
+                break
+            params["cursor"] = paginator.next_cursor
+        self.assertEqual(seen, self.expected)
+
+    def test_last_page_has_no_next_link(self):
+        paginator, page = self.paginate(page_size=10)
+        self.assertEqual(len(page), 7)
+        self.assertIsNone(paginator.get_next_link())
+
+    def test_page_size_is_capped(self):
+        paginator, page = self.paginate(page_size=10000)
+        self.assertEqual(paginator.page_size, KeysetPagination.max_page_size)
+
+    def test_invalid_cursor_is_rejected(self):
+        with self.assertRaises(NotFound):
+            self.paginate(cursor="not-a-cursor")
+
+    def test_page_is_a_single_query(self):
+        paginator, page = self.paginate(page_size=2)
+        with self.assertNumQueries(1):
+            self.paginate(page_size=2, cursor=paginator.next_cursor)
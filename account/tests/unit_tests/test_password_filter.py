@@ -0,0 +1,102 @@
+import io
+import os
+import tempfile
+from django.core.exceptions import ValidationError
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase
+from account.password_filter import PasswordFilter, build_filter, error_rate, parameters
+from account.validators import BreachedPasswordValidator
+
+
+class PasswordFilterTests(SimpleTestCase):
+
+    test_data = {
+        "passwords": ["password", "123456", "Password1!", "letmein", "  qwerty  "],
+        "missing": ["aA1-K+4fX", "bB2/L*5gY", "correct horse battery staple"],
+    }
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = os.path.join(self.directory.name, "passwords.filter")
+
+    def build(self, passwords, **kwargs):
+        build_filter(passwords, self.path, len(passwords), **kwargs)
+        filter = PasswordFilter(self.path)
+        self.addCleanup(filter.close)
+        return filter
+
+    def test_finds_every_password_it_was_built_with(self):
+        filter = self.build(self.test_data["passwords"])
+        for password in self.test_data["passwords"]:
+            self.assertIn(password, filter)
+
+    def test_does_not_find_passwords_it_was_not_built_with(self):
+        filter = self.build(self.test_data["passwords"])
+        for password in self.test_data["missing"]:
+            self.assertNotIn(password, filter)
+
+    def test_compares_lower_cased_and_stripped(self):
+        filter = self.build(self.test_data["passwords"])
+        self.assertIn("PASSWORD", filter)
+        self.assertIn("qwerty", filter)
+        self.assertIn(" LetMeIn", filter)
+
+    def test_false_positive_rate_is_near_the_target(self):
+        passwords = [f"leaked-{i}" for i in range(20000)]
+        filter = self.build(passwords, target=0.01)
+        false_positives = sum(f"other-{i}" in filter for i in range(20000))
+        self.assertLess(false_positives / 20000, 0.02)
+
+    def test_parameters_meet_the_target(self):
+        words, bits = parameters(100000, 0.001)
+        self.assertLessEqual(error_rate(100000, words, bits), 0.001)
+        self.assertGreater(error_rate(100000, words - 1, bits), 0.001)
+
+    def test_opens_the_file_on_first_lookup(self):
+        self.build(self.test_data["passwords"])
+        filter = PasswordFilter(self.path)
+        self.addCleanup(filter.close)
+        self.assertIsNone(filter._map)
+        self.assertIn("password", filter)
+        self.assertIsNotNone(filter._map)
+
+    def test_rejects_other_files(self):
+        with open(self.path, "wb") as f:
+            f.write(b"not a filter" * 100)
+        with self.assertRaises(ValueError):
+            "password" in PasswordFilter(self.path)
+
+    def test_rejects_truncated_filter(self):
+        self.build(self.test_data["passwords"])
+        with open(self.path, "r+b") as f:
+            f.truncate(os.path.getsize(self.path) - 8)
+        with self.assertRaises(ValueError):
+            "password" in PasswordFilter(self.path)
+
+    def test_build_command_counts_the_list(self):
+        source = os.path.join(self.directory.name, "passwords.txt")
+        with open(source, "w") as f:
+            f.write("\n".join(self.test_data["passwords"]) + "\n\n")
+        out = io.StringIO()
+        call_command("build_password_filter", source, "--output", self.path, stdout=out)
+        self.assertIn("Wrote 5 passwords", out.getvalue())
+        filter = PasswordFilter(self.path)
+        self.addCleanup(filter.close)
+        self.assertIn("letmein", filter)
+        self.assertNotIn("aA1-K+4fX", filter)
+
+    def test_build_command_needs_a_count_for_standard_input(self):
+        with self.assertRaises(CommandError):
+            call_command("build_password_filter", "-", "--output", self.path)
+
+
+class BreachedPasswordValidatorTests(SimpleTestCase):
+
+    def test_rejects_common_password(self):
+        with self.assertRaises(ValidationError) as cm:
+            BreachedPasswordValidator().validate("Password1!")
+        self.assertEqual(cm.exception.code, "password_breached")
+
+    def test_accepts_uncommon_password(self):
+        self.assertIsNone(BreachedPasswordValidator().validate("aA1-K+4fX"))
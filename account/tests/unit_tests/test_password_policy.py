@@ -0,0 +1,114 @@
+from string import punctuation
+from unittest import mock
+from django.contrib.auth import password_validation
+from django.core.exceptions import ValidationError
+from django.test import SimpleTestCase, override_settings
+from django.utils import translation
+from account.password_policy import MARKER_BASE, PasswordPolicy, get_password_policy
+from account.validators import CharacterClassValidator, LowerCaseValidator, PunctuationValidator
+
+
+def codes(errors):
+    return [error.code for error in errors]
+
+
+def django_codes(password, user=None):
+    try:
+        password_validation.validate_password(password, user)
+    except ValidationError as e:
+        return [error.code for error in e.error_list]
+    return []
+
+
+class PasswordPolicyTests(SimpleTestCase):
+
+    test_data = {
+        "valid": "aA1-K+4fX",
+        "passwords": [
+            "aA1-K+4fX",
+            "",
+            "short",
+            "A1R+=W-@TE",
+            "a1r+=w-@te",
+            "ArR+=w-@Tte",
+            "ArR1w4Tte",
+            "ñÑ١٢۳،؛",
+            "aaaaaaaaaaaaaaaa",
+            "\U000F0000\U000F0001\U000F0002\U000F0003",
+        ],
+    }
+
+    def test_valid_password_has_no_violations(self):
+        policy = get_password_policy()
+        self.assertEqual(policy.violations(self.test_data["valid"]), [])
+        self.assertIsNone(policy.validate(self.test_data["valid"]))
+
+    def test_same_violations_as_validate_password(self):
+        policy = get_password_policy()
+        for password in self.test_data["passwords"]:
+            with self.subTest(password=password):
+                self.assertEqual(codes(policy.violations(password)), django_codes(password))
+
+    def test_returns_every_violation_at_once(self):
+        with self.assertRaises(ValidationError) as cm:
+            get_password_policy().validate("")
+        self.assertEqual(codes(cm.exception.error_list), [
+            "password_too_short",
+            "password_must_contain_lowercase_letter",
+            "password_must_contain_uppercase_letter",
+            "password_must_contain_digits",
+            "password_must_contain_punctuation",
+        ])
+
+    def test_messages_match_validate_password(self):
+        with self.assertRaises(ValidationError) as expected:
+            password_validation.validate_password("short")
+        with self.assertRaises(ValidationError) as actual:
+            get_password_policy().validate("short")
+        self.assertEqual(actual.exception.messages, expected.exception.messages)
+
+    def test_messages_are_translated_when_rendered(self):
+        validator = PunctuationValidator()
+        with self.assertRaises(ValidationError) as cm:
+            validator.validate("a")
+        with mock.patch.object(translation._trans, "gettext", side_effect=lambda message: f"Translated: {message}"):
+            self.assertEqual(cm.exception.messages, [
+                f"Translated: This password must contain at least one punctuation {punctuation}.",
+            ])
+            self.assertEqual(
+                validator.get_help_text(),
+                f"Translated: Your password must contain at least one punctuation {punctuation}.",
+            )
+
+    def test_marker_characters_in_password_do_not_count(self):
+        password = "".join(chr(MARKER_BASE + n) for n in range(16)) * 2
+        self.assertIn("password_must_contain_lowercase_letter", codes(get_password_policy().violations(password)))
+
+    def test_validate_many(self):
+        passwords = self.test_data["passwords"]
+        results = get_password_policy().validate_many(passwords)
+        self.assertEqual([codes(errors) for errors in results], [django_codes(password) for password in passwords])
+
+    @override_settings(AUTH_PASSWORD_VALIDATORS=[
+        {"NAME": "django.contrib.auth.password_validation.CommonPasswordValidator"},
+        {"NAME": "account.validators.DigitValidator"},
+    ])
+    def test_calls_validators_it_does_not_compile(self):
+        self.assertEqual(codes(get_password_policy().violations("password")), [
+            "password_too_common",
+            "password_must_contain_digits",
+        ])
+
+    def test_overlapping_classes(self):
+        class VowelValidator(CharacterClassValidator):
+            characters = "aeiou"
+            message = "Needs a vowel."
+            code = "password_must_contain_vowel"
+
+        policy = PasswordPolicy([LowerCaseValidator(), VowelValidator()])
+        self.assertEqual(codes(policy.violations("xyz")), ["password_must_contain_vowel"])
+        self.assertEqual(codes(policy.violations("xyza")), [])
+        self.assertEqual(codes(policy.violations("XYZ")), [
+            "password_must_contain_lowercase_letter",
+            "password_must_contain_vowel",
+        ])
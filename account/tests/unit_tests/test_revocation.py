@@ -0,0 +1,127 @@
+import datetime
+import time
+
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from account.models import RevokedToken, User
+from account.revocation import RevocationSet, Revocations
+
+
+class RevocationSetTests(TestCase):
+
+    def setUp(self):
+        self.revoked = RevocationSet()
+        self.now = time.time()
+
+    def test_revoked_jti(self):
+        self.revoked.add_token("a" * 32, self.now + 300)
+        self.assertTrue(self.revoked.is_revoked("a" * 32))
+        self.assertFalse(self.revoked.is_revoked("b" * 32))
+
+    def test_user_tokens_below_version_are_revoked(self):
+        self.revoked.add_user(1, 2, self.now + 300)
+        self.assertTrue(self.revoked.is_revoked("a" * 32, 1, 1))
+        self.assertFalse(self.revoked.is_revoked("a" * 32, 1, 2))
+        self.assertFalse(self.revoked.is_revoked("a" * 32, 2, 0))
+
+    def test_user_version_only_goes_up(self):
+        self.revoked.add_user(1, 3, self.now + 300)
+        self.revoked.add_user(1, 2, self.now + 300)
+        self.assertTrue(self.revoked.is_revoked(None, 1, 2))
+
+    def test_prune_drops_expired_entries(self):
+        self.revoked.add_token("a" * 32, self.now + 30)
+        self.revoked.add_token("b" * 32, self.now + 3600)
+        self.revoked.add_user(1, 1, self.now + 30)
+        self.assertEqual(len(self.revoked), 3)
+
+        self.revoked.prune(self.now + 120)
+        self.assertEqual(len(self.revoked), 1)
+        self.assertFalse(self.revoked.is_revoked("a" * 32, 1, 0))
+        self.assertTrue(self.revoked.is_revoked("b" * 32))
+
+    def test_prune_keeps_entries_extended_later(self):
+        self.revoked.add_token("a" * 32, self.now + 30)
+        self.revoked.add_token("a" * 32, self.now + 3600)
+        self.revoked.prune(self.now + 120)
+        self.assertTrue(self.revoked.is_revoked("a" * 32))
+
+
+class RevocationsTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="test@example.com", password="aA1-K+4fX", first_name="First", last_name="Last"
+        )
+
+    def test_revocations_from_other_workers_are_picked_up_on_poll(self):
+        worker, other_worker = Revocations(poll_interval=60), Revocations(poll_interval=60)
+        worker.sync()
+        token = RefreshToken.for_user(self.user)
+
+        other_worker.revoke_token(token)
+        self.assertTrue(other_worker.is_revoked(token))
+        # Not due to poll yet
+        with self.assertNumQueries(0):
+            self.assertFalse(worker.is_revoked(token))
+
+        worker.sync(force=True)
+        self.assertTrue(worker.is_revoked(token))
+
+    def test_stale_tokens_from_other_workers_are_picked_up_on_poll(self):
+        worker, other_worker = Revocations(poll_interval=60), Revocations(poll_interval=60)
+        worker.sync()
+        refresh = RefreshToken.for_user(self.user)
+        refresh["auth_version"] = self.user.auth_version
+        access = refresh.access_token
+
+        self.user.auth_version += 1
+        self.user.save()
+        other_worker.mark_stale(self.user)
+        self.assertTrue(other_worker.is_stale(access))
+        # Not due to poll yet: the other worker's change isn't known here
+        with self.assertNumQueries(0):
+            self.assertFalse(worker.is_stale(access))
+
+        worker.sync(force=True)
+        self.assertTrue(worker.is_stale(access))
+        # Refresh tokens still bring the claims up to date
+        self.assertFalse(worker.is_revoked(refresh))
+
+    def test_poll_only_reads_recent_rows(self):
+        worker = Revocations(poll_interval=60)
+        worker.revoke_user(self.user)
+        worker.sync(force=True)
+        token = RefreshToken.for_user(self.user)
+        Revocations(poll_interval=60).revoke_token(token)
+        RevokedToken.objects.filter(jti=token["jti"]).update(
+            created_at=timezone.now() - Revocations.overlap - datetime.timedelta(minutes=1),
+        )
+        worker.set.clear()
+        worker.sync(force=True)
+        # The user's revocation is recent enough to be read again, the token's
+        # from before the last poll isn't
+        self.assertEqual(len(worker.set), 1)
+        self.assertFalse(worker.is_revoked(token))
+
+    def test_rows_committed_after_a_later_poll_are_picked_up(self):
+        worker = Revocations(poll_interval=60)
+        worker.sync(force=True)
+        # A row stamped before the poll, whose transaction commits after it,
+        # or written by a host whose clock is behind
+        token = RefreshToken.for_user(self.user)
+        Revocations(poll_interval=60).revoke_token(token)
+        RevokedToken.objects.filter(jti=token["jti"]).update(created_at=timezone.now() - datetime.timedelta(seconds=30))
+        worker.sync(force=True)
+        self.assertTrue(worker.is_revoked(token))
+
+    def test_expired_rows_are_not_loaded(self):
+        token = RefreshToken.for_user(self.user)
+        token["exp"] = int(time.time()) - 60
+        Revocations(poll_interval=60).revoke_token(token)
+
+        worker = Revocations(poll_interval=60)
+        worker.sync()
+        self.assertEqual(len(worker.set), 0)
@@ -0,0 +1,134 @@
+import datetime
+import decimal
+import io
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework import serializers
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+from account.models import User
+from account.serializers import DetailSerializer, UserListSerializer
+from helpers.parsers import ORJSONParser
+from helpers.renderers import ORJSONRenderer
+from helpers.serializers import CompiledSerializerMixin
+
+
+def uncompiled(serializer_class):
+    return type(serializer_class.__name__, (serializer_class,), {
+        "to_representation": serializers.Serializer.to_representation,
+    })
+
+
+class ORJSONRendererTests(APITestCase):
+
+    test_data = {
+        "email": "test@example.com",
+        "unicode": "Ādé     ✓",
+        "created_at": datetime.datetime(2022, 7, 1, 12, 30, 15, 123456, tzinfo=datetime.timezone.utc),
+        "date": datetime.date(2022, 7, 1),
+        "amount": decimal.Decimal("12.50"),
+        "lazy": gettext_lazy("This field is required."),
+        "nested": [{"id": 1, "ok": True, "none": None, "ratio": 0.5}],
+    }
+
+    def test_renders_like_json_renderer(self):
+        self.assertEqual(ORJSONRenderer().render(self.test_data), JSONRenderer().render(self.test_data))
+
+    def test_renders_none_as_empty(self):
+        self.assertEqual(ORJSONRenderer().render(None), b"")
+
+    def test_falls_back_for_what_orjson_cannot_render(self):
+        data = {1: "int key", "big": 2 ** 70}
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_indents_when_asked(self):
+        rendered = ORJSONRenderer().render({"a": 1}, "application/json; indent=4")
+        self.assertEqual(rendered, b'{\n  "a": 1\n}')
+
+
+class ORJSONParserTests(APITestCase):
+
+    def parse(self, body):
+        return ORJSONParser().parse(io.BytesIO(body))
+
+    def test_parses_json(self):
+        self.assertEqual(self.parse(b'{"email": "t\\u00e9st@example.com", "n": [1, 2.5]}'), {
+            "email": "tést@example.com",
+            "n": [1, 2.5],
+        })
+
+    def test_parses_other_encodings(self):
+        body = '{"name": "Ādé"}'.encode("utf-16")
+        self.assertEqual(ORJSONParser().parse(io.BytesIO(body), parser_context={"encoding": "utf-16"}), {"name": "Ādé"})
+
+    def test_raises_the_same_parse_error(self):
+        for body in (b'{"email": ', b'{"n": NaN}', b"\xff"):
+            with self.subTest(body=body):
+                with self.assertRaises(ParseError) as expected:
+                    JSONParser().parse(io.BytesIO(body))
+                with self.assertRaises(ParseError) as actual:
+                    self.parse(body)
+                self.assertEqual(actual.exception.detail, expected.exception.detail)
+
+
+class CompiledSerializerTests(APITestCase):
+
+    test_data = {
+        "email": "test@example.com",
+        "first_name": "Fírst",
+        "last_name": "Last",
+    }
+
+    def setUp(self):
+        self.user = User(id=7, created_at=timezone.now(), **self.test_data)
+
+    def test_detail_serializer_output_is_unchanged(self):
+        self.assertEqual(DetailSerializer(self.user).data, uncompiled(DetailSerializer)(self.user).data)
+
+    def test_user_list_serializer_output_is_unchanged(self):
+        users = [self.user, User(id=8, email="other@example.com", first_name="", last_name="", created_at=timezone.now())]
+        self.assertEqual(
+            UserListSerializer(users, many=True).data,
+            uncompiled(UserListSerializer)(users, many=True).data,
+        )
+
+    def test_nulls_stay_null(self):
+        self.user.created_at = None
+        self.assertIsNone(UserListSerializer(self.user).data["created_at"])
+
+    def test_calls_methods(self):
+        class NameSerializer(CompiledSerializerMixin, serializers.ModelSerializer):
+            username = serializers.CharField(source="get_username", read_only=True)
+
+            class Meta:
+                model = User
+                fields = ("email", "username")
+                read_only_fields = ("email",)
+
+        self.assertEqual(NameSerializer(self.user).data, {"email": "test@example.com", "username": "test@example.com"})
+
+    def test_instances_without_the_attributes_take_the_regular_path(self):
+        self.assertEqual(DetailSerializer({"email": "test@example.com", "first_name": "A", "last_name": "B"}).data, {
+            "email": "test@example.com",
+            "first_name": "A",
+            "last_name": "B",
+        })
+
+    def test_refuses_writable_fields(self):
+        class WritableSerializer(CompiledSerializerMixin, serializers.ModelSerializer):
+            class Meta:
+                model = User
+                fields = ("email",)
+
+        with self.assertRaises(ImproperlyConfigured):
+            WritableSerializer(self.user).data
+
+    def test_refuses_method_fields(self):
+        class MethodSerializer(CompiledSerializerMixin, serializers.Serializer):
+            name = serializers.SerializerMethodField()
+
+        with self.assertRaises(ImproperlyConfigured):
+            MethodSerializer(self.user).data
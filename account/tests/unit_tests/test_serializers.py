@@ -88,6 +88,13 @@ class RegisterSerializerTests(APITestCase):
         self.assertFalse(serializer.is_valid())
         self.assertIn("password", serializer.errors)
 
+    def test_serializer_is_invalid_if_password_is_common(self):
+        data = self.test_data.copy()
+        data["password"] = "Password1!"
+        serializer = RegisterSerializer(data=data)
+        self.assertFalse(serializer.is_valid())
+        self.assertIn("password", serializer.errors)
+
     def test_serializer_creates_user_if_input_data_is_valid(self):
         data = self.test_data.copy()
         serializer = RegisterSerializer(data=data)
@@ -0,0 +1,67 @@
+import io
+import json
+import os
+import runpy
+from unittest import mock
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase
+from account.management.commands.startup_time import parse_importtime
+
+
+class StartupTimeTests(SimpleTestCase):
+
+    test_data = {
+        "output": (
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       267 |        267 |   _io\n"
+            "import time:      1200 |       1500 |     json.decoder\n"
+            "import time:       300 |       1800 |   json\n"
+            "something else on stderr\n"
+        ),
+    }
+
+    def test_parses_importtime_output(self):
+        self.assertEqual(parse_importtime(self.test_data["output"]), [
+            ("_io", 267, 267),
+            ("json.decoder", 1200, 1500),
+            ("json", 300, 1800),
+        ])
+
+    def test_reports_modules_as_json(self):
+        out = io.StringIO()
+        call_command("startup_time", "--application", "json", "--repeat", "1", "--json", stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertEqual(report["application"], "json")
+        self.assertGreater(report["process_ms"], report["import_ms"])
+        self.assertIn("json", [row["module"] for row in report["modules"]])
+
+    def test_adds_up_packages(self):
+        out = io.StringIO()
+        call_command("startup_time", "--application", "json", "--repeat", "1", "--by-package", "--limit", "0", stdout=out)
+        packages = [line.split()[-1] for line in out.getvalue().splitlines()[2:]]
+        self.assertIn("json", packages)
+        self.assertNotIn("json.decoder", packages)
+
+    def test_fails_on_import_errors(self):
+        with self.assertRaises(CommandError):
+            call_command("startup_time", "--application", "no_such_module", "--repeat", "1", stdout=io.StringIO())
+
+
+class GunicornConfigTests(SimpleTestCase):
+
+    def load(self, **env):
+        with mock.patch.dict(os.environ, env):
+            return runpy.run_path(str(settings.BASE_DIR / "gunicorn.conf.py"))
+
+    def test_serves_wsgi_with_threads_by_default(self):
+        config = self.load()
+        self.assertEqual(config["worker_class"], "gthread")
+        self.assertEqual(config["wsgi_app"], "Credity.wsgi:application")
+        self.assertTrue(config["preload_app"])
+
+    def test_serves_asgi_with_uvicorn_workers(self):
+        config = self.load(GUNICORN_WORKER_CLASS="uvicorn", WEB_CONCURRENCY="3")
+        self.assertEqual(config["worker_class"], "uvicorn.workers.UvicornWorker")
+        self.assertEqual(config["wsgi_app"], "Credity.asgi:application")
+        self.assertEqual(config["workers"], 3)
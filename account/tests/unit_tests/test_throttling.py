@@ -0,0 +1,85 @@
+import os
+import tempfile
+from rest_framework.test import APITestCase
+from account.throttling import LocalBucketStore, SharedMemoryBucketStore, parse_rate
+
+
+class ParseRateTests(APITestCase):
+
+    def test_parses_drf_style_rates(self):
+        self.assertEqual(parse_rate("10/min"), (10, 10 / 60))
+        self.assertEqual(parse_rate("1/s"), (1, 1))
+        self.assertEqual(parse_rate("24/day"), (24, 24 / 86400))
+
+
+class BucketStoreTestsMixin:
+
+    def test_allows_up_to_capacity_then_denies(self):
+        results = [self.store.consume("key", 3, 1, now=100)[0] for _ in range(4)]
+        self.assertEqual(results, [True, True, True, False])
+
+    def test_reports_wait_until_next_token(self):
+        for _ in range(2):
+            self.store.consume("key", 2, 0.5, now=100)
+        allowed, wait = self.store.consume("key", 2, 0.5, now=100)
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(wait, 2)
+
+    def test_refills_over_time(self):
+        for _ in range(2):
+            self.store.consume("key", 2, 1, now=100)
+        self.assertFalse(self.store.consume("key", 2, 1, now=100)[0])
+        self.assertTrue(self.store.consume("key", 2, 1, now=101)[0])
+
+    def test_keys_are_independent(self):
+        self.store.consume("one", 1, 1, now=100)
+        self.assertFalse(self.store.consume("one", 1, 1, now=100)[0])
+        self.assertTrue(self.store.consume("two", 1, 1, now=100)[0])
+
+    def test_clear_refills_all_buckets(self):
+        self.store.consume("key", 1, 1, now=100)
+        self.store.clear()
+        self.assertTrue(self.store.consume("key", 1, 1, now=100)[0])
+
+
+class LocalBucketStoreTests(BucketStoreTestsMixin, APITestCase):
+
+    def setUp(self):
+        self.store = LocalBucketStore()
+
+    def test_evicts_least_recently_used_keys(self):
+        store = LocalBucketStore(max_keys=2)
+        store.consume("one", 1, 1, now=100)
+        store.consume("two", 1, 1, now=100)
+        store.consume("three", 1, 1, now=100)
+        self.assertTrue(store.consume("one", 1, 1, now=100)[0])
+        self.assertFalse(store.consume("three", 1, 1, now=100)[0])
+
+
+class SharedMemoryBucketStoreTests(BucketStoreTestsMixin, APITestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "throttle")
+        self.store = SharedMemoryBucketStore(path=self.path, slots=64)
+
+    def test_counts_are_shared_through_the_file(self):
+        self.store.consume("key", 1, 1, now=100)
+        other = SharedMemoryBucketStore(path=self.path, slots=64)
+        self.assertFalse(other.consume("key", 1, 1, now=100)[0])
+
+    def test_counts_are_shared_with_forked_processes(self):
+        self.store.consume("key", 2, 1, now=100)
+        pid = os.fork()
+        if pid == 0:
+            self.store.consume("key", 2, 1, now=100)
+            os._exit(0)
+        os.waitpid(pid, 0)
+        self.assertFalse(self.store.consume("key", 2, 1, now=100)[0])
+
+    def test_reuses_least_recently_updated_slot_when_full(self):
+        store = SharedMemoryBucketStore(path=self.path + "-small", slots=1)
+        store.consume("one", 1, 1, now=100)
+        store.consume("two", 1, 1, now=101)
+        self.assertFalse(store.consume("two", 1, 1, now=101)[0])
@@ -0,0 +1,222 @@
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from rest_framework.throttling import BaseThrottle
+
+
+def parse_rate(rate):
+    """
+    Turn a DRF style rate such as "10/min" into (capacity, tokens per second).
+    """
+    num, period = rate.split("/")
+    num = int(num)
+    duration = {"s": 1, "m": 60, "h": 3600, "d": 86400}[period[0]]
+    return num, num / duration
+
+
+def _refill(tokens, updated, capacity, refill_rate, now):
+    return min(capacity, tokens + (now - updated) * refill_rate)
+
+
+class LocalBucketStore:
+    """
+    Token buckets in this process's memory. Each gunicorn worker counts on
+    its own, so the effective limit is the rate times the number of workers.
+    """
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, key, capacity, refill_rate, now=None):
+        """
+        Take a token from the key's bucket. Return whether one was available
+        and, if not, how many seconds until one will be.
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (capacity, now))
+            tokens = _refill(tokens, updated, capacity, refill_rate, now)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            # Least recently used buckets go first, they've refilled the most
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return allowed, 0.0 if allowed else (1 - tokens) / refill_rate
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class SharedMemoryBucketStore:
+    """
+    Token buckets in a memory-mapped file, so every worker on the host shares
+    the same counts. The file is a fixed-size open addressing table of
+    (key hash, tokens, last update) slots guarded by an flock; when a key's
+    probe run is full the least recently updated slot is reused.
+    """
+
+    slot = struct.Struct("<Qdd")
+    probes = 8
+
+    def __init__(self, path=None, slots=65536):
+        if path is None:
+            directory = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+            path = os.path.join(directory, "credity-throttle")
+        self.path = path
+        self.slots = slots
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def _open(self):
+        # flock is shared by forked processes through the inherited file
+        # description, so every process opens the file itself.
+        if self._pid != os.getpid():
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            size = self.slots * self.slot.size
+            if os.fstat(fd).st_size < size:
+                os.ftruncate(fd, size)
+            self._fd = fd
+            self._map = mmap.mmap(fd, size)
+            self._pid = os.getpid()
+
+    def _hash(self, key):
+        # 0 marks an empty slot
+        return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little") or 1
+
+    def consume(self, key, capacity, refill_rate, now=None):
+        now = time.time() if now is None else now
+        key_hash = self._hash(key)
+        with self._lock:
+            self._open()
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                offset, tokens, updated = self._find(key_hash, capacity, now)
+                tokens = _refill(tokens, updated, capacity, refill_rate, now)
+                allowed = tokens >= 1
+                if allowed:
+                    tokens -= 1
+                self.slot.pack_into(self._map, offset, key_hash, tokens, now)
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+        return allowed, 0.0 if allowed else (1 - tokens) / refill_rate
+
+    def _find(self, key_hash, capacity, now):
+        oldest = None
+        start = key_hash % self.slots
+        for probe in range(self.probes):
+            offset = ((start + probe) % self.slots) * self.slot.size
+            slot_hash, tokens, updated = self.slot.unpack_from(self._map, offset)
+            if slot_hash == key_hash:
+                return offset, tokens, updated
+            if slot_hash == 0:
+                return offset, capacity, now
+            if oldest is None or updated < oldest[1]:
+                oldest = (offset, updated)
+        return oldest[0], capacity, now
+
+    def clear(self):
+        with self._lock:
+            self._open()
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                self._map[:] = bytes(len(self._map))
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+
+_store = None
+
+
+def get_store():
+    global _store
+    if _store is None:
+        config = settings.ACCOUNT_THROTTLE
+        _store = import_string(config["BACKEND"])(**config.get("OPTIONS", {}))
+    return _store
+
+
+@receiver(setting_changed)
+def reset_store(*, setting, **kwargs):
+    global _store
+    if setting == "ACCOUNT_THROTTLE":
+        _store = None
+
+
+class BucketThrottle(BaseThrottle):
+    """
+    Token bucket throttle for views with a throttle_scope, like DRF's
+    ScopedRateThrottle. The rate comes from ACCOUNT_THROTTLE["RATES"] under
+    "<scope>_<kind>"; views whose scope has no rate for this kind aren't
+    throttled by it.
+
+    Throttles run in APIView.initial(), before the handler, so over-limit
+    clients are turned away before any password is hashed.
+    """
+
+    kind = None
+
+    def get_key(self, request, view):
+        raise NotImplementedError(".get_key() must be overridden")
+
+    def allow_request(self, request, view):
+        self.wait_time = None
+        scope = getattr(view, "throttle_scope", None)
+        rate = settings.ACCOUNT_THROTTLE["RATES"].get(f"{scope}_{self.kind}") if scope else None
+        if rate is None:
+            return True
+
+        key = self.get_key(request, view)
+        if key is None:
+            return True
+
+        capacity, refill_rate = parse_rate(rate)
+        allowed, self.wait_time = get_store().consume(f"{scope}:{self.kind}:{key}", capacity, refill_rate)
+        return allowed
+
+    def wait(self):
+        return self.wait_time
+
+
+class IPThrottle(BucketThrottle):
+    """
+    Keyed on the client address, as far as REST_FRAMEWORK["NUM_PROXIES"]
+    trusts X-Forwarded-For.
+    """
+
+    kind = "ip"
+
+    def get_key(self, request, view):
+        return self.get_ident(request)
+
+
+class EmailThrottle(BucketThrottle):
+
+    kind = "email"
+
+    def get_key(self, request, view):
+        email = request.data.get("email") if hasattr(request.data, "get") else None
+        return email.strip().lower() if isinstance(email, str) and email.strip() else None
+
+
+class UserThrottle(BucketThrottle):
+
+    kind = "user"
+
+    def get_key(self, request, view):
+        return request.user.pk if request.user.is_authenticated else None
@@ -1,13 +1,31 @@
+from django.conf import settings
 from django.urls import path
-from account import views
-from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from account import async_views, views
+
+# Under ASGI the endpoints that have an async variant are served by it
+if settings.ASYNC_VIEWS:
+    RegisterView = async_views.AsyncRegisterAPIView
+    DetailView = async_views.AsyncDetailAPIView
+    UpdateView = async_views.AsyncUpdateAPIView
+    ChangeAuthView = async_views.AsyncChangeAuthView
+    DeleteView = async_views.AsyncDeleteAPIView
+else:
+    RegisterView = views.RegisterAPIView
+    DetailView = views.DetailAPIView
+    UpdateView = views.UpdateAPIView
+    ChangeAuthView = views.ChangeAuthView
+    DeleteView = views.DeleteAPIView
 
 urlpatterns = [
-    path("register", views.RegisterAPIView.as_view(), name="register"),
-    path("token", TokenObtainPairView.as_view(), name="token_obtain_pair"),
-    path("token/refresh", TokenRefreshView.as_view(), name="token_refresh"),
-    path("detail", views.DetailAPIView.as_view(), name="user_detail"),
-    path("update", views.UpdateAPIView.as_view(), name="user_update"),
-    path("change-auth", views.ChangeAuthView.as_view(), name="change_auth"),
-    path("delete", views.DeleteAPIView.as_view(), name="user_delete"),
+    path("register", RegisterView.as_view(), name="register"),
+    path("token", views.TokenAPIView.as_view(), name="token_obtain_pair"),
+    path("token/refresh", views.TokenRefreshAPIView.as_view(), name="token_refresh"),
+    path("logout", views.LogoutAPIView.as_view(), name="logout"),
+    path("detail", DetailView.as_view(), name="user_detail"),
+    path("update", UpdateView.as_view(), name="user_update"),
+    path("change-auth", ChangeAuthView.as_view(), name="change_auth"),
+    path("delete", DeleteView.as_view(), name="user_delete"),
+    path("users", views.UserListAPIView.as_view(), name="user_list"),
+    path("import", views.ImportAPIView.as_view(), name="user_import"),
+    path("export", views.ExportAPIView.as_view(), name="user_export"),
 ]
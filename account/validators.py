@@ -1,75 +1,85 @@
 from django.core.exceptions import ValidationError
-from django.utils.translation import gettext as _
+from django.utils.translation import gettext as _, gettext_lazy
+from pathlib import Path
 from string import ascii_lowercase, ascii_uppercase, digits, punctuation
 
+from account.password_filter import PasswordFilter
 
-class LowerCaseValidator:
 
-    def validate(self, password, user=None):
-        contains_lower = False
-        for character in password:
-            if character in ascii_lowercase:
-                contains_lower = True
-                break
-        if not contains_lower:
-            raise ValidationError(
-                _("This password must contain at least one lowercase letter."),
-                code="password_must_contain_lowercase_letter",
-            )
-    
-    def get_help_text(self):
-        return _("Your password must contain at least one lowercase letter.")
+class CharacterClassValidator:
+    """
+    Requires at least one character from `characters`. The password policy
+    compiles these into a single pass over the password, see
+    account.password_policy.
 
+    Subclasses mark `message` and `help_text` for translation where they
+    define them; both may refer to the characters as %(characters)s.
+    """
 
-class UpperCaseValidator:
+    characters = ""
+    message = ""
+    code = ""
+    help_text = ""
 
     def validate(self, password, user=None):
-        contains_upper = False
-        for character in password:
-            if character in ascii_uppercase:
-                contains_upper = True
-                break
-        if not contains_upper:
-            raise ValidationError(
-                _("This password must contain at least one uppercase letter."),
-                code="password_must_contain_uppercase_letter",
-            )
-        
+        if not any(character in self.characters for character in password):
+            raise ValidationError(self.message, code=self.code, params={"characters": self.characters})
+
     def get_help_text(self):
-        return _("Your password must contain at least one uppercase letter.")
+        return self.help_text % {"characters": self.characters}
 
 
-class DigitValidator:
+class LowerCaseValidator(CharacterClassValidator):
+
+    characters = ascii_lowercase
+    message = gettext_lazy("This password must contain at least one lowercase letter.")
+    code = "password_must_contain_lowercase_letter"
+    help_text = gettext_lazy("Your password must contain at least one lowercase letter.")
 
-    def validate(self, password, user=None):
-        contains_digits = False
-        for character in password:
-            if character in digits:
-                contains_digits = True
-                break
-        if not contains_digits:
-            raise ValidationError(
-                _("This password must contain at least one digit."),
-                code="password_must_contain_digits",
-            )
-        
-    def get_help_text(self):
-        return _("Your password must contain at least one digit.")
 
+class UpperCaseValidator(CharacterClassValidator):
 
-class PunctuationValidator:
+    characters = ascii_uppercase
+    message = gettext_lazy("This password must contain at least one uppercase letter.")
+    code = "password_must_contain_uppercase_letter"
+    help_text = gettext_lazy("Your password must contain at least one uppercase letter.")
+
+
+class DigitValidator(CharacterClassValidator):
+
+    characters = digits
+    message = gettext_lazy("This password must contain at least one digit.")
+    code = "password_must_contain_digits"
+    help_text = gettext_lazy("Your password must contain at least one digit.")
+
+
+class PunctuationValidator(CharacterClassValidator):
+
+    characters = punctuation
+    message = gettext_lazy("This password must contain at least one punctuation %(characters)s.")
+    code = "password_must_contain_punctuation"
+    help_text = gettext_lazy("Your password must contain at least one punctuation %(characters)s.")
+
+
+class BreachedPasswordValidator:
+    """
+    Rejects passwords found in a list of breached or common passwords, looked
+    up in a filter built by the build_password_filter command. The default
+    filter holds Django's list of 20,000 common passwords; point `path` at one
+    built from a larger breach corpus for more coverage.
+    """
+
+    DEFAULT_FILTER_PATH = Path(__file__).resolve().parent / "data" / "common-passwords.filter"
+
+    def __init__(self, path=None):
+        self.filter = PasswordFilter(path or self.DEFAULT_FILTER_PATH)
 
     def validate(self, password, user=None):
-        contains_punctuation = False
-        for character in password:
-            if character in punctuation:
-                contains_punctuation = True
-                break
-        if not contains_punctuation:
+        if password in self.filter:
             raise ValidationError(
-                _(f"This password must contain at least one punctuation {punctuation}."),
-                code="password_must_contain_punctuation",
+                _("This password is too common or has appeared in a data breach."),
+                code="password_breached",
             )
-        
+
     def get_help_text(self):
-        return _(f"Your password must contain at least one punctuation {punctuation}.")
\ No newline at end of file
+        return _("Your password can't be a commonly used or breached password.")
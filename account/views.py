@@ -1,40 +1,144 @@
+import io
+from django.db import transaction
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
 from rest_framework import response, status, permissions
-from rest_framework.generics import GenericAPIView, CreateAPIView
+from rest_framework.negotiation import BaseContentNegotiation
+from rest_framework.generics import GenericAPIView, CreateAPIView, ListAPIView
+from rest_framework.parsers import MultiPartParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from account import exporters
+from account.authentication import to_microseconds
+from account.importers import FORMATS, guess_format, import_users, read_rows
+from account.models import User
+from account.pagination import KeysetPagination
+from account.revocation import get_revocations
 from account.serializers import *
+from helpers.budgets import QueryBudget
+
+
+def user_validators(user):
+    """
+    ETag and Last-Modified (as a timestamp) of the user's account details.
+    updated_at moves on every account write and comes with the token's
+    claims, so conditional requests are answered without a query.
+    """
+    updated_at = user.updated_at
+    return quote_etag(f"{user.pk}-{to_microseconds(updated_at)}"), int(updated_at.timestamp())
+
+
+def set_validators(response, etag, last_modified):
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    return response
 
 
 class RegisterAPIView(CreateAPIView):
 
     serializer_class = RegisterSerializer
+    throttle_scope = "register"
+    # The INSERT ... RETURNING that also checks the email is free
+    query_budget = QueryBudget(queries=1, rows=1)
+
+
+class TokenAPIView(TokenObtainPairView):
+
+    throttle_scope = "token"
+    # Reading the user, and rehashing its password when the work factor went up
+    query_budget = QueryBudget(queries=2, rows=2)
+
+
+class TokenRefreshAPIView(TokenRefreshView):
+
+    # Refreshing reads the user to bring the claims up to date
+    query_budget = QueryBudget(queries=1, rows=1)
 
 
 class DetailAPIView(GenericAPIView):
 
     permission_classes = (permissions.IsAuthenticated,)
+    # Served from the token's claims
+    query_budget = QueryBudget(queries=0)
 
     def get(self, request):
         user = request.user
+        etag, last_modified = user_validators(user)
+        # A client that has this version gets a 304 before anything is serialized
+        conditional = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if conditional is not None:
+            return set_validators(conditional, etag, last_modified)
+
+        # Plain JSON is served from the response cache, skipping the serializer
+        # and the renderer
+        renderer = request.accepted_renderer
+        if isinstance(renderer, JSONRenderer) and request.accepted_media_type == renderer.media_type:
+            content = detail_responses.get(user)
+            return set_validators(HttpResponse(content, content_type=renderer.media_type), etag, last_modified)
+
         serializer = DetailSerializer(user)
-        return response.Response(serializer.data)
+        return set_validators(response.Response(serializer.data), etag, last_modified)
         
 
+class UserListAPIView(ListAPIView):
+
+    permission_classes = (permissions.IsAdminUser,)
+    serializer_class = UserListSerializer
+    pagination_class = KeysetPagination
+    queryset = User.objects.all()
+    # The staff check loads the user, then one page plus a row to tell if there's more
+    query_budget = QueryBudget(queries=2, rows=KeysetPagination.max_page_size + 2)
+
+
 class UpdateAPIView(GenericAPIView):
 
     permission_classes = (permissions.IsAuthenticated,)
+    # Locking the user's row, saving it and recording that its tokens are stale
+    query_budget = QueryBudget(queries=3, rows=3)
     
     def put(self, request):
         user = request.user
+        # With If-Match, refuse to overwrite changes the client hasn't seen.
+        # The token's claims are current: any write since it was minted
+        # makes it stale.
+        etag, last_modified = user_validators(user)
+        conditional = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if conditional is not None:
+            return conditional
+
         serializer = UpdateSerializer(user, data=request.data)
 
         if serializer.is_valid():
-            serializer.save()
-            return response.Response(serializer.data)
+            return self.save(request, serializer)
         return response.Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    def save(self, request, serializer):
+        """
+        Save with the user's row locked, checking the preconditions again
+        against it: two requests with the same ETag both pass the check on
+        the claims, and the second would overwrite the first. On SQLite,
+        which can't lock rows, the second writer fails on the database lock
+        instead.
+        """
+        # No savepoint: there's nothing to roll back to but the whole request
+        with transaction.atomic(savepoint=False):
+            user = User.objects.select_for_update().get(pk=request.user.pk)
+            etag, last_modified = user_validators(user)
+            conditional = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if conditional is not None:
+                return conditional
+            serializer.instance = user
+            serializer.save()
+        return set_validators(response.Response(serializer.data), *user_validators(serializer.instance))
+
 
 class ChangeAuthView(GenericAPIView):
 
     permission_classes = (permissions.IsAuthenticated,)
+    throttle_scope = "change_auth"
+    # Loading the user, saving it and recording the revocation
+    query_budget = QueryBudget(queries=3, rows=3)
 
     def put(self, request):
         user = request.user
@@ -49,6 +153,8 @@ class ChangeAuthView(GenericAPIView):
 class DeleteAPIView(GenericAPIView):
     
     permission_classes = (permissions.IsAuthenticated,)
+    # Loading the user, saving it and recording the revocation
+    query_budget = QueryBudget(queries=3, rows=3)
 
     def delete(self, request):
         user = request.user
@@ -56,5 +162,96 @@ class DeleteAPIView(GenericAPIView):
 
         if serializer.is_valid():
             serializer.save()
-            return response.Response({"message": "Success"}, status=status.HTTP_204_NO_CONTENT)
+            # No body: a 204 can't have one, and HTTP/1.1 servers such as
+            # uvicorn's refuse to send it
+            return response.Response(status=status.HTTP_204_NO_CONTENT)
+        return response.Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class LogoutAPIView(GenericAPIView):
+    """
+    Revoke the access token of the request and, if given, its refresh token.
+    """
+
+    permission_classes = (permissions.IsAuthenticated,)
+    # A revocation per token
+    query_budget = QueryBudget(queries=2, rows=2)
+
+    def post(self, request):
+        serializer = LogoutSerializer(data=request.data, context={"request": request})
+
+        if serializer.is_valid():
+            revocations = get_revocations()
+            revocations.revoke_token(request.auth)
+            if "refresh" in serializer.validated_data:
+                revocations.revoke_token(serializer.validated_data["refresh"])
+            return response.Response({"message": "Success"})
         return response.Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class ImportAPIView(GenericAPIView):
+
+    permission_classes = (permissions.IsAdminUser,)
+    parser_classes = (MultiPartParser,)
+
+    def post(self, request):
+        upload = request.data.get("file")
+        if upload is None:
+            return response.Response({"file": ["No file was submitted."]}, status=status.HTTP_400_BAD_REQUEST)
+
+        format = request.data.get("format") or guess_format(upload.name)
+        if format not in FORMATS:
+            return response.Response({"format": [f"Expected one of {', '.join(FORMATS)}."]}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Large uploads are spooled to disk by Django, so this streams from there
+        stream = io.TextIOWrapper(upload.file, encoding="utf-8", newline="")
+        report = import_users(read_rows(stream, format))
+        return response.Response(report.as_dict())
+
+
+class IgnoreClientContentNegotiation(BaseContentNegotiation):
+    """
+    Always use the view's first renderer, leaving ?format= to the view.
+    """
+
+    def select_parser(self, request, parsers):
+        return parsers[0]
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return (renderers[0], renderers[0].media_type)
+
+
+class ExportAPIView(GenericAPIView):
+
+    permission_classes = (permissions.IsAdminUser,)
+    content_negotiation_class = IgnoreClientContentNegotiation
+
+    def get(self, request):
+        params = request.query_params
+        errors = dict()
+
+        format = params.get("format", "csv")
+        if format not in exporters.FORMATS:
+            errors["format"] = [f"Expected one of {', '.join(exporters.FORMATS)}."]
+
+        try:
+            fields = exporters.parse_fields(params.get("fields"))
+        except ValueError as e:
+            errors["fields"] = [str(e)]
+
+        filters = dict()
+        for name in exporters.FILTERS:
+            try:
+                filters[name] = exporters.parse_timestamp(params[name]) if params.get(name) else None
+            except ValueError as e:
+                errors[name] = [str(e)]
+
+        if errors:
+            return response.Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+        export = StreamingHttpResponse(
+            exporters.export_users(exporters.get_queryset(**filters), fields, format),
+            content_type=exporters.CONTENT_TYPES[format],
+        )
+        export["Content-Disposition"] = f'attachment; filename="users.{format}"'
+        return export
@@ -0,0 +1,24 @@
+"""
+Benchmarks for the Credity backend.
+
+Each module is a script, run from the repository root with e.g.
+`python -m benchmarks.hashing --help`. Settings come from the usual
+environment (SECRET_KEY, DB_USER, ...), exactly as for manage.py.
+"""
+import os
+
+
+def percentile(values, fraction):
+    """
+    The value below which `fraction` of the values fall, in milliseconds.
+    """
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * fraction))] * 1000, 2)
+
+
+def setup():
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "Credity.settings")
+    import django
+    django.setup()
@@ -0,0 +1,139 @@
+"""
+The account API served by WSGI (gthread workers) against ASGI (uvicorn
+workers and the async views), at increasing numbers of concurrent
+connections.
+
+For each deployment and concurrency the mix from benchmarks.loadtest is run
+on a fresh server, and the report has its throughput and latencies next to
+the memory the server's processes took: their proportional set size (PSS,
+so pages the preloaded workers share are counted once), idle and at the
+highest sample during the run. "kib_per_connection" is the growth divided
+by the connections. Linux only, memory is read from /proc.
+
+    python -m benchmarks.asgi --mix read --concurrency 16 64 256 --seconds 20
+"""
+import argparse
+import json
+import tempfile
+import threading
+from pathlib import Path
+
+from benchmarks import loadtest
+
+
+DEPLOYMENTS = ("gthread", "uvicorn")
+
+
+def children(pid):
+    # Listed per thread: the hashing pool is started by whichever thread
+    # hashed first
+    pids = []
+    for task in Path(f"/proc/{pid}/task").glob("*"):
+        try:
+            pids.extend(int(child) for child in (task / "children").read_text().split())
+        except OSError:
+            pass
+    return pids
+
+
+def pss_kib(pid):
+    """
+    PSS of the process and its descendants, in KiB.
+    """
+    total = 0
+    try:
+        for line in Path(f"/proc/{pid}/smaps_rollup").read_text().splitlines():
+            if line.startswith("Pss:"):
+                total += int(line.split()[1])
+                break
+    except OSError:
+        return 0
+    return total + sum(pss_kib(child) for child in children(pid))
+
+
+class MemorySampler(threading.Thread):
+    """
+    Samples a process tree's PSS until stopped, keeping the highest.
+    """
+
+    def __init__(self, pid, interval=0.2):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.peak = 0
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            self.peak = max(self.peak, pss_kib(self.pid))
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+        return self.peak
+
+
+def measure(args, worker_class, concurrency):
+    options = argparse.Namespace(
+        database_url=args.database_url, iterations=args.iterations, worker_class=worker_class,
+        workers=args.workers, threads=args.threads, port=loadtest.free_port(),
+    )
+    with tempfile.TemporaryDirectory() as directory:
+        server = loadtest.boot(options, directory)
+        try:
+            loadtest.wait_until_ready(server, "127.0.0.1", options.port)
+            idle = pss_kib(server.pid)
+            sampler = MemorySampler(server.pid)
+            sampler.start()
+            try:
+                report = loadtest.run("127.0.0.1", options.port, args.mix, concurrency, args.seconds, args.warmup)
+            finally:
+                peak = max(sampler.stop(), idle)
+        finally:
+            server.terminate()
+            server.wait()
+
+    total = report["total"]
+    return {
+        "throughput": total["throughput"],
+        "errors": total["errors"],
+        "p50_ms": total["p50_ms"],
+        "p95_ms": total["p95_ms"],
+        "p99_ms": total["p99_ms"],
+        "idle_pss_kib": idle,
+        "peak_pss_kib": peak,
+        "kib_per_connection": round((peak - idle) / concurrency, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--mix", choices=loadtest.MIXES, default="read")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[16, 64, 256], help="Concurrent connections.")
+    parser.add_argument("--seconds", type=float, default=20.0, help="Measured duration of each run.")
+    parser.add_argument("--warmup", type=float, default=3.0, help="Unmeasured seconds before that.")
+    parser.add_argument("--deployment", choices=DEPLOYMENTS, nargs="+", default=list(DEPLOYMENTS))
+    parser.add_argument("--database-url", help="Database to boot against, a fresh SQLite file by default.")
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn workers.")
+    parser.add_argument("--threads", type=int, default=4, help="Threads per gthread worker.")
+    parser.add_argument("--iterations", type=int, help="Override the PBKDF2 work factor.")
+    args = parser.parse_args()
+
+    results = {
+        worker_class: {str(concurrency): measure(args, worker_class, concurrency) for concurrency in args.concurrency}
+        for worker_class in args.deployment
+    }
+    print(json.dumps({
+        "config": {
+            "mix": args.mix,
+            "seconds": args.seconds,
+            "workers": args.workers,
+            "threads": args.threads,
+            "iterations": args.iterations,
+        },
+        "results": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+Concurrent contributions to one group's pot, with each way of moving the
+balance snapshots (see esusu.ledger).
+
+Saves a group of --writers memberships with a cycle (use a scratch
+database), then starts a thread per membership, each on its own
+connection, all let go at once as at a deadline, that posts --contributions
+contributions back to back. Reports postings per second, latencies,
+failures and the retries of VersionedSnapshots, then checks correctness
+against the ledger: the pot against the postings that went through, and
+every snapshot with recompute().
+
+On SQLite writers take turns on the database's lock whatever the
+strategy, so only PostgreSQL, with max_connections above --writers, tells
+them apart.
+
+    python -m benchmarks.contention --writers 300 --contributions 5
+    python -m benchmarks.contention --snapshots sharded --shards 32
+"""
+import argparse
+import datetime
+import json
+import logging
+import random
+import threading
+import time
+from collections import Counter
+
+from benchmarks import percentile, setup
+
+
+STRATEGIES = {
+    "locked": "esusu.ledger.LockedSnapshots",
+    "sharded": "esusu.ledger.ShardedSnapshots",
+    "versioned": "esusu.ledger.VersionedSnapshots",
+}
+
+AMOUNT = 100000
+
+
+class Retries(logging.Handler):
+    # Counts the attempts VersionedSnapshots gives up on
+
+    def __init__(self):
+        super().__init__(logging.DEBUG)
+        self.count = 0
+
+    def emit(self, record):
+        self.count += 1
+
+
+def save(writers):
+    """
+    Save a group of `writers` memberships, each held by a user of its own,
+    and start a cycle. Return the cycle and the memberships.
+    """
+    from account.models import User
+    from esusu import rotation
+    from esusu.models import WHOLE_SHARE, Group, Interval, Membership
+    from helpers.database import insert_rows
+
+    run = random.getrandbits(32)
+    first_user = (User.objects.order_by("-id").values_list("id", flat=True).first() or 0) + 1
+    insert_rows(User, ("id", "email", "first_name", "last_name", "password", "is_staff", "is_superuser", "is_active",
+                       "date_joined", "email_verified", "auth_version"), (
+        (first_user + n, f"contention-{run}-{n}@example.com", "Bench", "User", "!", False, False, True,
+         datetime.datetime.now(datetime.timezone.utc), False, 0)
+        for n in range(writers)
+    ))
+    group = Group.objects.create(name=f"Contention {run}", contribution=AMOUNT, interval=Interval.WEEKLY)
+    insert_rows(Membership, ("group_id", "user_id", "slot", "share", "is_active"), (
+        (group.pk, first_user + n, n + 1, WHOLE_SHARE, True) for n in range(writers)
+    ))
+    cycle = rotation.start_cycle(group, datetime.date.today())
+    return cycle, list(group.memberships.order_by("slot"))
+
+
+def run(snapshots, options, writers, contributions):
+    from django.db import connection
+    from django.db.models import Sum
+    from django.test import override_settings
+    from esusu import ledger
+    from esusu.models import Balance, Posting
+
+    cycle, memberships = save(writers)
+    key = random.getrandbits(32)
+    latencies, failures = [], Counter()
+    lock = threading.Lock()
+    start = threading.Barrier(writers + 1)
+
+    def write(membership):
+        try:
+            start.wait()
+            for n in range(contributions):
+                began = time.perf_counter()
+                try:
+                    ledger.contribute(membership, cycle, AMOUNT, key=f"contention-{key}-{membership.pk}-{n}")
+                except Exception as e:
+                    with lock:
+                        failures[type(e).__name__] += 1
+                    continue
+                with lock:
+                    latencies.append(time.perf_counter() - began)
+        finally:
+            connection.close()
+
+    retries = Retries()
+    logger = logging.getLogger("esusu.ledger")
+    logger.addHandler(retries)
+    logger.setLevel(logging.DEBUG)
+    try:
+        with override_settings(ESUSU_LEDGER={"SNAPSHOTS": STRATEGIES[snapshots], "OPTIONS": options}):
+            threads = [threading.Thread(target=write, args=(membership,)) for membership in memberships]
+            for thread in threads:
+                thread.start()
+            start.wait()
+            began = time.perf_counter()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - began
+    finally:
+        logger.removeHandler(retries)
+
+    posted = Posting.objects.filter(cycle=cycle).aggregate(amount=Sum("amount"))["amount"] or 0
+    pot = ledger.balance(Balance.Scope.CYCLE, cycle.pk)
+    checked, errors, drifts = ledger.recompute()
+    return {
+        "snapshots": snapshots,
+        "options": options,
+        "postings": len(latencies),
+        "failures": dict(failures),
+        "retries": retries.count,
+        "seconds": round(elapsed, 3),
+        "postings_per_second": round(len(latencies) / elapsed, 1),
+        "p50_ms": percentile(latencies, 0.5),
+        "p99_ms": percentile(latencies, 0.99),
+        "correctness": {
+            "pot": pot.net,
+            "posted": posted,
+            "expected": len(latencies) * AMOUNT,
+            "pot_shards": Balance.objects.filter(scope=Balance.Scope.CYCLE, owner_id=cycle.pk).count(),
+            "postings_checked": checked,
+            "unbalanced_postings": len(errors),
+            "drifted_snapshots": len(drifts),
+            "consistent": pot.net == posted == len(latencies) * AMOUNT and not errors and not drifts,
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--writers", type=int, default=300, help="Concurrent writers, a membership each.")
+    parser.add_argument("--contributions", type=int, default=5, help="Contributions per writer.")
+    parser.add_argument("--snapshots", choices=[*STRATEGIES, "all"], default="all")
+    parser.add_argument("--shards", type=int, default=16)
+    parser.add_argument("--retries", type=int, default=10)
+    parser.add_argument("--timeout", type=float, default=60.0, help="SQLite's busy timeout, in seconds.")
+    args = parser.parse_args()
+
+    setup()
+    from django.db import connection, connections
+
+    if connection.vendor == "sqlite":
+        connections.settings["default"].setdefault("OPTIONS", {})["timeout"] = args.timeout
+    options = {"sharded": {"shards": args.shards}, "versioned": {"retries": args.retries}}
+    report = [
+        run(snapshots, options.get(snapshots, {}), args.writers, args.contributions)
+        for snapshots in (STRATEGIES if args.snapshots == "all" else [args.snapshots])
+    ]
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Bulk contribution imports with esusu.importers.
+
+Saves --groups synthetic groups with a cycle each (as benchmarks.rotation
+does, so use a scratch database), then posts a contribution for every
+membership, in requests of --batch items, and times it end to end: lookups,
+validation, postings, entries and snapshots. --replay posts the same
+items again, all of them duplicates. With --api the batches go through the
+endpoint, JSON parsing and rendering included.
+
+    python -m benchmarks.contributions --groups 5000
+    python -m benchmarks.contributions --groups 5000 --api
+"""
+import argparse
+import json
+import time
+from itertools import islice
+
+from benchmarks import setup
+
+
+def items(cycles, memberships, first_cycle, run):
+    from esusu.models import WHOLE_SHARE
+
+    contributions = {cycle_id: contribution for cycle_id, _, _, _, contribution, _, _ in cycles}
+    for membership_id, cycle_id, share in memberships:
+        yield {
+            "key": f"{run}-{membership_id}",
+            "membership": membership_id,
+            "cycle": cycle_id,
+            "amount": contributions[cycle_id - first_cycle + 1] * share // WHOLE_SHARE,
+        }
+
+
+def batches(iterable, size):
+    iterable = iter(iterable)
+    while batch := list(islice(iterable, size)):
+        yield batch
+
+
+def post_batches(batches, api):
+    from collections import Counter
+    from esusu.importers import import_contributions
+
+    counts = Counter()
+    if not api:
+        for batch in batches:
+            counts.update(result["status"] for result in import_contributions(batch))
+        return counts
+
+    from django.conf import settings
+    from django.test import Client
+    from account.tests import factories
+
+    settings.ALLOWED_HOSTS.append("testserver")
+    staff = factories.create_user(is_staff=True)
+    access_token, _ = factories.tokens_for(staff)
+    client = Client(HTTP_AUTHORIZATION=f"Bearer {access_token}")
+    for batch in batches:
+        response = client.post("/api/esusu/contributions", {"contributions": batch}, content_type="application/json")
+        data = response.json()
+        counts.update({"created": data["created"], "duplicate": data["duplicates"], "rejected": data["rejected"]})
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--groups", type=int, default=5000)
+    parser.add_argument("--batch", type=int, default=10000, help="Items per request.")
+    parser.add_argument("--users", type=int, default=10000, help="Users holding the memberships.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--replay", action="store_true", help="Post every item a second time.")
+    parser.add_argument("--api", action="store_true", help="Post through the endpoint.")
+    args = parser.parse_args()
+
+    setup()
+    import random
+    from benchmarks.rotation import save, synthesize
+    from esusu.models import Membership
+
+    cycles, synthetic = synthesize(args.groups, 0.1, args.seed)
+    first, last = save(cycles, synthetic, args.users)
+    memberships = list(
+        Membership.objects.filter(group__cycles__pk__range=(first, last))
+        .order_by("group_id", "slot").values_list("id", "group__cycles__id", "share")
+    )
+    run = random.getrandbits(32)
+
+    report = {"groups": args.groups, "items": len(memberships), "batch": args.batch, "api": args.api}
+    for attempt in ("first", "replay") if args.replay else ("first",):
+        start = time.perf_counter()
+        counts = post_batches(batches(items(cycles, memberships, first, run), args.batch), args.api)
+        elapsed = time.perf_counter() - start
+        report[attempt] = {
+            "counts": dict(counts),
+            "seconds": round(elapsed, 3),
+            "items_per_second": round(len(memberships) / elapsed),
+        }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
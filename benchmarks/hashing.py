@@ -0,0 +1,70 @@
+"""
+Logins per second per core, before and after the hashing pool.
+
+"before" verifies passwords inline in one thread, like a sync gunicorn worker
+used to. "after" submits the same work from several request threads to the
+hashing service's process pool.
+
+    python -m benchmarks.hashing --seconds 5 --threads 8
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks import setup
+
+
+PASSWORD = "aA1-K+4fX"
+
+
+def measure(check, encoded, seconds, threads):
+    deadline = time.perf_counter() + seconds
+
+    def loop():
+        count = 0
+        while time.perf_counter() < deadline:
+            check(PASSWORD, encoded)
+            count += 1
+        return count
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as executor:
+        total = sum(executor.map(lambda _: loop(), range(threads)))
+    return total / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--threads", type=int, default=2 * (os.cpu_count() or 1))
+    args = parser.parse_args()
+
+    setup()
+    from django.contrib.auth import hashers as django_hashers
+    from account import hashers
+
+    service = hashers.get_hashing_service()
+    encoded = django_hashers.make_password(PASSWORD)
+    cores = os.cpu_count() or 1
+
+    before = measure(django_hashers.check_password, encoded, args.seconds, 1)
+    hashers.check_password(PASSWORD, encoded)  # start the pool outside the timing
+    after = measure(hashers.check_password, encoded, args.seconds, args.threads)
+    service.shutdown()
+
+    print(json.dumps({
+        "iterations": django_hashers.get_hasher().iterations,
+        "cores": cores,
+        "pool_size": service.pool_size,
+        "before": {"logins_per_second": round(before, 1), "per_core": round(before, 1)},
+        "after": {
+            "logins_per_second": round(after, 1),
+            "per_core": round(after / max(1, service.pool_size), 1),
+        },
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+"""
+HTTP load test of the account API, served by gunicorn as in production.
+
+Boots the application under gunicorn, configured by gunicorn.conf.py,
+against a throwaway SQLite database (or --database-url, e.g. a local
+Postgres), drives a scripted mix of account calls from concurrent virtual
+users, and reports throughput and latency percentiles per endpoint as JSON.
+With a baseline the run fails (exit status 1) when an endpoint got slower or
+less throughput than the tolerance allows.
+
+    python -m benchmarks.loadtest --mix lifecycle --concurrency 16 --seconds 30
+    python -m benchmarks.loadtest --mix lifecycle --save-baseline
+    python -m benchmarks.loadtest --mix lifecycle --compare
+
+Baselines depend on the machine, so compare runs made on the same host with
+the same options, and re-save the baseline when either changes.
+"""
+import argparse
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from benchmarks import percentile
+
+
+BASELINE = Path(__file__).resolve().parent / "baselines" / "loadtest.json"
+
+PASSWORD = "aA1-K+4fX"
+NEW_PASSWORD = "bB2/L*5gY"
+
+# Each virtual user runs its mix's script over and over, as a new user each time
+MIXES = {
+    # A whole account lifecycle
+    "lifecycle": (
+        "register", "token", "detail", "detail", "detail", "update", "refresh",
+        "detail", "change_auth", "token", "detail", "delete",
+    ),
+    # Logged in users reading their profile
+    "read": ("register", "token") + ("detail",) * 20 + ("refresh",) + ("detail",) * 20,
+    # Logins and token refreshes
+    "login": ("register",) + ("token", "refresh") * 5,
+}
+
+
+class Session:
+    """
+    One virtual user, on its own keep-alive connection.
+    """
+
+    def __init__(self, host, port, prefix):
+        self.connection = http.client.HTTPConnection(host, port, timeout=60)
+        self.prefix = prefix
+
+    def request(self, method, path, body=None, token=None):
+        headers = {"Content-Type": "application/json"}
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        try:
+            self.connection.request(method, f"/api/account/{path}", json.dumps(body) if body is not None else None, headers)
+            response = self.connection.getresponse()
+            data = response.read()
+        except (OSError, http.client.HTTPException):
+            self.connection.close()
+            return 0, None
+        if response.getheader("Connection", "").lower() == "close":
+            self.connection.close()
+        return response.status, json.loads(data) if data and response.getheader("Content-Type", "").startswith("application/json") else None
+
+    def start(self, n):
+        self.email = f"{self.prefix}-{n}@example.com"
+        self.password = PASSWORD
+        self.access = self.refresh_token = None
+
+    def register(self):
+        status, _ = self.request("POST", "register", {
+            "email": self.email, "password": self.password, "first_name": "Load", "last_name": "Test",
+        })
+        return status == 201
+
+    def token(self):
+        status, data = self.request("POST", "token", {"email": self.email, "password": self.password})
+        if status == 200:
+            self.access, self.refresh_token = data["access"], data["refresh"]
+        return status == 200
+
+    def refresh(self):
+        status, data = self.request("POST", "token/refresh", {"refresh": self.refresh_token})
+        if status == 200:
+            self.access = data["access"]
+        return status == 200
+
+    def detail(self):
+        return self.request("GET", "detail", token=self.access)[0] == 200
+
+    def update(self):
+        status, _ = self.request("PUT", "update", {"first_name": "Updated", "last_name": "Name"}, token=self.access)
+        return status == 200
+
+    def change_auth(self):
+        status, _ = self.request("PUT", "change-auth", {
+            "old_password": self.password, "new_password": NEW_PASSWORD,
+        }, token=self.access)
+        if status == 200:
+            self.password = NEW_PASSWORD
+        return status == 200
+
+    def delete(self):
+        return self.request("DELETE", "delete", token=self.access)[0] == 204
+
+
+def run(host, port, mix, concurrency, seconds, warmup):
+    """
+    Drive the mix for warmup + seconds; only the last `seconds` are measured.
+    """
+    script = MIXES[mix]
+    run_id = uuid.uuid4().hex[:8]
+    start = time.perf_counter()
+    measure_from = start + warmup
+    deadline = measure_from + seconds
+    results = {name: ([], [0]) for name in dict.fromkeys(script)}
+    lock = threading.Lock()
+
+    def user(n):
+        session = Session(host, port, f"load-{run_id}-{n}")
+        iteration = 0
+        while time.perf_counter() < deadline:
+            session.start(iteration)
+            iteration += 1
+            for step in script:
+                began = time.perf_counter()
+                if began >= deadline:
+                    return
+                ok = getattr(session, step)()
+                elapsed = time.perf_counter() - began
+                if began >= measure_from:
+                    latencies, errors = results[step]
+                    with lock:
+                        latencies.append(elapsed)
+                        errors[0] += not ok
+                if not ok:
+                    # The rest of the script depends on this step
+                    break
+
+    threads = [threading.Thread(target=user, args=(n,)) for n in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    endpoints = {}
+    for name, (latencies, errors) in results.items():
+        endpoints[name] = {
+            "requests": len(latencies),
+            "errors": errors[0],
+            "throughput": round(len(latencies) / seconds, 1),
+            "p50_ms": percentile(latencies, 0.5),
+            "p95_ms": percentile(latencies, 0.95),
+            "p99_ms": percentile(latencies, 0.99),
+        }
+    everything = [latency for latencies, _ in results.values() for latency in latencies]
+    total = {
+        "requests": len(everything),
+        "errors": sum(errors[0] for _, errors in results.values()),
+        "throughput": round(len(everything) / seconds, 1),
+        "p50_ms": percentile(everything, 0.5),
+        "p95_ms": percentile(everything, 0.95),
+        "p99_ms": percentile(everything, 0.99),
+    }
+    return {"endpoints": endpoints, "total": total}
+
+
+def compare(report, baseline, tolerance):
+    """
+    Regressions of the report against the baseline, as readable lines.
+    """
+    regressions = []
+    for name, base in baseline["endpoints"].items():
+        current = report["endpoints"].get(name)
+        if current is None or not base["requests"]:
+            continue
+        if base["p95_ms"] and current["p95_ms"] and current["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {current['p95_ms']}ms, baseline {base['p95_ms']}ms")
+        if current["throughput"] < base["throughput"] * (1 - tolerance):
+            regressions.append(f"{name}: {current['throughput']} req/s, baseline {base['throughput']} req/s")
+        error_rate = current["errors"] / current["requests"] if current["requests"] else 1
+        if error_rate > base["errors"] / base["requests"] + 0.01:
+            regressions.append(f"{name}: {current['errors']} errors in {current['requests']} requests")
+    return regressions
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_ready(server, host, port, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise SystemExit(f"gunicorn exited with status {server.returncode}")
+        try:
+            connection = http.client.HTTPConnection(host, port, timeout=5)
+            connection.request("GET", "/api/account/detail")
+            connection.getresponse().read()
+            connection.close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise SystemExit(f"gunicorn didn't answer within {timeout} seconds")
+
+
+def boot(args, directory):
+    """
+    Migrate a database and start gunicorn on it, returning the process.
+    """
+    env = dict(os.environ, THROTTLE_ENABLED="False")
+    env["DATABASE_URL"] = args.database_url or f"sqlite:///{directory}/loadtest.sqlite3"
+    if args.iterations:
+        env["PASSWORD_HASH_ITERATIONS"] = str(args.iterations)
+    env.setdefault("DJANGO_SETTINGS_MODULE", "Credity.settings")
+    root = Path(__file__).resolve().parent.parent
+
+    # The production configuration, see gunicorn.conf.py
+    env["GUNICORN_WORKER_CLASS"] = args.worker_class
+    env["WEB_CONCURRENCY"] = str(args.workers)
+    env["GUNICORN_THREADS"] = str(args.threads)
+
+    subprocess.run([sys.executable, "manage.py", "migrate", "--noinput", "-v", "0"], cwd=root, env=env, check=True)
+    return subprocess.Popen(
+        [
+            sys.executable, "-m", "gunicorn",
+            "--config", "gunicorn.conf.py",
+            "--bind", f"127.0.0.1:{args.port}",
+            "--log-level", "warning",
+        ],
+        cwd=root,
+        env=env,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--mix", choices=MIXES, default="lifecycle")
+    parser.add_argument("--concurrency", type=int, default=16, help="Virtual users.")
+    parser.add_argument("--seconds", type=float, default=30.0, help="Measured duration.")
+    parser.add_argument("--warmup", type=float, default=3.0, help="Unmeasured seconds before that.")
+    parser.add_argument("--url", help="Load an already running server instead, e.g. http://127.0.0.1:8000.")
+    parser.add_argument("--database-url", help="Database to boot against, a fresh SQLite file by default.")
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn workers.")
+    parser.add_argument("--threads", type=int, default=4, help="Threads per gunicorn worker.")
+    parser.add_argument(
+        "--worker-class", choices=("gthread", "sync", "uvicorn"), default="gthread",
+        help="gunicorn workers, uvicorn serving Credity.asgi.",
+    )
+    parser.add_argument("--iterations", type=int, help="Override the PBKDF2 work factor.")
+    parser.add_argument("--baseline", type=Path, default=BASELINE)
+    parser.add_argument("--compare", action="store_true", help="Fail on regressions against the baseline.")
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the mix's baseline.")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown, as a fraction.")
+    args = parser.parse_args()
+
+    config = {
+        "mix": args.mix,
+        "concurrency": args.concurrency,
+        "seconds": args.seconds,
+        "workers": args.workers,
+        "threads": args.threads,
+        "worker_class": args.worker_class,
+        "iterations": args.iterations,
+        "database": "url" if args.url else ("postgres" if args.database_url and "postgres" in args.database_url else "sqlite"),
+    }
+
+    with tempfile.TemporaryDirectory() as directory:
+        server = None
+        if args.url:
+            address = args.url.split("://", 1)[-1].rstrip("/")
+            host, _, port = address.partition(":")
+            port = int(port or 80)
+        else:
+            host, args.port = "127.0.0.1", free_port()
+            port = args.port
+            server = boot(args, directory)
+        try:
+            if server is not None:
+                wait_until_ready(server, host, port)
+            report = run(host, port, args.mix, args.concurrency, args.seconds, args.warmup)
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+
+    report = {"config": config, **report}
+    print(json.dumps(report, indent=2))
+
+    baselines = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+    if args.save_baseline:
+        baselines[args.mix] = report
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(baselines, indent=2, sort_keys=True) + "\n")
+
+    elif args.compare:
+        baseline = baselines.get(args.mix)
+        if baseline is None:
+            raise SystemExit(f"No baseline for the {args.mix} mix in {args.baseline}")
+        if baseline["config"] != config:
+            print(f"warning: baseline was run with {baseline['config']}", file=sys.stderr)
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print("REGRESSIONS against the baseline:", file=sys.stderr)
+            for regression in regressions:
+                print(f"  {regression}", file=sys.stderr)
+            sys.exit(1)
+        print("No regressions against the baseline", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
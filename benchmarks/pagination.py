@@ -0,0 +1,85 @@
+"""
+Deep-page latency of the staff user listing, OFFSET versus keyset.
+
+Fills account_user up to --rows users (use a scratch database, this inserts
+real rows), then times fetching one page at increasing depths both ways.
+
+    python -m benchmarks.pagination --rows 5000000 --page-size 50
+"""
+import argparse
+import datetime
+import json
+import statistics
+import time
+
+from benchmarks import setup
+
+
+def seed(User, rows, batch_size=10000):
+    from django.utils import timezone
+
+    existing = User.objects.count()
+    start = timezone.now() - datetime.timedelta(seconds=rows)
+    created_at = User._meta.get_field("created_at")
+    # Spread the rows out in time instead of stamping them all with now()
+    created_at.auto_now_add = False
+    try:
+        for offset in range(existing, rows, batch_size):
+            users = [
+                User(
+                    email=f"bench{i}@example.com",
+                    first_name="First",
+                    last_name="Last",
+                    password="!",
+                    created_at=start + datetime.timedelta(seconds=i),
+                )
+                for i in range(offset, min(offset + batch_size, rows))
+            ]
+            User.objects.bulk_create(users, batch_size=batch_size)
+    finally:
+        created_at.auto_now_add = True
+    return User.objects.count()
+
+
+def timed(fetch, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fetch()
+        timings.append((time.perf_counter() - start) * 1000)
+    return round(statistics.median(timings), 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=5_000_000)
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    setup()
+    from django.db.models import Q
+    from account.models import User
+
+    total = seed(User, args.rows)
+    ordered = User.objects.order_by("-created_at", "-id")
+    results = []
+    for fraction in (0, 0.01, 0.1, 0.5, 0.9, 0.99):
+        depth = int((total - args.page_size) * fraction)
+        created_at, pk = ordered.values_list("created_at", "id")[depth]
+
+        offset_ms = timed(lambda: list(ordered[depth:depth + args.page_size]), args.repeat)
+        keyset_ms = timed(
+            lambda: list(
+                ordered.filter(created_at__lte=created_at)
+                .filter(Q(created_at__lt=created_at) | Q(id__lt=pk))[:args.page_size]
+            ),
+            args.repeat,
+        )
+        results.append({"depth": depth, "offset_ms": offset_ms, "keyset_ms": keyset_ms})
+
+    print(json.dumps({"rows": total, "page_size": args.page_size, "pages": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Breached password filter: time to open, and nanoseconds per lookup.
+
+Builds a filter of --passwords generated passwords in a temporary directory
+(or measures --filter), then looks up passwords that are in it and ones that
+aren't. Most registrations pick a password that isn't, so "miss" is the
+number that matters for request latency.
+
+    python -m benchmarks.password_filter --passwords 1000000
+    python -m benchmarks.password_filter --filter /srv/breached.filter
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from benchmarks import setup
+
+
+def per_lookup(filter, passwords, repeat=5):
+    """
+    Best of `repeat` runs, in nanoseconds per lookup.
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for password in passwords:
+            password in filter
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return round(best / len(passwords) * 1e9)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--passwords", type=int, default=1000000, help="Passwords in the generated filter.")
+    parser.add_argument("--filter", help="Measure an existing filter instead.")
+    parser.add_argument("--lookups", type=int, default=100000)
+    args = parser.parse_args()
+
+    setup()
+    from account.password_filter import PasswordFilter, build_filter
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = args.filter
+        build_seconds = None
+        if path is None:
+            path = os.path.join(directory, "bench.filter")
+            start = time.perf_counter()
+            build_filter((f"leaked-{i}" for i in range(args.passwords)), path, args.passwords)
+            build_seconds = round(time.perf_counter() - start, 2)
+
+        filter = PasswordFilter(path)
+        start = time.perf_counter()
+        "" in filter
+        open_ms = round((time.perf_counter() - start) * 1000, 3)
+
+        hits = [f"leaked-{i}" for i in range(min(args.lookups, filter.count))]
+        misses = [f"Unbreached-{i}!" for i in range(args.lookups)]
+        report = {
+            "passwords": filter.count,
+            "file_bytes": os.path.getsize(path),
+            "build_seconds": build_seconds,
+            "open_ms": open_ms,
+            "miss_ns": per_lookup(filter, misses),
+            "hit_ns": per_lookup(filter, hits) if args.filter is None else None,
+            "false_positive_rate": sum(password in filter for password in misses) / len(misses),
+        }
+        filter.close()
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
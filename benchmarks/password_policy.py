@@ -0,0 +1,82 @@
+"""
+Password validations per second, validator by validator versus the compiled
+policy.
+
+"before" is Django's validate_password over AUTH_PASSWORD_VALIDATORS, as the
+serializers used to call it. "after" is the compiled policy one password at a
+time, and "batch" its validate_many over the whole list, as imports use it.
+
+    python -m benchmarks.password_policy --passwords 100000
+"""
+import argparse
+import json
+import random
+import string
+import time
+
+from benchmarks import setup
+
+
+def generate(count, seed=0):
+    """
+    A mix of acceptable passwords and ones missing a character class or two.
+    """
+    rng = random.Random(seed)
+    alphabets = [string.ascii_lowercase, string.ascii_uppercase, string.digits, string.punctuation]
+    passwords = []
+    for _ in range(count):
+        length = rng.randint(6, 20)
+        pool = "".join(alphabet for alphabet in alphabets if rng.random() < 0.85) or string.ascii_lowercase
+        passwords.append("".join(rng.choice(pool) for _ in range(length)))
+    return passwords
+
+
+def measure(validate, passwords):
+    start = time.perf_counter()
+    for password in passwords:
+        validate(password)
+    return len(passwords) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--passwords", type=int, default=100000)
+    args = parser.parse_args()
+
+    setup()
+    from django.contrib.auth import password_validation
+    from django.core.exceptions import ValidationError
+    from account.password_policy import get_password_policy
+
+    passwords = generate(args.passwords)
+    policy = get_password_policy()
+
+    def before(password):
+        try:
+            password_validation.validate_password(password)
+        except ValidationError:
+            pass
+
+    def after(password):
+        try:
+            policy.validate(password)
+        except ValidationError:
+            pass
+
+    before_rate = measure(before, passwords)
+    after_rate = measure(after, passwords)
+    start = time.perf_counter()
+    results = policy.validate_many(passwords)
+    batch_rate = len(passwords) / (time.perf_counter() - start)
+
+    print(json.dumps({
+        "passwords": len(passwords),
+        "invalid": sum(bool(errors) for errors in results),
+        "before": {"per_second": round(before_rate)},
+        "after": {"per_second": round(after_rate), "speedup": round(after_rate / before_rate, 2)},
+        "batch": {"per_second": round(batch_rate), "speedup": round(batch_rate / before_rate, 2)},
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
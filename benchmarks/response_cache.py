@@ -0,0 +1,75 @@
+"""
+The detail endpoint with and without the response cache. "view" goes
+through the whole view: authentication from the token's claims,
+negotiation, then serializing and rendering or the cache lookup; "body" is
+building the body alone. Times are microseconds per request, the best of
+--repeat runs. Only the revocation poll queries the database, which must be
+migrated.
+
+    python -m benchmarks.response_cache --iterations 5000
+"""
+import argparse
+import json
+import time
+
+from benchmarks import setup
+
+
+def per_call(function, iterations, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return round(best / iterations * 1e6, 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    setup()
+    from django.core.cache import caches
+    from django.utils import timezone
+    from rest_framework.test import APIRequestFactory
+    from account.models import User
+    from account.response_cache import CACHE_ALIAS
+    from account.serializers import TokenObtainPairSerializer, detail_responses
+    from account.views import DetailAPIView
+
+    now = timezone.now()
+    user = User(id=1, email="bench@example.com", first_name="Bench", last_name="Mark",
+                created_at=now, updated_at=now)
+    access = str(TokenObtainPairSerializer.get_token(user).access_token)
+    factory = APIRequestFactory()
+    view = DetailAPIView.as_view()
+
+    def request(**headers):
+        response = view(factory.get("/", HTTP_AUTHORIZATION=f"Bearer {access}", **headers))
+        if hasattr(response, "render"):
+            response.render()
+        assert response.status_code == 200
+
+    caches[CACHE_ALIAS].clear()
+    claims_user = DetailAPIView().get_authenticators()[0].authenticate(
+        factory.get("/", HTTP_AUTHORIZATION=f"Bearer {access}")
+    )[0]
+    report = {}
+    # A media type parameter takes the view off the cache and through the
+    # serializer and Response rendering, as before
+    before = per_call(lambda: request(HTTP_ACCEPT="application/json; indent=0"), args.iterations, args.repeat)
+    after = per_call(request, args.iterations, args.repeat)
+    report["view"] = {"before_us": before, "after_us": after, "speedup": round(before / after, 2)}
+
+    before = per_call(lambda: detail_responses.render(claims_user), args.iterations, args.repeat)
+    after = per_call(lambda: detail_responses.get(claims_user), args.iterations, args.repeat)
+    report["body"] = {"before_us": before, "after_us": after, "speedup": round(before / after, 2)}
+
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
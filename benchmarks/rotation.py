@@ -0,0 +1,127 @@
+"""
+Payout schedules for many groups with esusu.rotation.
+
+Builds --groups synthetic groups of 5 to 20 slots, some shared, with their
+cycles starting over a year on every interval and ordering, then times
+compute_schedule() over all of them. With --save the groups are also
+written to the database (use a scratch one) and schedule_payouts() is timed
+end to end, queries and inserts included.
+
+    python -m benchmarks.rotation --groups 100000
+    python -m benchmarks.rotation --groups 100000 --save
+"""
+import argparse
+import datetime
+import json
+import random
+import time
+
+from benchmarks import setup
+
+
+def synthesize(groups, shared, seed):
+    """
+    Cycles and memberships as compute_schedule() takes them, with ids
+    counted from 1.
+    """
+    from esusu.models import WHOLE_SHARE, Cycle, Interval
+
+    rng = random.Random(seed)
+    start = datetime.date(2026, 1, 1)
+    intervals = list(Interval.values)
+    orderings = list(Cycle.Ordering.values)
+    cycles, memberships = [], []
+    membership_id = 0
+    for group_id in range(1, groups + 1):
+        cycles.append((
+            group_id, group_id, start + datetime.timedelta(days=rng.randrange(365)), rng.choice(intervals),
+            rng.choice((100000, 500000, 1000000)), rng.choice(orderings), rng.getrandbits(31),
+        ))
+        for slot in range(1, rng.randint(5, 20) + 1):
+            holders = 2 if rng.random() < shared else 1
+            for part in range(holders):
+                membership_id += 1
+                share = WHOLE_SHARE // holders + (WHOLE_SHARE % holders if part == 0 else 0)
+                memberships.append((group_id, slot, membership_id, share))
+    return cycles, memberships
+
+
+def save(cycles, memberships, users):
+    """
+    Write the synthetic groups to the database, users holding memberships
+    in many groups. Return the ids of the cycles written.
+    """
+    from account.models import User
+    from esusu.models import Cycle, Group, Membership
+    from helpers.database import insert_rows
+
+    first_user = (User.objects.order_by("-id").values_list("id", flat=True).first() or 0) + 1
+    first_group = (Group.objects.order_by("-id").values_list("id", flat=True).first() or 0) + 1
+    first_cycle = (Cycle.objects.order_by("-id").values_list("id", flat=True).first() or 0) + 1
+    run = random.getrandbits(32)
+    insert_rows(User, ("id", "email", "first_name", "last_name", "password", "is_staff", "is_superuser", "is_active",
+                       "date_joined", "email_verified", "auth_version"), (
+        (first_user + n, f"rotation-{run}-{n}@example.com", "Bench", "User", "!", False, False, True,
+         datetime.datetime.now(datetime.timezone.utc), False, 0)
+        for n in range(users)
+    ))
+    insert_rows(Group, ("id", "name", "contribution", "interval"), (
+        (first_group + group_id - 1, f"Group {group_id}", contribution, interval)
+        for _, group_id, _, interval, contribution, _, _ in cycles
+    ))
+    insert_rows(Membership, ("group_id", "user_id", "slot", "share", "is_active"), (
+        (first_group + group_id - 1, first_user + membership_id % users, slot, share, True)
+        for group_id, slot, membership_id, share in memberships
+    ), ignore_conflicts=True)
+    insert_rows(Cycle, ("id", "group_id", "number", "starts_on", "contribution", "interval", "ordering", "seed"), (
+        (first_cycle + cycle_id - 1, first_group + group_id - 1, 1, starts_on, contribution, interval, ordering, seed)
+        for cycle_id, group_id, starts_on, interval, contribution, ordering, seed in cycles
+    ))
+    return first_cycle, first_cycle + len(cycles) - 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--groups", type=int, default=100000)
+    parser.add_argument("--shared", type=float, default=0.1, help="Fraction of slots held by two users.")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", action="store_true", help="Also save the groups and schedule them in the database.")
+    parser.add_argument("--users", type=int, default=10000, help="Users holding the saved memberships.")
+    args = parser.parse_args()
+
+    setup()
+    from esusu import rotation
+    from esusu.models import Cycle
+
+    cycles, memberships = synthesize(args.groups, args.shared, args.seed)
+    best = None
+    for _ in range(args.repeat):
+        rotation.due_dates.cache_clear()
+        start = time.perf_counter()
+        schedule = rotation.compute_schedule(cycles, memberships)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    report = {
+        "groups": args.groups,
+        "memberships": len(memberships),
+        "payouts": len(schedule),
+        "compute_seconds": round(best, 3),
+        "payouts_per_second": round(len(schedule) / best),
+    }
+
+    if args.save:
+        first, last = save(cycles, memberships, args.users)
+        start = time.perf_counter()
+        saved = rotation.schedule_payouts(Cycle.objects.filter(pk__range=(first, last)))
+        elapsed = time.perf_counter() - start
+        report["save"] = {
+            "payouts": len(saved),
+            "seconds": round(elapsed, 3),
+            "payouts_per_second": round(len(saved) / elapsed),
+        }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Per-response serialization overhead, DRF's serializers and json versus the
+compiled serializers and orjson.
+
+"detail" is the detail endpoint's body, one user; "list" one page of the
+staff user listing; "parse" a registration request body. Times are
+microseconds per response, the best of --repeat runs.
+
+    python -m benchmarks.serialization --iterations 20000
+"""
+import argparse
+import io
+import json
+import time
+
+from benchmarks import setup
+
+
+def per_call(function, iterations, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return round(best / iterations * 1e6, 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--page-size", type=int, default=50)
+    args = parser.parse_args()
+
+    setup()
+    from django.utils import timezone
+    from rest_framework import serializers
+    from rest_framework.parsers import JSONParser
+    from rest_framework.renderers import JSONRenderer
+    from account.models import User
+    from account.serializers import DetailSerializer, UserListSerializer
+    from helpers.parsers import ORJSONParser
+    from helpers.renderers import ORJSONRenderer
+
+    def uncompiled(serializer_class):
+        return type(serializer_class.__name__, (serializer_class,), {
+            "to_representation": serializers.Serializer.to_representation,
+        })
+
+    now = timezone.now()
+    user = User(id=1, email="bench@example.com", first_name="Bench", last_name="Mark", created_at=now)
+    page = [
+        User(id=i, email=f"bench{i}@example.com", first_name="Bench", last_name="Mark", created_at=now)
+        for i in range(args.page_size)
+    ]
+    body = json.dumps({
+        "email": "bench@example.com", "password": "aA1-K+4fX", "first_name": "Bench", "last_name": "Mark",
+    }).encode()
+
+    cases = {
+        "detail": (
+            lambda renderer, serializer: renderer.render(serializer(user).data),
+            DetailSerializer,
+        ),
+        "list": (
+            lambda renderer, serializer: renderer.render({"next": None, "results": serializer(page, many=True).data}),
+            UserListSerializer,
+        ),
+    }
+    report = {}
+    for name, (respond, serializer) in cases.items():
+        plain = uncompiled(serializer)
+        before = per_call(lambda: respond(JSONRenderer(), plain), args.iterations, args.repeat)
+        after = per_call(lambda: respond(ORJSONRenderer(), serializer), args.iterations, args.repeat)
+        report[name] = {"before_us": before, "after_us": after, "speedup": round(before / after, 2)}
+
+    before = per_call(lambda: JSONParser().parse(io.BytesIO(body)), args.iterations, args.repeat)
+    after = per_call(lambda: ORJSONParser().parse(io.BytesIO(body)), args.iterations, args.repeat)
+    report["parse"] = {"before_us": before, "after_us": after, "speedup": round(before / after, 2)}
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Legitimate login latency during a credential-stuffing burst, with and
+without the pre-hash throttles.
+
+Runs against a throwaway test database. Attackers post wrong passwords for
+a stream of leaked emails from a handful of IPs; legitimate users log in
+from their own IPs at a steady pace.
+
+    python -m benchmarks.throttle --seconds 10 --attackers 16 --users 4
+"""
+import argparse
+import itertools
+import json
+import logging
+import threading
+import time
+
+from benchmarks import percentile, setup
+
+
+PASSWORD = "aA1-K+4fX"
+
+
+def run(seconds, attackers, users, interval):
+    from django.test import Client
+    from django.urls import reverse
+
+    url = reverse("token_obtain_pair")
+    deadline = time.perf_counter() + seconds
+    latencies, statuses = [], []
+    attack_statuses = []
+    lock = threading.Lock()
+
+    def attack(n):
+        client = Client(REMOTE_ADDR=f"203.0.113.{n % 4}")
+        for i in itertools.count():
+            if time.perf_counter() > deadline:
+                return
+            response = client.post(url, {"email": f"leaked{n}-{i}@example.com", "password": "wrong"}, content_type="application/json")
+            with lock:
+                attack_statuses.append(response.status_code)
+
+    def login(n):
+        client = Client(REMOTE_ADDR=f"198.51.100.{n}")
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            response = client.post(url, {"email": f"user{n}@example.com", "password": PASSWORD}, content_type="application/json")
+            with lock:
+                latencies.append(time.perf_counter() - start)
+                statuses.append(response.status_code)
+            time.sleep(interval)
+
+    threads = [threading.Thread(target=attack, args=(n,)) for n in range(attackers)]
+    threads += [threading.Thread(target=login, args=(n,)) for n in range(users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return {
+        "legitimate": {
+            "requests": len(latencies),
+            "succeeded": statuses.count(200),
+            "p50_ms": percentile(latencies, 0.5),
+            "p99_ms": percentile(latencies, 0.99),
+        },
+        "attack": {
+            "requests": len(attack_statuses),
+            "throttled": attack_statuses.count(429),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--attackers", type=int, default=16)
+    parser.add_argument("--users", type=int, default=4)
+    parser.add_argument("--interval", type=float, default=0.5, help="Pause between a legitimate user's logins.")
+    parser.add_argument("--iterations", type=int, help="Override the PBKDF2 work factor.")
+    args = parser.parse_args()
+
+    setup()
+    from django.conf import settings
+    from django.db import connection
+    from django.test import override_settings
+    from django.test.utils import setup_test_environment
+    from account import throttling
+    from account.models import User
+
+    setup_test_environment()
+    # Every throttled request would log a warning
+    logging.getLogger("django.request").setLevel(logging.ERROR)
+    hashing = dict(settings.PASSWORD_HASHING)
+    if args.iterations:
+        hashing["ITERATIONS"] = args.iterations
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        with override_settings(PASSWORD_HASHING=hashing):
+            for n in range(args.users):
+                User.objects.create_user(email=f"user{n}@example.com", password=PASSWORD, first_name="First", last_name="Last")
+
+            results = {}
+            for label, rates in (("unthrottled", {}), ("throttled", settings.ACCOUNT_THROTTLE["RATES"])):
+                with override_settings(ACCOUNT_THROTTLE={**settings.ACCOUNT_THROTTLE, "RATES": rates}):
+                    throttling.get_store().clear()
+                    results[label] = run(args.seconds, args.attackers, args.users, args.interval)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,7 @@
+from django.contrib import admin
+from esusu.models import Cycle, Group, Membership, Payout
+
+admin.site.register(Group)
+admin.site.register(Membership)
+admin.site.register(Cycle)
+admin.site.register(Payout)
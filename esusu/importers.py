@@ -0,0 +1,263 @@
+"""
+Contributions in bulk, as collectors upload them at a deadline.
+
+Items are dicts with a client's idempotency key, a membership, a cycle and
+an amount in kobo. They're worked on a chunk at a time: a query for the
+keys already posted, which come back as duplicates of their posting;
+validation against an index of the groups the chunk's cycles are in,
+loaded once per group for the whole import; then the new postings in
+multi-row INSERTs, their entries (COPY on PostgreSQL) and the snapshots a
+query or two per few hundred, in one transaction per chunk. There's a
+result per item, in their order.
+"""
+import time
+from itertools import islice
+
+from django.db import transaction
+
+from esusu import ledger
+from esusu.models import WHOLE_SHARE, Cycle, Entry, Membership, Posting
+from helpers.database import insert_returning, insert_rows
+
+
+CREATED = "created"
+DUPLICATE = "duplicate"
+REJECTED = "rejected"
+
+KEY_LENGTH = Posting._meta.get_field("key").max_length
+
+REQUIRED = "This field is required."
+INVALID_INTEGER = "A valid integer is required."
+
+
+class Rejected(Exception):
+
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+
+def _integer(item, name, minimum=1):
+    value = item.get(name)
+    if value is None or value == "":
+        raise Rejected({name: [REQUIRED]})
+    if isinstance(value, str) and value.isdigit():
+        value = int(value)
+    elif isinstance(value, bool) or not isinstance(value, int):
+        raise Rejected({name: [INVALID_INTEGER]})
+    if value < minimum:
+        raise Rejected({name: [f"Ensure this value is greater than or equal to {minimum}."]})
+    return value
+
+
+def parse(item):
+    """
+    (key, membership_id, cycle_id, amount) of an item, or raise Rejected.
+    """
+    if isinstance(item, Exception):
+        # A row of a file that couldn't be parsed
+        raise Rejected({"non_field_errors": [str(item)]})
+    if not isinstance(item, dict):
+        raise Rejected({"non_field_errors": ["Expected an object."]})
+    key = item.get("key")
+    if not key:
+        raise Rejected({"key": [REQUIRED]})
+    if not isinstance(key, str):
+        raise Rejected({"key": ["Not a valid string."]})
+    if len(key) > KEY_LENGTH:
+        raise Rejected({"key": [f"Ensure this field has no more than {KEY_LENGTH} characters."]})
+    return key, _integer(item, "membership"), _integer(item, "cycle"), _integer(item, "amount")
+
+
+class GroupIndex:
+    """
+    What checking contributions takes of the groups they go to, read once
+    per group: their cycles' terms, who collects for them, and all their
+    memberships, which are few per group.
+    """
+
+    def __init__(self):
+        self.cycles = {}  # cycle id -> (group id, contribution)
+        self.collectors = {}  # group id -> id of the user who collects
+        self.memberships = {}  # membership id -> (group id, user id, share, active)
+        self.looked_up = set()
+
+    def load(self, cycle_ids):
+        cycle_ids = [cycle_id for cycle_id in cycle_ids if cycle_id not in self.looked_up]
+        if not cycle_ids:
+            return
+        self.looked_up.update(cycle_ids)
+        groups = []
+        for cycle_id, group_id, contribution, collector_id in Cycle.objects.filter(pk__in=cycle_ids).values_list(
+            "id", "group_id", "contribution", "group__created_by_id",
+        ):
+            self.cycles[cycle_id] = (group_id, contribution)
+            if group_id not in self.collectors:
+                self.collectors[group_id] = collector_id
+                groups.append(group_id)
+        if groups:
+            for membership_id, *membership in Membership.objects.filter(group_id__in=groups).values_list(
+                "id", "group_id", "user_id", "share", "is_active",
+            ):
+                self.memberships[membership_id] = tuple(membership)
+
+    def check(self, membership_id, cycle_id, amount, collector=None):
+        """
+        The group and user ids of a contribution, or raise Rejected. Members
+        pay at most their share of a contribution per item, rounded up.
+        """
+        cycle = self.cycles.get(cycle_id)
+        if cycle is None:
+            raise Rejected({"cycle": ["No such cycle."]})
+        group_id, contribution = cycle
+        if collector is not None and self.collectors[group_id] != collector.pk:
+            raise Rejected({"cycle": ["You don't collect for this cycle's group."]})
+        membership = self.memberships.get(membership_id)
+        if membership is None or membership[0] != group_id or not membership[3]:
+            raise Rejected({"membership": ["Not an active membership of the cycle's group."]})
+        due = -(-contribution * membership[2] // WHOLE_SHARE)
+        if amount > due:
+            raise Rejected({"amount": [f"Ensure this value is less than or equal to {due}."]})
+        return group_id, membership[1]
+
+
+def _result(key, status, posting_id=None, errors=None):
+    if status == REJECTED:
+        return {"key": key, "status": status, "errors": errors}
+    return {"key": key, "status": status, "posting": posting_id}
+
+
+def _posted(keys):
+    # key -> (posting id, membership id, cycle id, amount)
+    return {
+        key: posting
+        for key, *posting in Posting.objects.filter(key__in=keys).values_list(
+            "key", "id", "membership_id", "cycle_id", "amount",
+        )
+    }
+
+
+def _replay(key, contribution, posting):
+    # An item whose key was already posted
+    if tuple(posting[1:]) != contribution:
+        return _result(key, REJECTED, errors={"key": ["Already used for a different contribution."]})
+    return _result(key, DUPLICATE, posting[0])
+
+
+def _import_chunk(chunk, index, collector):
+    results = [None] * len(chunk)
+    parsed = []
+    for i, item in enumerate(chunk):
+        try:
+            parsed.append((i, *parse(item)))
+        except Rejected as e:
+            results[i] = _result(item.get("key") if isinstance(item, dict) else None, REJECTED, errors=e.errors)
+
+    posted = _posted({row[1] for row in parsed})
+    index.load({row[3] for row in parsed if row[1] not in posted})
+
+    # key -> (item, membership, cycle, amount, group, user) of the new
+    # contributions, the first item of a key standing for the others
+    new = {}
+    repeats = []
+    for i, key, membership_id, cycle_id, amount in parsed:
+        if key in posted:
+            results[i] = _replay(key, (membership_id, cycle_id, amount), posted[key])
+        elif key in new:
+            repeats.append((i, key, (membership_id, cycle_id, amount)))
+        else:
+            try:
+                new[key] = (i, membership_id, cycle_id, amount, *index.check(membership_id, cycle_id, amount, collector))
+            except Rejected as e:
+                results[i] = _result(key, REJECTED, errors=e.errors)
+
+    kind = Posting.Kind.CONTRIBUTION.value
+    ids = {}
+    if new:
+        with transaction.atomic():
+            ids = dict(insert_returning(Posting, ledger.POSTING_FIELDS, (
+                (kind, group_id, cycle_id, membership_id, user_id, amount, key)
+                for key, (_, membership_id, cycle_id, amount, group_id, user_id) in new.items()
+            ), returning=("key", "id"), ignore_conflicts=True))
+            # (posting, membership, cycle, amount, group, user)
+            created = [(ids[key], *new[key][1:]) for key in new if key in ids]
+            insert_rows(Entry, ledger.ENTRY_FIELDS, (
+                row for posting_id, _, _, amount, _, _ in created
+                for row in ledger.entry_rows(posting_id, kind, amount)
+            ))
+            ledger.move_snapshots(
+                (posting_id, kind, amount, user_id, membership_id, group_id, cycle_id)
+                for posting_id, membership_id, cycle_id, amount, group_id, user_id in created
+            )
+
+    # Keys a concurrent import posted first
+    raced = _posted([key for key in new if key not in ids])
+    for key, (i, *contribution) in new.items():
+        if key in ids:
+            results[i] = _result(key, CREATED, ids[key])
+        else:
+            results[i] = _replay(key, tuple(contribution[:3]), raced[key])
+    for i, key, contribution in repeats:
+        # Repeats of a key follow its first item, rejected with it if it
+        # lost to a different contribution
+        first = results[new[key][0]]
+        results[i] = first if first["status"] == REJECTED else _replay(
+            key, contribution, (first["posting"], *new[key][1:4]),
+        )
+    return results
+
+
+def import_contributions(items, collector=None, chunk_size=2000):
+    """
+    Post contributions from an iterable of item dicts, chunk_size at a
+    time, and yield a result dict per item, in their order: "created" or
+    "duplicate" with the posting, or "rejected" with the errors. With a
+    collector, only contributions to the groups they created are taken.
+    """
+    index = GroupIndex()
+    items = iter(items)
+    while True:
+        chunk = list(islice(items, chunk_size))
+        if not chunk:
+            return
+        yield from _import_chunk(chunk, index, collector)
+
+
+class ContributionReport:
+
+    def __init__(self, max_errors):
+        self.max_errors = max_errors
+        self.counts = {CREATED: 0, DUPLICATE: 0, REJECTED: 0}
+        self.errors = []
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def add(self, number, result):
+        self.counts[result["status"]] += 1
+        # Keep memory bounded however bad the file is
+        if result["status"] == REJECTED and len(self.errors) < self.max_errors:
+            self.errors.append({"row": number, "key": result["key"], "errors": result["errors"]})
+
+    def as_dict(self):
+        items = sum(self.counts.values())
+        return {
+            "items": items,
+            "created": self.counts[CREATED],
+            "duplicates": self.counts[DUPLICATE],
+            "rejected": self.counts[REJECTED],
+            "seconds": round(self.elapsed, 3),
+            "items_per_second": round(items / self.elapsed, 1) if self.elapsed else None,
+            "errors": self.errors,
+        }
+
+
+def import_file(rows, chunk_size=2000, max_errors=1000):
+    """
+    import_contributions() for the rows of a file, counted into a
+    ContributionReport rather than kept.
+    """
+    report = ContributionReport(max_errors)
+    for number, result in enumerate(import_contributions(rows, chunk_size=chunk_size), start=1):
+        report.add(number, result)
+    report.elapsed = time.perf_counter() - report.started
+    return report
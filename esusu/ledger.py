@@ -0,0 +1,550 @@
+"""
+The contribution ledger: every contribution and payout is a Posting of two
+Entry rows that add up to zero, and neither is ever changed or removed.
+
+Reading what a member has paid, or what is in a pot, must not sum the
+history, so each posting also moves the Balance snapshots of its user,
+membership, group and cycle, in the same transaction. How is up to the
+deployment, ESUSU_LEDGER["SNAPSHOTS"]:
+
+- LockedSnapshots, the default, locks them in the order of their keys,
+  then moves them by increments, so concurrent postings to the same pot
+  queue on its row instead of losing updates or deadlocking.
+- ShardedSnapshots spreads pots over several rows, added up on read, for
+  groups that all pay in the last minutes before a deadline.
+- VersionedSnapshots reads them without locks and writes them back only
+  if nobody else did meanwhile, retrying otherwise.
+
+Every update counts up a snapshot's version and the shards add up to the
+total whichever moved them, so a deployment can switch between them, even
+while both run. A batch of postings costs a query or two per few hundred
+snapshots, rather than one per snapshot.
+
+recompute() streams the ledger to check it and the snapshots against it;
+see the verify_ledger command.
+"""
+import logging
+import random
+import time
+from collections import defaultdict, namedtuple
+from functools import reduce
+from itertools import groupby
+from operator import itemgetter, or_
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import DatabaseError, IntegrityError, connection, transaction
+from django.db.models import F, Q, Value
+from django.db.models.functions import Greatest
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from esusu.models import Balance, Entry, Payout, Posting
+from helpers.database import insert_rows
+
+
+logger = logging.getLogger(__name__)
+
+# The snapshots a posting moves, in the order of LEDGER_FIELDS' owners
+SCOPES = tuple(scope.value for scope in (
+    Balance.Scope.USER, Balance.Scope.MEMBERSHIP, Balance.Scope.GROUP, Balance.Scope.CYCLE,
+))
+
+POT_SCOPES = (Balance.Scope.GROUP, Balance.Scope.CYCLE)
+
+# What moving the snapshots takes of a posting
+LEDGER_FIELDS = ("id", "kind", "amount", "user_id", "membership_id", "group_id", "cycle_id")
+
+POSTING_FIELDS = ("kind", "group_id", "cycle_id", "membership_id", "user_id", "amount", "key")
+ENTRY_FIELDS = ("posting_id", "account", "amount")
+BALANCE_FIELDS = ("paid_in", "paid_out", "postings", "last_posting_id")
+SNAPSHOT_FIELDS = ("scope", "owner_id", "shard", "version") + BALANCE_FIELDS
+
+# Snapshots locked or updated per query
+BATCH_SIZE = 500
+
+Drift = namedtuple("Drift", "scope owner_id recorded computed")
+
+
+def entry_rows(posting_id, kind, amount):
+    """
+    The member's and the pot's entries of a posting, as ENTRY_FIELDS rows.
+    """
+    amount = amount if kind == Posting.Kind.PAYOUT else -amount
+    return (
+        (posting_id, Entry.Account.MEMBER.value, amount),
+        (posting_id, Entry.Account.POT.value, -amount),
+    )
+
+
+def _deltas(postings):
+    # LEDGER_FIELDS rows -> {(scope, owner): [paid_in, paid_out, postings, last_posting_id]}
+    deltas = defaultdict(lambda: [0, 0, 0, 0])
+    for posting_id, kind, amount, *owners in postings:
+        side = 0 if kind == Posting.Kind.CONTRIBUTION else 1
+        for key in zip(SCOPES, owners):
+            delta = deltas[key]
+            delta[side] += amount
+            delta[2] += 1
+            delta[3] = max(delta[3], posting_id)
+    return deltas
+
+
+def _batches(keys, size=BATCH_SIZE):
+    for start in range(0, len(keys), size):
+        yield keys[start:start + size]
+
+
+def _lock(keys):
+    # Sorted (scope, owner_id, shard) keys, locked in their order, and a
+    # query per batch of them; return the ones that have a snapshot
+    found = set()
+    for batch in _batches(keys):
+        owners = defaultdict(list)
+        for scope, owner_id, shard in batch:
+            owners[scope, shard].append(owner_id)
+        condition = reduce(or_, (
+            Q(scope=scope, shard=shard, owner_id__in=ids) for (scope, shard), ids in owners.items()
+        ))
+        found.update(
+            Balance.objects.select_for_update().filter(condition).order_by("scope", "owner_id", "shard")
+            .values_list("scope", "owner_id", "shard")
+        )
+    return found
+
+
+def _read(keys):
+    # {key: (version, paid_in, paid_out, postings, last_posting_id)} of the
+    # snapshots of keys there are, unlocked
+    recorded = {}
+    for batch in _batches(keys):
+        owners = defaultdict(list)
+        for scope, owner_id, shard in batch:
+            owners[scope, shard].append(owner_id)
+        condition = reduce(or_, (
+            Q(scope=scope, shard=shard, owner_id__in=ids) for (scope, shard), ids in owners.items()
+        ))
+        for scope, owner_id, shard, *values in Balance.objects.filter(condition).values_list(
+            "scope", "owner_id", "shard", "version", *BALANCE_FIELDS,
+        ):
+            recorded[scope, owner_id, shard] = tuple(values)
+    return recorded
+
+
+def _create(keys):
+    # First postings of their owners. A concurrent posting may be creating
+    # the same rows, hence ignoring conflicts and moving them afterwards
+    # with the others rather than inserting the totals.
+    insert_rows(Balance, SNAPSHOT_FIELDS, ((*key, 0, 0, 0, 0, 0) for key in keys), ignore_conflicts=True)
+
+
+def _updates_from_values():
+    return connection.vendor == "postgresql" or (
+        connection.vendor == "sqlite" and connection.Database.sqlite_version_info >= (3, 33)
+    )
+
+
+def _update_from_values(assignments, rows, condition=""):
+    # An UPDATE ... FROM (VALUES ...) per batch of rows, which start with
+    # the key: both backends name the columns of a VALUES list column1,
+    # column2... {t} in assignments and condition is the table. Return the
+    # number of snapshots updated.
+    table = connection.ops.quote_name(Balance._meta.db_table)
+    greatest = "MAX" if connection.vendor == "sqlite" else "GREATEST"
+    assignments, condition = (sql.format(t=table, greatest=greatest) for sql in (assignments, condition))
+    width = len(rows[0])
+    now = Balance._meta.get_field("updated_at").get_db_prep_save(timezone.now(), connection)
+    size = min(BATCH_SIZE, (connection.features.max_query_params or BATCH_SIZE * width) // width)
+    row = "(%s)" % ", ".join(["%s"] * width)
+    updated = 0
+    with connection.cursor() as cursor:
+        for batch in _batches(rows, size):
+            cursor.execute(
+                f"UPDATE {table} SET {assignments}, version = {table}.version + 1, updated_at = %s "
+                f"FROM (VALUES {', '.join([row] * len(batch))}) AS v "
+                f"WHERE {table}.scope = v.column1 AND {table}.owner_id = v.column2 AND {table}.shard = v.column3"
+                f"{condition}",
+                [now, *(value for row in batch for value in row)],
+            )
+            updated += cursor.rowcount
+    return updated
+
+
+def _move(keys, deltas):
+    # Move locked snapshots by their deltas
+    if _updates_from_values():
+        _update_from_values(
+            "paid_in = {t}.paid_in + v.column4, paid_out = {t}.paid_out + v.column5, "
+            "postings = {t}.postings + v.column6, last_posting_id = {greatest}({t}.last_posting_id, v.column7)",
+            [(*key, *deltas[key]) for key in keys],
+        )
+        return
+    now = timezone.now()
+    for key in keys:
+        scope, owner_id, shard = key
+        paid_in, paid_out, postings, last_posting_id = deltas[key]
+        Balance.objects.filter(scope=scope, owner_id=owner_id, shard=shard).update(
+            paid_in=F("paid_in") + paid_in,
+            paid_out=F("paid_out") + paid_out,
+            postings=F("postings") + postings,
+            last_posting_id=Greatest(F("last_posting_id"), Value(last_posting_id)),
+            version=F("version") + 1,
+            updated_at=now,
+        )
+
+
+def _write(keys, recorded, totals):
+    # Set snapshots to their totals where their version is still the
+    # recorded one; return how many were
+    rows = [(*key, recorded[key][0], *totals[key]) for key in keys]
+    if _updates_from_values():
+        return _update_from_values(
+            "paid_in = v.column5, paid_out = v.column6, postings = v.column7, last_posting_id = v.column8",
+            rows, " AND {t}.version = v.column4",
+        )
+    now = timezone.now()
+    updated = 0
+    for scope, owner_id, shard, version, *values in rows:
+        updated += Balance.objects.filter(scope=scope, owner_id=owner_id, shard=shard, version=version).update(
+            **dict(zip(BALANCE_FIELDS, values)), version=F("version") + 1, updated_at=now,
+        )
+    return updated
+
+
+def _deadlocked(error):
+    # PostgreSQL's deadlock_detected: one UPDATE of several rows doesn't
+    # take them in any particular order
+    return getattr(error.__cause__, "pgcode", None) == "40P01"
+
+
+class SnapshotConflict(DatabaseError):
+    """
+    The snapshots a posting moves kept changing under VersionedSnapshots.
+    """
+
+
+class LockedSnapshots:
+    """
+    A snapshot per owner. A transaction locks the snapshots it moves in the
+    order of their keys before moving any of them by increments, so
+    concurrent postings to a pot queue on its row until each other commit,
+    rather than lose updates or deadlock.
+    """
+
+    def shard(self, deltas):
+        """
+        Key deltas by (scope, owner_id, shard).
+        """
+        return {(scope, owner_id, 0): delta for (scope, owner_id), delta in deltas.items()}
+
+    def move(self, deltas):
+        """
+        Move snapshots by deltas, {(scope, owner_id): [paid_in, paid_out,
+        postings, last_posting_id]}, in the transaction of their postings.
+        """
+        deltas = self.shard(deltas)
+        keys = sorted(deltas)
+        found = _lock(keys)
+        missing = [key for key in keys if key not in found]
+        if missing:
+            _create(missing)
+        _move(keys, deltas)
+
+
+class ShardedSnapshots(LockedSnapshots):
+    """
+    LockedSnapshots with the pots of groups and cycles spread over `shards`
+    rows each. A transaction moves one of them, picked at random, so
+    postings to the same pot queue on each other once in `shards` times
+    and a group paying in at once doesn't go one member at a time. Members'
+    snapshots keep a row, as a member's postings seldom overlap.
+    balance() and recompute() add the shards up.
+    """
+
+    def __init__(self, shards=16):
+        self.shards = shards
+
+    def shard(self, deltas):
+        shard = random.randrange(self.shards)
+        return {
+            (scope, owner_id, shard if scope in POT_SCOPES else 0): delta
+            for (scope, owner_id), delta in deltas.items()
+        }
+
+
+class VersionedSnapshots:
+    """
+    A snapshot per owner, read without locking and written back where its
+    version is still the one read, in a savepoint. When another posting got
+    there first the savepoint is rolled back and the snapshots read again,
+    after a random backoff that doubles each time, up to `retries` times
+    before raising SnapshotConflict. On PostgreSQL this takes READ
+    COMMITTED, the default, for a retry to see what was committed since.
+
+    Nothing is held from the read to the write, which suits pots posted to
+    now and then from many processes. A pot that a whole group pays into at
+    once conflicts on most attempts: shard it instead.
+    """
+
+    def __init__(self, retries=10, backoff=0.002):
+        self.retries = retries
+        self.backoff = backoff
+
+    def _attempt(self, keys, deltas):
+        recorded = _read(keys)
+        missing = [key for key in keys if key not in recorded]
+        if missing:
+            _create(missing)
+            recorded.update((key, (0, 0, 0, 0, 0)) for key in missing)
+        totals = {}
+        for key in keys:
+            _, paid_in, paid_out, postings, last_posting_id = recorded[key]
+            delta = deltas[key]
+            totals[key] = (
+                paid_in + delta[0], paid_out + delta[1], postings + delta[2], max(last_posting_id, delta[3]),
+            )
+        if _write(keys, recorded, totals) != len(keys):
+            raise SnapshotConflict("The snapshots changed since they were read")
+
+    def move(self, deltas):
+        deltas = {(scope, owner_id, 0): delta for (scope, owner_id), delta in deltas.items()}
+        keys = sorted(deltas)
+        for attempt in range(self.retries + 1):
+            if attempt:
+                time.sleep(random.uniform(0, self.backoff * 2 ** (attempt - 1)))
+            try:
+                with transaction.atomic():
+                    self._attempt(keys, deltas)
+                return
+            except SnapshotConflict:
+                logger.debug("Snapshots changed under attempt %d to move them", attempt + 1)
+            except DatabaseError as e:
+                if not _deadlocked(e):
+                    raise
+                logger.debug("Deadlocked on attempt %d to move snapshots", attempt + 1)
+        raise SnapshotConflict(f"The snapshots changed under {self.retries + 1} attempts to move them")
+
+
+_snapshots = None
+
+
+def get_snapshots():
+    """
+    How this deployment moves snapshots, ESUSU_LEDGER["SNAPSHOTS"].
+    """
+    global _snapshots
+    if _snapshots is None:
+        config = settings.ESUSU_LEDGER
+        _snapshots = import_string(config["SNAPSHOTS"])(**config.get("OPTIONS", {}))
+    return _snapshots
+
+
+@receiver(setting_changed)
+def reset_snapshots(*, setting, **kwargs):
+    global _snapshots
+    if setting == "ESUSU_LEDGER":
+        _snapshots = None
+
+
+def move_snapshots(postings):
+    """
+    Move the snapshots of postings, LEDGER_FIELDS rows, in the transaction
+    that saves them.
+    """
+    get_snapshots().move(_deltas(postings))
+
+
+def post(postings):
+    """
+    Save unsaved Postings with their entries and move their snapshots, all
+    or nothing. The postings get their primary keys.
+    """
+    postings = list(postings)
+    with transaction.atomic():
+        Posting.objects.bulk_create(postings)
+        insert_rows(Entry, ENTRY_FIELDS, (
+            row for posting in postings for row in entry_rows(posting.pk, posting.kind, posting.amount)
+        ))
+        move_snapshots(
+            (posting.pk, posting.kind, posting.amount, posting.user_id, posting.membership_id, posting.group_id,
+             posting.cycle_id)
+            for posting in postings
+        )
+    return postings
+
+
+def contribute(membership, cycle, amount, key=None):
+    """
+    Post a membership's contribution to a cycle's pot. A key already posted
+    returns the posting it was given to instead, so a client can retry;
+    raise ValueError if that was a different contribution.
+    """
+    if membership.group_id != cycle.group_id:
+        raise ValueError("The membership isn't in the cycle's group")
+    if amount <= 0:
+        raise ValueError("A contribution must be a positive amount")
+    posting = Posting(
+        kind=Posting.Kind.CONTRIBUTION,
+        group_id=cycle.group_id,
+        cycle=cycle,
+        membership=membership,
+        user_id=membership.user_id,
+        amount=amount,
+        key=key,
+    )
+    try:
+        # In its own transaction or savepoint, so a taken key rolls it back
+        post([posting])
+    except IntegrityError:
+        if key is None:
+            raise
+        existing = Posting.objects.filter(key=key).first()
+        if existing is None:
+            raise
+        if (existing.kind, existing.membership_id, existing.cycle_id, existing.amount) != (
+            Posting.Kind.CONTRIBUTION, membership.pk, cycle.pk, amount,
+        ):
+            raise ValueError("The key was already used for a different contribution")
+        return existing
+    return posting
+
+
+def pay_out(payout):
+    """
+    Pay a scheduled Payout from its cycle's pot and post it. Raise
+    ValueError if it was already paid or the pot doesn't hold enough.
+    """
+    with transaction.atomic():
+        payout = Payout.objects.select_for_update().select_related("cycle", "membership").get(pk=payout.pk)
+        if payout.paid_at is not None:
+            raise ValueError("The payout was already paid")
+        # Other payouts of the cycle wait on its pot's snapshots, all its
+        # shards in their order, until this one is posted. The pot is read
+        # once they're held, by a query of its own, so it takes in what a
+        # payout that held them before committed, new shards included.
+        list(
+            Balance.objects.select_for_update().filter(scope=Balance.Scope.CYCLE, owner_id=payout.cycle_id)
+            .order_by("shard").values_list("pk", flat=True)
+        )
+        if balance(Balance.Scope.CYCLE, payout.cycle_id).net < payout.amount:
+            raise ValueError("The pot doesn't hold enough for the payout")
+        payout.paid_at = timezone.now()
+        payout.save(update_fields=["paid_at", "updated_at"])
+        posting = Posting(
+            kind=Posting.Kind.PAYOUT,
+            group_id=payout.cycle.group_id,
+            cycle_id=payout.cycle_id,
+            membership_id=payout.membership_id,
+            user_id=payout.membership.user_id,
+            amount=payout.amount,
+        )
+        post([posting])
+    return posting
+
+
+def _merge(scope, owner_id, shards):
+    # An unsaved snapshot adding up shards, BALANCE_FIELDS tuples
+    merged = Balance(scope=scope, owner_id=owner_id)
+    for paid_in, paid_out, postings, last_posting_id in shards:
+        merged.paid_in += paid_in
+        merged.paid_out += paid_out
+        merged.postings += postings
+        merged.last_posting_id = max(merged.last_posting_id, last_posting_id)
+    return merged
+
+
+def balance(scope, owner_id):
+    """
+    The snapshot of an owner: its row, an unsaved one adding up its shards
+    if it has several, or an empty unsaved one if nothing was posted.
+    """
+    shards = list(Balance.objects.filter(scope=scope, owner_id=owner_id))
+    if len(shards) == 1:
+        return shards[0]
+    return _merge(scope, owner_id, (
+        tuple(getattr(shard, name) for name in BALANCE_FIELDS) for shard in shards
+    ))
+
+
+def _recorded(chunk_size):
+    # (scope, owner_id, recorded) per owner, its shards added up
+    rows = Balance.objects.order_by("scope", "owner_id").values_list(
+        "scope", "owner_id", *BALANCE_FIELDS,
+    ).iterator(chunk_size=chunk_size)
+    for (scope, owner_id), shards in groupby(rows, itemgetter(0, 1)):
+        merged = _merge(scope, owner_id, (shard[2:] for shard in shards))
+        yield scope, owner_id, [getattr(merged, name) for name in BALANCE_FIELDS]
+
+
+def _set(scope, owner_id, values):
+    # Collapse an owner's shards into one holding values
+    snapshots = Balance.objects.filter(scope=scope, owner_id=owner_id)
+    snapshots.exclude(shard=0).delete()
+    values = dict(zip(BALANCE_FIELDS, values))
+    if not snapshots.update(**values, version=F("version") + 1, updated_at=timezone.now()):
+        Balance.objects.create(scope=scope, owner_id=owner_id, **values)
+
+
+def _ledger(chunk_size):
+    # A row per entry, a single row of Nones for a posting without any
+    rows = Posting.objects.order_by("pk").values_list(
+        *LEDGER_FIELDS, "entries__account", "entries__amount",
+    ).iterator(chunk_size=chunk_size)
+    return groupby(rows, itemgetter(0))
+
+
+def recompute(chunk_size=5000, fix=False):
+    """
+    Recompute every snapshot from the ledger and compare. Postings and
+    snapshots are both streamed; only the totals are kept, one per owner.
+
+    Return (postings, errors, drifts): the number of postings read,
+    messages about postings whose entries don't match them, and Drifts for
+    snapshots that disagree with the entries (recorded is None when
+    missing), their shards added up. With fix, the snapshots are set to
+    what was computed, in a single shard.
+    """
+    totals = defaultdict(lambda: [0, 0, 0, 0])
+    errors = []
+    count = 0
+
+    # A consistent view of both tables, with postings going on
+    repeatable = connection.vendor == "postgresql" and not connection.in_atomic_block
+    with transaction.atomic():
+        if repeatable:
+            with connection.cursor() as cursor:
+                cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+
+        for posting_id, rows in _ledger(chunk_size):
+            rows = list(rows)
+            count += 1
+            _, kind, amount, *owners = rows[0][:7]
+            sides = {Entry.Account.MEMBER: 0, Entry.Account.POT: 0}
+            for row in rows:
+                if row[7] is not None:
+                    sides[row[7]] += row[8]
+            sign = 1 if kind == Posting.Kind.PAYOUT else -1
+            if len(rows) != 2 or sides != {Entry.Account.MEMBER: sign * amount, Entry.Account.POT: -sign * amount}:
+                errors.append(f"Posting {posting_id} of {amount} has entries {sorted(row[7:] for row in rows)}")
+            # The snapshots follow the entries, the money that actually moved,
+            # from the pot's side for pots, the member's for members
+            member, pot = -sides[Entry.Account.MEMBER], sides[Entry.Account.POT]
+            for scope, owner_id in zip(SCOPES, owners):
+                moved = pot if scope in POT_SCOPES else member
+                total = totals[scope, owner_id]
+                total[0 if moved >= 0 else 1] += abs(moved)
+                total[2] += 1
+                total[3] = posting_id
+
+        drifts = []
+        for scope, owner_id, recorded in _recorded(chunk_size):
+            computed = totals.pop((scope, owner_id), [0, 0, 0, 0])
+            if recorded != computed:
+                drifts.append(Drift(scope, owner_id, tuple(recorded), tuple(computed)))
+        drifts.extend(Drift(scope, owner_id, None, tuple(computed)) for (scope, owner_id), computed in totals.items())
+
+        if fix:
+            for drift in drifts:
+                _set(drift.scope, drift.owner_id, drift.computed)
+    return count, errors, drifts
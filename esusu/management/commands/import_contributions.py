@@ -0,0 +1,33 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from account.importers import FORMATS, guess_format, read_rows
+from esusu.importers import import_file
+
+
+class Command(BaseCommand):
+    help = "Post contributions from a CSV or NDJSON file with key, membership, cycle and amount columns."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help='File to import, or "-" for standard input.')
+        parser.add_argument("--format", choices=FORMATS, help="Defaults to ndjson for .ndjson/.jsonl files, csv otherwise.")
+        parser.add_argument("--chunk-size", type=int, default=2000, help="Rows validated and written at a time.")
+        parser.add_argument("--max-errors", type=int, default=1000, help="Rejected rows to include in the report.")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        format = options["format"] or guess_format(path)
+        try:
+            stream = sys.stdin if path == "-" else open(path, newline="", encoding="utf-8")
+        except OSError as e:
+            raise CommandError(e)
+
+        try:
+            report = import_file(read_rows(stream, format), chunk_size=options["chunk_size"], max_errors=options["max_errors"])
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        self.stdout.write(json.dumps(report.as_dict(), indent=2))
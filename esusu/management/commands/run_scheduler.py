@@ -0,0 +1,29 @@
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+
+from esusu.scheduler import DeadlineQueue, Worker
+
+
+class Command(BaseCommand):
+    help = "Process contribution and payout deadlines as they fall due. Several can run at once."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500, help="Deadlines claimed per transaction.")
+        parser.add_argument("--queue-size", type=int, default=1000, help="Next deadlines kept in memory.")
+        parser.add_argument("--refresh", type=float, default=60.0, help="Seconds between reads of the next deadlines.")
+        parser.add_argument("--once", action="store_true", help="Process what is due now and exit, e.g. from cron.")
+
+    def handle(self, *args, **options):
+        worker = Worker(options["batch_size"], DeadlineQueue(options["queue_size"], options["refresh"]), options["refresh"])
+        if options["once"]:
+            self.stdout.write(f"Processed {len(worker.run_once())} deadlines")
+            return
+
+        stop = threading.Event()
+        signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+        try:
+            worker.run(stop)
+        except KeyboardInterrupt:
+            pass
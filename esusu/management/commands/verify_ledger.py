@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from esusu.ledger import recompute
+
+
+class Command(BaseCommand):
+    help = "Recompute the balance snapshots from the ledger entries and report any drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=5000, help="Rows fetched from the cursor at a time.")
+        parser.add_argument("--fix", action="store_true", help="Set drifted snapshots to the recomputed balances.")
+
+    def handle(self, *args, **options):
+        count, errors, drifts = recompute(options["chunk_size"], fix=options["fix"])
+        for error in errors:
+            self.stderr.write(error)
+        for drift in drifts:
+            self.stderr.write(
+                f"{drift.scope} {drift.owner_id}: recorded {drift.recorded or 'nothing'}, computed {drift.computed}"
+            )
+        self.stdout.write(f"Checked {count} postings: {len(errors)} unbalanced, {len(drifts)} drifted snapshots")
+        if errors or (drifts and not options["fix"]):
+            raise CommandError("The ledger doesn't add up")
@@ -0,0 +1,97 @@
+# Generated by Django 4.0.6 on 2026-10-18 20:22
+
+from django.conf import settings
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+import esusu.models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Cycle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('number', models.PositiveIntegerField(verbose_name='number')),
+                ('starts_on', models.DateField(verbose_name='starts on')),
+                ('contribution', models.PositiveBigIntegerField(verbose_name='contribution')),
+                ('interval', models.CharField(choices=[('daily', 'daily'), ('weekly', 'weekly'), ('fortnightly', 'fortnightly'), ('monthly', 'monthly'), ('bimonthly', 'every two months')], max_length=16, verbose_name='interval')),
+                ('ordering', models.CharField(choices=[('slot', 'by slot'), ('ballot', 'by ballot')], default='slot', max_length=16, verbose_name='ordering')),
+                ('seed', models.PositiveIntegerField(default=esusu.models.new_seed, help_text='Draws the ballot, so the order can be recomputed.', verbose_name='seed')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Group',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('name', models.CharField(max_length=150, verbose_name='name')),
+                ('contribution', models.PositiveBigIntegerField(help_text='Paid by each slot at every interval, in kobo.', verbose_name='contribution')),
+                ('interval', models.CharField(choices=[('daily', 'daily'), ('weekly', 'weekly'), ('fortnightly', 'fortnightly'), ('monthly', 'monthly'), ('bimonthly', 'every two months')], max_length=16, verbose_name='interval')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ('-created_at',),
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='Membership',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('slot', models.PositiveIntegerField(verbose_name='slot')),
+                ('share', models.PositiveIntegerField(default=10000, help_text='Part of the slot held, out of 10000.', validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(10000)], verbose_name='share')),
+                ('is_active', models.BooleanField(default=True, verbose_name='active')),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='memberships', to='esusu.group')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='memberships', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Payout',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('position', models.PositiveIntegerField(help_text="The slot's turn in the cycle, from 1.", verbose_name='position')),
+                ('due_on', models.DateField(verbose_name='due on')),
+                ('amount', models.PositiveBigIntegerField(help_text='In kobo.', verbose_name='amount')),
+                ('paid_at', models.DateTimeField(blank=True, null=True, verbose_name='paid at')),
+                ('cycle', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payouts', to='esusu.cycle')),
+                ('membership', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payouts', to='esusu.membership')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='cycle',
+            name='group',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cycles', to='esusu.group'),
+        ),
+        migrations.AddConstraint(
+            model_name='payout',
+            constraint=models.UniqueConstraint(fields=('cycle', 'membership'), name='esusu_payout_cycle_membership_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='membership',
+            constraint=models.UniqueConstraint(fields=('group', 'slot', 'user'), name='esusu_membership_slot_user_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='membership',
+            constraint=models.CheckConstraint(check=models.Q(('share__gte', 1), ('share__lte', 10000)), name='esusu_membership_share_range'),
+        ),
+        migrations.AddConstraint(
+            model_name='cycle',
+            constraint=models.UniqueConstraint(fields=('group', 'number'), name='esusu_cycle_group_number_uniq'),
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 4.0.6 on 2026-10-18 20:38
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('esusu', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Balance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(choices=[('user', 'user'), ('membership', 'membership'), ('group', 'group'), ('cycle', 'cycle')], max_length=16, verbose_name='scope')),
+                ('owner_id', models.BigIntegerField(verbose_name='owner id')),
+                ('paid_in', models.PositiveBigIntegerField(default=0, verbose_name='paid in')),
+                ('paid_out', models.PositiveBigIntegerField(default=0, verbose_name='paid out')),
+                ('postings', models.PositiveBigIntegerField(default=0, verbose_name='postings')),
+                ('last_posting_id', models.BigIntegerField(default=0, verbose_name='last posting')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Posting',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('contribution', 'contribution'), ('payout', 'payout')], max_length=16, verbose_name='kind')),
+                ('amount', models.PositiveBigIntegerField(help_text='In kobo.', verbose_name='amount')),
+                ('key', models.CharField(blank=True, help_text="Given by the client, so a retried request isn't posted twice.", max_length=64, null=True, unique=True, verbose_name='idempotency key')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('cycle', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='postings', to='esusu.cycle')),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='esusu.group')),
+                ('membership', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='postings', to='esusu.membership')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='postings', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Entry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('account', models.CharField(choices=[('member', 'member'), ('pot', 'pot')], max_length=8, verbose_name='account')),
+                ('amount', models.BigIntegerField(help_text='Signed, in kobo.', verbose_name='amount')),
+                ('posting', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='entries', to='esusu.posting')),
+            ],
+            options={
+                'verbose_name_plural': 'entries',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='balance',
+            constraint=models.UniqueConstraint(fields=('scope', 'owner_id'), name='esusu_balance_scope_owner_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='posting',
+            constraint=models.CheckConstraint(check=models.Q(('amount__gt', 0)), name='esusu_posting_amount_positive'),
+        ),
+    ]
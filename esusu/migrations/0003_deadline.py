@@ -0,0 +1,34 @@
+# Generated by Django 4.0.6 on 2026-10-18 20:47
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('esusu', '0002_ledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Deadline',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('contribution', 'contribution'), ('payout', 'payout')], max_length=16, verbose_name='kind')),
+                ('turn', models.PositiveIntegerField(help_text="The contribution's turn, or the payout's position.", verbose_name='turn')),
+                ('turns', models.PositiveIntegerField(help_text='Turns in the cycle.', verbose_name='turns')),
+                ('due_at', models.DateTimeField(blank=True, help_text='Empty once done.', null=True, verbose_name='due at')),
+                ('cycle', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deadlines', to='esusu.cycle')),
+                ('membership', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deadlines', to='esusu.membership')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='deadline',
+            index=models.Index(condition=models.Q(('due_at__isnull', False)), fields=['due_at', 'id'], name='esusu_deadline_due_at_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='deadline',
+            constraint=models.UniqueConstraint(fields=('kind', 'cycle', 'membership'), name='esusu_deadline_kind_cycle_membership_uniq'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.0.6 on 2026-10-18 20:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('esusu', '0003_deadline'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='balance',
+            name='shard',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='shard'),
+        ),
+        migrations.AddField(
+            model_name='balance',
+            name='version',
+            field=models.PositiveBigIntegerField(default=0, verbose_name='version'),
+        ),
+        migrations.AddConstraint(
+            model_name='balance',
+            constraint=models.UniqueConstraint(fields=('scope', 'owner_id', 'shard'), name='esusu_balance_scope_owner_shard_uniq'),
+        ),
+        migrations.RemoveConstraint(
+            model_name='balance',
+            name='esusu_balance_scope_owner_uniq',
+        ),
+    ]
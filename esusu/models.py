@@ -0,0 +1,263 @@
+import secrets
+
+from django.conf import settings
+from django.core.validators import MaxValueValidator, MinValueValidator
+from django.db import models
+from django.db.models import Q
+from django.utils.translation import gettext_lazy as _
+from helpers.models import TrackingModel
+
+
+# A membership's share of its slot, out of this many parts. Users who can't
+# afford a whole contribution share a slot, paying in and collecting in
+# proportion to their shares.
+WHOLE_SHARE = 10000
+
+
+def new_seed():
+    return secrets.randbits(31)
+
+
+class Interval(models.TextChoices):
+    DAILY = "daily", _("daily")
+    WEEKLY = "weekly", _("weekly")
+    FORTNIGHTLY = "fortnightly", _("fortnightly")
+    MONTHLY = "monthly", _("monthly")
+    BIMONTHLY = "bimonthly", _("every two months")
+
+
+class Group(TrackingModel):
+    """
+    An esusu group. Every slot pays `contribution` at each interval, and the
+    whole pot goes to one slot in turn; see esusu.rotation.
+    """
+
+    name = models.CharField(_("name"), max_length=150)
+    contribution = models.PositiveBigIntegerField(
+        _("contribution"),
+        help_text=_("Paid by each slot at every interval, in kobo."),
+    )
+    interval = models.CharField(_("interval"), max_length=16, choices=Interval.choices)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL, related_name="+",
+    )
+
+    def __str__(self):
+        return self.name
+
+
+class Membership(TrackingModel):
+    """
+    A user's place in a group's rotation. A user may hold several slots in a
+    group, and several users may share one slot, each with a part of it.
+    """
+
+    group = models.ForeignKey(Group, on_delete=models.CASCADE, related_name="memberships")
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="memberships")
+    slot = models.PositiveIntegerField(_("slot"))
+    share = models.PositiveIntegerField(
+        _("share"),
+        default=WHOLE_SHARE,
+        validators=[MinValueValidator(1), MaxValueValidator(WHOLE_SHARE)],
+        help_text=_("Part of the slot held, out of 10000."),
+    )
+    is_active = models.BooleanField(_("active"), default=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["group", "slot", "user"], name="esusu_membership_slot_user_uniq"),
+            models.CheckConstraint(check=Q(share__gte=1, share__lte=WHOLE_SHARE), name="esusu_membership_share_range"),
+        ]
+
+
+class Cycle(TrackingModel):
+    """
+    One rotation of a group: every slot collects the pot once. The terms are
+    copied from the group when the cycle starts, so changing the group only
+    affects the cycles after it.
+    """
+
+    class Ordering(models.TextChoices):
+        # Slots are handed out in the order the members agreed on
+        SLOT = "slot", _("by slot")
+        BALLOT = "ballot", _("by ballot")
+
+    group = models.ForeignKey(Group, on_delete=models.CASCADE, related_name="cycles")
+    number = models.PositiveIntegerField(_("number"))
+    starts_on = models.DateField(_("starts on"))
+    contribution = models.PositiveBigIntegerField(_("contribution"))
+    interval = models.CharField(_("interval"), max_length=16, choices=Interval.choices)
+    ordering = models.CharField(_("ordering"), max_length=16, choices=Ordering.choices, default=Ordering.SLOT)
+    seed = models.PositiveIntegerField(
+        _("seed"),
+        default=new_seed,
+        help_text=_("Draws the ballot, so the order can be recomputed."),
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["group", "number"], name="esusu_cycle_group_number_uniq"),
+        ]
+
+
+class Payout(TrackingModel):
+    """
+    What a membership collects in a cycle, and when. A shared slot's pot is
+    one payout per sharer.
+    """
+
+    cycle = models.ForeignKey(Cycle, on_delete=models.CASCADE, related_name="payouts")
+    membership = models.ForeignKey(Membership, on_delete=models.CASCADE, related_name="payouts")
+    position = models.PositiveIntegerField(_("position"), help_text=_("The slot's turn in the cycle, from 1."))
+    due_on = models.DateField(_("due on"))
+    amount = models.PositiveBigIntegerField(_("amount"), help_text=_("In kobo."))
+    paid_at = models.DateTimeField(_("paid at"), null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["cycle", "membership"], name="esusu_payout_cycle_membership_uniq"),
+        ]
+
+
+class AppendOnlyQuerySet(models.QuerySet):
+    """
+    For ledger rows, which are only ever added: a mistake is corrected by
+    another posting, never by changing or removing one.
+    """
+
+    def update(self, **kwargs):
+        raise TypeError(f"{self.model.__name__} rows can't be updated")
+
+    def delete(self):
+        raise TypeError(f"{self.model.__name__} rows can't be deleted")
+
+
+class AppendOnlyModel(models.Model):
+
+    objects = AppendOnlyQuerySet.as_manager()
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise TypeError(f"{type(self).__name__} rows can't be updated")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise TypeError(f"{type(self).__name__} rows can't be deleted")
+
+
+class Posting(AppendOnlyModel):
+    """
+    Money moving between a member and a cycle's pot: a contribution into it
+    or a payout from it. The group and user are copied from the cycle and
+    membership, so the ledger can be summed without joins.
+    """
+
+    class Kind(models.TextChoices):
+        CONTRIBUTION = "contribution", _("contribution")
+        PAYOUT = "payout", _("payout")
+
+    kind = models.CharField(_("kind"), max_length=16, choices=Kind.choices)
+    group = models.ForeignKey(Group, on_delete=models.PROTECT, related_name="+")
+    cycle = models.ForeignKey(Cycle, on_delete=models.PROTECT, related_name="postings")
+    membership = models.ForeignKey(Membership, on_delete=models.PROTECT, related_name="postings")
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.PROTECT, related_name="postings")
+    amount = models.PositiveBigIntegerField(_("amount"), help_text=_("In kobo."))
+    key = models.CharField(
+        _("idempotency key"), max_length=64, null=True, blank=True, unique=True,
+        help_text=_("Given by the client, so a retried request isn't posted twice."),
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(check=Q(amount__gt=0), name="esusu_posting_amount_positive"),
+        ]
+
+
+class Entry(AppendOnlyModel):
+    """
+    One side of a posting. A posting's entries add up to zero: the member's
+    account is debited and the pot credited for a contribution, the other
+    way round for a payout.
+    """
+
+    class Account(models.TextChoices):
+        MEMBER = "member", _("member")
+        POT = "pot", _("pot")
+
+    posting = models.ForeignKey(Posting, on_delete=models.PROTECT, related_name="entries")
+    account = models.CharField(_("account"), max_length=8, choices=Account.choices)
+    amount = models.BigIntegerField(_("amount"), help_text=_("Signed, in kobo."))
+
+    class Meta:
+        verbose_name_plural = "entries"
+
+
+class Balance(models.Model):
+    """
+    A running total of the postings of a user, membership, group or cycle,
+    updated in the transaction of every posting so reading a balance is a
+    row or a few. For members paid_in is what they contributed and paid_out
+    what they collected; for groups and cycles it's what went into and out
+    of the pot.
+
+    An owner's total may be spread over several shards, which add up to it
+    (see esusu.ledger.ShardedSnapshots). Every update of a row counts up its
+    version.
+    """
+
+    class Scope(models.TextChoices):
+        USER = "user", _("user")
+        MEMBERSHIP = "membership", _("membership")
+        GROUP = "group", _("group")
+        CYCLE = "cycle", _("cycle")
+
+    scope = models.CharField(_("scope"), max_length=16, choices=Scope.choices)
+    owner_id = models.BigIntegerField(_("owner id"))
+    paid_in = models.PositiveBigIntegerField(_("paid in"), default=0)
+    paid_out = models.PositiveBigIntegerField(_("paid out"), default=0)
+    postings = models.PositiveBigIntegerField(_("postings"), default=0)
+    last_posting_id = models.BigIntegerField(_("last posting"), default=0)
+    shard = models.PositiveSmallIntegerField(_("shard"), default=0)
+    version = models.PositiveBigIntegerField(_("version"), default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["scope", "owner_id", "shard"], name="esusu_balance_scope_owner_shard_uniq"),
+        ]
+
+    @property
+    def net(self):
+        return self.paid_in - self.paid_out
+
+
+class Deadline(models.Model):
+    """
+    What a membership has falling due next in a cycle: its next
+    contribution, or its payout. Processed deadlines move on to the next
+    turn, and due_at is cleared after the last; see esusu.scheduler.
+    """
+
+    class Kind(models.TextChoices):
+        CONTRIBUTION = "contribution", _("contribution")
+        PAYOUT = "payout", _("payout")
+
+    kind = models.CharField(_("kind"), max_length=16, choices=Kind.choices)
+    cycle = models.ForeignKey(Cycle, on_delete=models.CASCADE, related_name="deadlines")
+    membership = models.ForeignKey(Membership, on_delete=models.CASCADE, related_name="deadlines")
+    turn = models.PositiveIntegerField(_("turn"), help_text=_("The contribution's turn, or the payout's position."))
+    turns = models.PositiveIntegerField(_("turns"), help_text=_("Turns in the cycle."))
+    due_at = models.DateTimeField(_("due at"), null=True, blank=True, help_text=_("Empty once done."))
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["kind", "cycle", "membership"], name="esusu_deadline_kind_cycle_membership_uniq"),
+        ]
+        indexes = [
+            # The scheduler's queue: the next deadlines are the first entries
+            models.Index(fields=["due_at", "id"], name="esusu_deadline_due_at_idx", condition=Q(due_at__isnull=False)),
+        ]
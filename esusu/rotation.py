@@ -0,0 +1,312 @@
+"""
+The rotation engine: who collects the pot, how much and when, for every
+slot of every cycle in a batch.
+
+Schedules are computed a column at a time rather than a payout at a time.
+Memberships are streamed in chunks of whole groups, in the order of the
+unique (group, slot, user) index. One pass over a chunk ranks each
+membership's slot within its group; from there every payout column is a
+single comprehension over the chunk: its position is the slot's rank, or
+its turn in a ballot drawn from the cycle's seed; its due date comes from
+the dates computed once for all the cycles with the same start, interval
+and number of slots; its amount is the pot in proportion to the share,
+with only shared slots' remainders settled on the side.
+
+Nothing goes through model instances: cycles and memberships are read as
+value tuples in two queries, and the payouts and their deadlines are
+written with helpers.database.insert_rows().
+"""
+import calendar
+import datetime
+import gc
+from array import array
+from contextlib import contextmanager
+from functools import lru_cache
+from itertools import groupby, repeat
+from operator import itemgetter
+from random import Random
+
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from esusu.models import WHOLE_SHARE, Cycle, Deadline, Interval, Membership, Payout
+from helpers.database import insert_rows
+
+
+DAYS = {Interval.DAILY: 1, Interval.WEEKLY: 7, Interval.FORTNIGHTLY: 14}
+MONTHS = {Interval.MONTHLY: 1, Interval.BIMONTHLY: 2}
+
+CYCLE_FIELDS = ("id", "group_id", "starts_on", "interval", "contribution", "ordering", "seed")
+PAYOUT_FIELDS = ("cycle_id", "membership_id", "position", "due_on", "amount")
+DEADLINE_FIELDS = ("kind", "cycle_id", "membership_id", "turn", "turns", "due_at")
+
+
+@lru_cache(maxsize=65536)
+def due_dates(starts_on, interval, count):
+    """
+    The date ordinals of a cycle's `count` payouts: the end of each of its
+    intervals. Monthly dates keep the start's day of the month, or the last
+    day of shorter months.
+    """
+    start = starts_on.toordinal()
+    if interval in DAYS:
+        step = DAYS[interval]
+        return tuple(range(start + step, start + step * count + 1, step))
+    step = MONTHS[interval]
+    dates = []
+    for turn in range(1, count + 1):
+        years, month = divmod(starts_on.month - 1 + turn * step, 12)
+        year = starts_on.year + years
+        day = min(starts_on.day, calendar.monthrange(year, month + 1)[1])
+        dates.append(datetime.date(year, month + 1, day).toordinal())
+    return tuple(dates)
+
+
+def deadline(due):
+    """
+    When a turn due on a date ordinal is up: the end of that day.
+    """
+    return timezone.make_aware(datetime.datetime.combine(datetime.date.fromordinal(due + 1), datetime.time()))
+
+
+def draw(seed, count):
+    """
+    A ballot between `count` slots: the turn, from 0, at which each of them
+    collects. Drawn from Random(seed).random(), the one sequence random
+    promises to keep the same across Python versions; shuffle() and sample()
+    aren't, and a cycle's order must not change.
+    """
+    draws = Random(seed).random
+    keys = [draws() for _ in range(count)]
+    turns = [0] * count
+    for turn, index in enumerate(sorted(range(count), key=keys.__getitem__)):
+        turns[index] = turn
+    return turns
+
+
+def split(pot, shares):
+    """
+    Share pot between a slot's holders in proportion to their shares, by
+    largest remainder so the amounts add up to it.
+    """
+    total = sum(shares)
+    amounts = [pot * share // total for share in shares]
+    leftover = pot - sum(amounts)
+    by_remainder = sorted(range(len(shares)), key=lambda i: -(pot * shares[i] % total))
+    for i in by_remainder[:leftover]:
+        amounts[i] += 1
+    return amounts
+
+
+class Schedule:
+    """
+    Payouts of many cycles as parallel columns, one entry per payout.
+    Cycles whose group has no members or a slot that isn't wholly held are
+    left out and listed in `incomplete`.
+    """
+
+    __slots__ = ("cycle_ids", "membership_ids", "positions", "due_dates", "amounts", "incomplete")
+
+    def __init__(self):
+        self.cycle_ids = array("q")
+        self.membership_ids = array("q")
+        self.positions = array("l")
+        self.due_dates = array("l")
+        self.amounts = array("q")
+        self.incomplete = []
+
+    def __len__(self):
+        return len(self.cycle_ids)
+
+    def rows(self):
+        """
+        (cycle_id, membership_id, position, due_on, amount) tuples.
+        """
+        dates = {}
+        for cycle_id, membership_id, position, due, amount in zip(
+            self.cycle_ids, self.membership_ids, self.positions, self.due_dates, self.amounts,
+        ):
+            due_on = dates.get(due)
+            if due_on is None:
+                due_on = dates[due] = datetime.date.fromordinal(due)
+            yield cycle_id, membership_id, position, due_on, amount
+
+
+def _chunks(memberships, size):
+    """
+    Lists of at least `size` membership rows, but whole groups.
+    """
+    chunk = []
+    for _, rows in groupby(memberships, itemgetter(0)):
+        chunk.extend(rows)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _schedule_chunk(schedule, rows, by_group):
+    # Sharers by membership id, so ties in splitting go the same way
+    rows.sort()
+    groups = [row[0] for row in rows]
+    slots = [row[1] for row in rows]
+    ids = [row[2] for row in rows]
+    shares = [row[3] for row in rows]
+
+    # One pass for each row's slot rank in its group, where groups and
+    # shared slots start and end, and which groups have slots not wholly held
+    count = len(rows)
+    ranks = [0] * count
+    spans = {}
+    shared = {}
+    partial = set()
+    group_start = slot_start = rank = 0
+    group, slot, held = groups[0], slots[0], shares[0]
+    for i in range(1, count + 1):
+        if i < count and slots[i] == slot and groups[i] == group:
+            held += shares[i]
+            ranks[i] = rank
+            continue
+        # The end of a slot
+        if held != WHOLE_SHARE:
+            partial.add(group)
+        if i - slot_start > 1:
+            shared.setdefault(group, []).append((slot_start, i))
+        if i == count:
+            spans[group] = (group_start, i, rank + 1)
+            break
+        if groups[i] != group:
+            spans[group] = (group_start, i, rank + 1)
+            group_start, rank, group = i, 0, groups[i]
+        else:
+            rank += 1
+        slot_start, slot, held = i, slots[i], shares[i]
+        ranks[i] = rank
+
+    # The payouts' rows, and for each payout which of the cycles it's in
+    index, owner = [], []
+    cycle_ids, turns, dates, pots, offsets = [], [], [], [], []
+    for group_id, (first, end, slot_count) in spans.items():
+        group_cycles = by_group.pop(group_id, None)
+        if group_cycles is None:
+            continue
+        if group_id in partial:
+            schedule.incomplete.extend(cycle[0] for cycle in group_cycles)
+            continue
+        for cycle_id, _, starts_on, interval, contribution, ordering, seed in group_cycles:
+            offsets.append(len(index))
+            owner.extend(repeat(len(cycle_ids), end - first))
+            index.extend(range(first, end))
+            cycle_ids.append(cycle_id)
+            turns.append(draw(seed, slot_count) if ordering == Cycle.Ordering.BALLOT else range(slot_count))
+            dates.append(due_dates(starts_on, interval, slot_count))
+            pots.append(contribution * slot_count)
+
+    turn = [turns[cycle][ranks[row]] for cycle, row in zip(owner, index)]
+    amounts = [pots[cycle] * shares[row] // WHOLE_SHARE for cycle, row in zip(owner, index)]
+    for cycle, offset in enumerate(offsets):
+        first = index[offset]
+        for slot_start, slot_end in shared.get(groups[first], ()):
+            amounts[offset + slot_start - first:offset + slot_end - first] = split(
+                pots[cycle], shares[slot_start:slot_end],
+            )
+
+    schedule.cycle_ids.extend([cycle_ids[cycle] for cycle in owner])
+    schedule.membership_ids.extend([ids[row] for row in index])
+    schedule.positions.extend([t + 1 for t in turn])
+    schedule.due_dates.extend([dates[cycle][t] for cycle, t in zip(owner, turn)])
+    schedule.amounts.extend(amounts)
+
+
+def deadline_rows(schedule):
+    """
+    DEADLINE_FIELDS rows for a Schedule: every membership's first
+    contribution, due with the cycle's first payout, and every payout.
+    """
+    prepare = Deadline._meta.get_field("due_at").get_db_prep_save
+    due_at = {}
+    first, turns = {}, {}
+    for cycle_id, position, due in zip(schedule.cycle_ids, schedule.positions, schedule.due_dates):
+        if due not in due_at:
+            due_at[due] = prepare(deadline(due), connection)
+        if position == 1:
+            first[cycle_id] = due
+        if position > turns.get(cycle_id, 0):
+            turns[cycle_id] = position
+    columns = (schedule.cycle_ids, schedule.membership_ids)
+    contribution, payout = Deadline.Kind.CONTRIBUTION.value, Deadline.Kind.PAYOUT.value
+    for cycle_id, membership_id in zip(*columns):
+        yield contribution, cycle_id, membership_id, 1, turns[cycle_id], due_at[first[cycle_id]]
+    for cycle_id, membership_id, position, due in zip(*columns, schedule.positions, schedule.due_dates):
+        yield payout, cycle_id, membership_id, position, turns[cycle_id], due_at[due]
+
+
+@contextmanager
+def _collector_paused():
+    # A schedule is millions of tuples, ints and lists, none of them in a
+    # cycle, and the collector would keep scanning them all for nothing
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def compute_schedule(cycles, memberships, chunk_size=100000):
+    """
+    Schedule the payouts of `cycles`, tuples of CYCLE_FIELDS, between
+    `memberships`, (group_id, slot, membership_id, share) tuples of the
+    groups' active members ordered by group. Memberships are worked on
+    chunk_size rows at a time, whole groups each.
+    """
+    by_group = {}
+    for cycle in cycles:
+        by_group.setdefault(cycle[1], []).append(cycle)
+
+    schedule = Schedule()
+    with _collector_paused():
+        for chunk in _chunks(memberships, chunk_size):
+            _schedule_chunk(schedule, chunk, by_group)
+    for group_cycles in by_group.values():
+        schedule.incomplete.extend(cycle[0] for cycle in group_cycles)
+    return schedule
+
+
+def schedule_payouts(cycles, batch_size=5000):
+    """
+    Compute and save the payouts of a Cycle queryset, and their deadlines.
+    Payouts that already exist are kept, so running it again is harmless.
+    Return the Schedule.
+    """
+    memberships = Membership.objects.filter(
+        group__in=cycles.values("group_id"), is_active=True,
+    ).order_by("group_id", "slot").values_list("group_id", "slot", "id", "share")
+    schedule = compute_schedule(cycles.order_by().values_list(*CYCLE_FIELDS).iterator(), memberships.iterator())
+    insert_rows(Payout, PAYOUT_FIELDS, schedule.rows(), batch_size=batch_size, ignore_conflicts=True)
+    insert_rows(Deadline, DEADLINE_FIELDS, deadline_rows(schedule), batch_size=batch_size, ignore_conflicts=True)
+    return schedule
+
+
+def start_cycle(group, starts_on, ordering=Cycle.Ordering.SLOT):
+    """
+    Open the group's next cycle on its current terms, with its payouts.
+    Raise ValueError if a slot is missing holders or shares.
+    """
+    with transaction.atomic():
+        last = group.cycles.aggregate(number=Max("number"))["number"] or 0
+        cycle = Cycle.objects.create(
+            group=group,
+            number=last + 1,
+            starts_on=starts_on,
+            contribution=group.contribution,
+            interval=group.interval,
+            ordering=ordering,
+        )
+        schedule = schedule_payouts(Cycle.objects.filter(pk=cycle.pk))
+        if schedule.incomplete:
+            raise ValueError("Every slot of the group must be wholly held to start a cycle")
+    return cycle
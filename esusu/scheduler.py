@@ -0,0 +1,222 @@
+"""
+The scheduler: contributions and payouts as they fall due, without
+scanning every membership on every tick.
+
+Each membership of a cycle has a Deadline for its next contribution and
+one for its payout, written with the cycle's payouts (see
+esusu.rotation.schedule_payouts). due_at is indexed, so what is due is the
+front of an index scan, whatever the number of memberships. Once processed
+a deadline moves on in place to its next turn, the date taken from the
+cycle's due dates, or is cleared after the last one.
+
+Workers claim due deadlines a batch at a time with SELECT ... FOR UPDATE
+SKIP LOCKED and process them in the same transaction, so several processes
+share the work without waiting on each other or taking the same deadline
+twice. On SQLite, which has no row locks, the database lock serializes
+them. Between batches a Worker sleeps until the first deadline in its
+DeadlineQueue, a heap of the next entries of the index that it keeps up to
+date with the deadlines it moves, and reads again now and then for those
+the others move and add.
+"""
+import datetime
+import heapq
+import logging
+
+from django.db import close_old_connections, transaction
+from django.dispatch import Signal
+from django.utils import timezone
+
+from esusu import ledger, rotation
+from esusu.models import Cycle, Deadline, Payout
+
+
+logger = logging.getLogger(__name__)
+
+# Sent once per batch with the contributions that fell due, a list of
+# (membership_id, cycle_id, turn, due_at) tuples, for reminders and
+# collectors' lists
+contribution_due = Signal()
+
+# How long a payout the pot can't cover yet waits to be tried again
+PAYOUT_RETRY = datetime.timedelta(hours=1)
+
+
+def claim(now, batch_size):
+    """
+    Lock and return the next batch of deadlines due by now, skipping those
+    other workers hold. Call it in a transaction.
+    """
+    return list(
+        Deadline.objects.select_for_update(skip_locked=True)
+        .filter(due_at__lte=now).order_by("due_at", "id")[:batch_size]
+    )
+
+
+def _advance(deadlines):
+    # Contributions move on to their next turn, or are done after the last
+    cycles = {
+        cycle_id: (starts_on, interval)
+        for cycle_id, starts_on, interval in Cycle.objects.filter(
+            pk__in={deadline.cycle_id for deadline in deadlines},
+        ).values_list("id", "starts_on", "interval")
+    }
+    for deadline in deadlines:
+        if deadline.turn >= deadline.turns:
+            deadline.due_at = None
+            continue
+        starts_on, interval = cycles[deadline.cycle_id]
+        deadline.due_at = rotation.deadline(rotation.due_dates(starts_on, interval, deadline.turns)[deadline.turn])
+        deadline.turn += 1
+
+
+def _pay(deadlines, now):
+    # Pay what the pots hold enough for, the others are tried again later
+    payouts = {
+        (payout.cycle_id, payout.membership_id): payout
+        for payout in Payout.objects.filter(cycle__in={deadline.cycle_id for deadline in deadlines})
+        .only("id", "cycle_id", "membership_id", "paid_at")
+    }
+    for deadline in deadlines:
+        payout = payouts.get((deadline.cycle_id, deadline.membership_id))
+        if payout is not None and payout.paid_at is None:
+            try:
+                ledger.pay_out(payout)
+            except ValueError as e:
+                logger.info("Payout %s not made: %s", payout.pk, e)
+                deadline.due_at = now + PAYOUT_RETRY
+                continue
+        deadline.due_at = None
+
+
+def process(deadlines, now):
+    """
+    Process claimed deadlines and move them on. Return them.
+    """
+    contributions = [deadline for deadline in deadlines if deadline.kind == Deadline.Kind.CONTRIBUTION]
+    payouts = [deadline for deadline in deadlines if deadline.kind == Deadline.Kind.PAYOUT]
+    if contributions:
+        contribution_due.send(sender=Deadline, dues=[
+            (deadline.membership_id, deadline.cycle_id, deadline.turn, deadline.due_at) for deadline in contributions
+        ])
+        _advance(contributions)
+    if payouts:
+        _pay(payouts, now)
+    Deadline.objects.bulk_update(deadlines, ["turn", "due_at"])
+    return deadlines
+
+
+def run_due(now=None, batch_size=500):
+    """
+    Process every deadline due by now that no other worker holds, a batch
+    per transaction. Return the deadlines processed.
+    """
+    now = now or timezone.now()
+    done = []
+    while True:
+        with transaction.atomic():
+            batch = claim(now, batch_size)
+            if not batch:
+                return done
+            done.extend(process(batch, now))
+
+
+class DeadlineQueue:
+    """
+    A min-heap of (due_at, id) for the first `size` deadlines of the index,
+    read again every `refresh` seconds. Deadlines past the ones it holds
+    aren't lost, they're read once it runs low.
+    """
+
+    def __init__(self, size=1000, refresh=60.0):
+        self.size = size
+        self.refresh = datetime.timedelta(seconds=refresh)
+        self.heap = []
+        self.read_at = None
+
+    def read(self, now):
+        self.heap = list(
+            Deadline.objects.filter(due_at__isnull=False).order_by("due_at", "id").values_list("due_at", "id")[:self.size]
+        )
+        heapq.heapify(self.heap)
+        self.read_at = now
+
+    def next_due(self, now):
+        """
+        The first due_at, None if nothing is scheduled.
+        """
+        if self.read_at is None or now - self.read_at >= self.refresh or not self.heap:
+            self.read(now)
+        return self.heap[0][0] if self.heap else None
+
+    def update(self, deadlines, now):
+        """
+        Take deadlines this worker processed: due ones leave the heap, and
+        the ones moved on come back with their new due_at.
+        """
+        while self.heap and self.heap[0][0] <= now:
+            heapq.heappop(self.heap)
+        for deadline in deadlines:
+            if deadline.due_at is not None:
+                heapq.heappush(self.heap, (deadline.due_at, deadline.pk))
+
+
+class Worker:
+    """
+    Runs due deadlines as they come, sleeping in between. Several can run
+    at once, in as many processes.
+    """
+
+    def __init__(self, batch_size=500, queue=None, idle=60.0, backoff=1.0):
+        self.batch_size = batch_size
+        self.queue = queue or DeadlineQueue()
+        self.idle = idle
+        self.backoff = backoff
+
+    def run_once(self, now=None):
+        now = now or timezone.now()
+        done = run_due(now, self.batch_size)
+        self.queue.update(done, now)
+        return done
+
+    def seconds_to_wait(self, now):
+        due_at = self.queue.next_due(now)
+        if due_at is None:
+            return self.idle
+        return min(self.idle, max(0.0, (due_at - now).total_seconds()))
+
+    def step(self, now):
+        """
+        Run what is due by now, if anything; return the seconds to wait
+        before the next step.
+        """
+        wait = self.seconds_to_wait(now)
+        if wait:
+            return wait
+        done = self.run_once(now)
+        logger.info("Processed %d deadlines", len(done))
+        if not done:
+            # What's due is held by other workers: look again once they've
+            # had time to move it on
+            self.queue.read(now)
+            return 1.0
+        return 0
+
+    def run(self, stop):
+        """
+        Work until the threading.Event stop is set. A step that fails, say
+        on a lost connection, is logged, the connection closed if it's
+        broken, and tried again after a backoff that doubles with each
+        failure in a row, up to `idle`.
+        """
+        failures = 0
+        while not stop.is_set():
+            try:
+                wait = self.step(timezone.now())
+                failures = 0
+            except Exception:
+                failures += 1
+                wait = min(self.idle, self.backoff * 2 ** (failures - 1))
+                logger.exception("Scheduler step failed, trying again in %.1f seconds", wait)
+                close_old_connections()
+            if wait:
+                stop.wait(wait)
@@ -0,0 +1,91 @@
+import datetime
+import json
+import tempfile
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from account.tests import factories
+from account.tests.integration_tests.test_urls import AccountAPITestCase
+from esusu import rotation
+from esusu.models import Group, Interval, Membership, Posting
+
+
+class ContributionFixtures:
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.collector = factories.create_user()
+        cls.group = Group.objects.create(
+            name="Market", contribution=100000, interval=Interval.WEEKLY, created_by=cls.collector,
+        )
+        cls.memberships = [
+            Membership.objects.create(group=cls.group, user=factories.create_user(), slot=slot) for slot in (1, 2)
+        ]
+        cls.cycle = rotation.start_cycle(cls.group, datetime.date(2026, 1, 1))
+
+    def item(self, key, holder=0, amount=100000):
+        return {"key": key, "membership": self.memberships[holder].pk, "cycle": self.cycle.pk, "amount": amount}
+
+
+class ContributionImportTests(ContributionFixtures, AccountAPITestCase):
+
+    def post(self, data, user=None):
+        access_token, _ = factories.tokens_for(user or self.collector)
+        return self.client.post(
+            reverse("contribution_import"), data, format="json", HTTP_AUTHORIZATION=f"Bearer {access_token}",
+        )
+
+    def test_results_per_item(self):
+        response = self.post({"contributions": [self.item("a"), self.item("b", 1), self.item("a"), self.item("c", amount=0)]})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data["created"], response.data["duplicates"], response.data["rejected"]), (2, 1, 1))
+        self.assertEqual([result["key"] for result in response.data["results"]], ["a", "b", "a", "c"])
+        self.assertEqual(response.data["results"][2]["posting"], response.data["results"][0]["posting"])
+        self.assertIn("amount", response.data["results"][3]["errors"])
+
+    def test_retrying_a_request_posts_nothing_new(self):
+        items = {"contributions": [self.item("a"), self.item("b", 1)]}
+        self.post(items)
+        response = self.post(items)
+        self.assertEqual(response.data["duplicates"], 2)
+        self.assertEqual(Posting.objects.count(), 2)
+
+    def test_only_staff_post_to_groups_they_did_not_create(self):
+        member = self.memberships[0].user
+        response = self.post({"contributions": [self.item("a")]}, user=member)
+        self.assertEqual(response.data["rejected"], 1)
+        member.is_staff = True
+        member.save()
+        response = self.post({"contributions": [self.item("a")]}, user=member)
+        self.assertEqual(response.data["created"], 1)
+
+    @override_settings(ESUSU_CONTRIBUTIONS={"MAX_ITEMS": 2, "CHUNK_SIZE": 1})
+    def test_refuses_malformed_or_oversized_batches(self):
+        for data in ({"contributions": {"key": "a"}}, [self.item("a")], {"contributions": [self.item(key) for key in "abc"]}):
+            with self.subTest(data=data):
+                response = self.post(data)
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+                self.assertIn("contributions", response.data)
+        self.assertFalse(Posting.objects.exists())
+
+    def test_requires_authentication(self):
+        response = self.client.post(reverse("contribution_import"), {"contributions": []}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class ImportContributionsCommandTests(ContributionFixtures, TestCase):
+
+    def test_imports_a_file(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".ndjson") as upload:
+            for item in (self.item("a"), self.item("b", 1), self.item("a"), self.item("c", amount=-1)):
+                upload.write(json.dumps(item) + "\n")
+            upload.write("not json\n")
+            upload.flush()
+            stdout = StringIO()
+            call_command("import_contributions", upload.name, "--chunk-size", "2", stdout=stdout)
+        report = json.loads(stdout.getvalue())
+        self.assertEqual((report["items"], report["created"], report["duplicates"], report["rejected"]), (5, 2, 1, 2))
+        self.assertEqual([error["row"] for error in report["errors"]], [4, 5])
+        self.assertEqual(Posting.objects.count(), 2)
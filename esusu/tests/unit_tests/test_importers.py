@@ -0,0 +1,100 @@
+import datetime
+from django.test import TestCase
+from account.tests import factories
+from esusu import ledger, rotation
+from esusu.importers import CREATED, DUPLICATE, REJECTED, import_contributions
+from esusu.models import WHOLE_SHARE, Balance, Entry, Group, Interval, Membership, Posting
+
+
+class ImportContributionsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.collector = factories.create_user()
+        cls.group = Group.objects.create(
+            name="Market", contribution=100000, interval=Interval.WEEKLY, created_by=cls.collector,
+        )
+        cls.users = [factories.create_user() for _ in range(3)]
+        cls.memberships = [
+            Membership.objects.create(group=cls.group, user=cls.users[0], slot=1),
+            Membership.objects.create(group=cls.group, user=cls.users[1], slot=2, share=WHOLE_SHARE // 3),
+            Membership.objects.create(group=cls.group, user=cls.users[2], slot=2, share=WHOLE_SHARE - WHOLE_SHARE // 3),
+        ]
+        cls.cycle = rotation.start_cycle(cls.group, datetime.date(2026, 1, 1))
+
+    def item(self, key, holder=0, **fields):
+        membership = self.memberships[holder]
+        amount = self.cycle.contribution * membership.share // WHOLE_SHARE
+        return {"key": key, "membership": membership.pk, "cycle": self.cycle.pk, "amount": amount, **fields}
+
+    def run_import(self, items, **kwargs):
+        return list(import_contributions(items, **kwargs))
+
+    def test_posts_contributions_and_moves_snapshots(self):
+        results = self.run_import([self.item("a", 0), self.item("b", 1), self.item("c", 2)])
+        self.assertEqual([result["status"] for result in results], [CREATED] * 3)
+        postings = dict(Posting.objects.values_list("key", "id"))
+        self.assertEqual([result["posting"] for result in results], [postings["a"], postings["b"], postings["c"]])
+        self.assertEqual(Entry.objects.count(), 6)
+        self.assertEqual(ledger.balance(Balance.Scope.CYCLE, self.cycle.pk).net, 200000)
+        self.assertEqual(ledger.balance(Balance.Scope.USER, self.users[1].pk).paid_in, 33330)
+        _, errors, drifts = ledger.recompute()
+        self.assertEqual((errors, drifts), ([], []))
+
+    def test_keys_are_posted_once(self):
+        first = self.run_import([self.item("a"), self.item("a"), self.item("a", amount=1)])
+        self.assertEqual([result["status"] for result in first], [CREATED, DUPLICATE, REJECTED])
+        self.assertEqual(first[1]["posting"], first[0]["posting"])
+        self.assertIn("key", first[2]["errors"])
+        again = self.run_import([self.item("a"), self.item("a", 1)])
+        self.assertEqual([result["status"] for result in again], [DUPLICATE, REJECTED])
+        self.assertEqual(again[0]["posting"], first[0]["posting"])
+        self.assertEqual(Posting.objects.count(), 1)
+        self.assertEqual(ledger.balance(Balance.Scope.GROUP, self.group.pk).paid_in, 100000)
+
+    def test_rejects_invalid_items(self):
+        other = Group.objects.create(name="Other", contribution=100000, interval=Interval.WEEKLY)
+        stranger = Membership.objects.create(group=other, user=self.users[0], slot=1)
+        Membership.objects.filter(pk=self.memberships[2].pk).update(is_active=False)
+        cases = [
+            ({"membership": 1, "cycle": 1, "amount": 1}, "key"),
+            (self.item("x" * 65), "key"),
+            (self.item("a", membership="one"), "membership"),
+            (self.item("b", amount=0), "amount"),
+            (self.item("c", amount=100001), "amount"),
+            (self.item("d", cycle=self.cycle.pk + 100), "cycle"),
+            (self.item("e", membership=stranger.pk), "membership"),
+            (self.item("f", 2), "membership"),
+            ("g", "non_field_errors"),
+        ]
+        results = self.run_import([item for item, _ in cases])
+        for result, (_, field) in zip(results, cases):
+            with self.subTest(field=field, key=result["key"]):
+                self.assertEqual(result["status"], REJECTED)
+                self.assertIn(field, result["errors"])
+        self.assertFalse(Posting.objects.exists())
+
+    def test_collectors_post_to_their_groups_only(self):
+        results = self.run_import([self.item("a")], collector=self.users[0])
+        self.assertEqual(results[0]["status"], REJECTED)
+        self.assertIn("cycle", results[0]["errors"])
+        results = self.run_import([self.item("a")], collector=self.collector)
+        self.assertEqual(results[0]["status"], CREATED)
+
+    def test_accepts_rows_of_strings(self):
+        item = {name: str(value) for name, value in self.item("a").items()}
+        self.assertEqual(self.run_import([item])[0]["status"], CREATED)
+
+    def test_chunks_give_the_same_results(self):
+        items = [self.item(f"k{n}", n % 3) for n in range(7)] + [self.item("k1", 1)]
+        results = self.run_import(items, chunk_size=3)
+        self.assertEqual([result["status"] for result in results], [CREATED] * 7 + [DUPLICATE])
+        self.assertEqual(results[-1]["posting"], results[1]["posting"])
+        self.assertEqual(ledger.balance(Balance.Scope.MEMBERSHIP, self.memberships[0].pk).postings, 3)
+
+    def test_queries_per_chunk_do_not_grow_with_items(self):
+        self.run_import([self.item(f"warm{n}", n) for n in range(3)])
+        # Posted keys, the index, postings, entries, locking and moving the
+        # snapshots, and keys lost to concurrent imports
+        with self.assertNumQueries(9):
+            self.run_import([self.item(f"k{n}", n % 3) for n in range(60)])
@@ -0,0 +1,282 @@
+import datetime
+import threading
+from io import StringIO
+from itertools import cycle
+from unittest import mock, skipIf
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import F
+from django.test import TestCase, TransactionTestCase, override_settings
+from account.tests import factories
+from esusu import ledger, rotation
+from esusu.models import Balance, Entry, Group, Interval, Membership, Posting
+
+
+class LedgerTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.group = Group.objects.create(name="Market", contribution=100000, interval=Interval.WEEKLY)
+        cls.first, cls.second = factories.create_user(), factories.create_user()
+        cls.one = Membership.objects.create(group=cls.group, user=cls.first, slot=1)
+        cls.two = Membership.objects.create(group=cls.group, user=cls.second, slot=2)
+        cls.cycle = rotation.start_cycle(cls.group, datetime.date(2026, 1, 1))
+
+    def net(self, scope, owner_id):
+        return ledger.balance(scope, owner_id).net
+
+    def test_contributions_move_every_snapshot(self):
+        ledger.contribute(self.one, self.cycle, 100000)
+        ledger.contribute(self.two, self.cycle, 100000)
+        ledger.contribute(self.one, self.cycle, 50000)
+        self.assertEqual(self.net(Balance.Scope.CYCLE, self.cycle.pk), 250000)
+        self.assertEqual(self.net(Balance.Scope.GROUP, self.group.pk), 250000)
+        self.assertEqual(self.net(Balance.Scope.MEMBERSHIP, self.one.pk), 150000)
+        snapshot = ledger.balance(Balance.Scope.USER, self.first.pk)
+        self.assertEqual((snapshot.paid_in, snapshot.paid_out, snapshot.postings), (150000, 0, 2))
+        self.assertEqual(snapshot.last_posting_id, Posting.objects.latest("pk").pk)
+
+    def test_a_contribution_is_a_fixed_number_of_queries(self):
+        ledger.contribute(self.one, self.cycle, 100000)
+        # The posting, its entries, locking and moving the snapshots, in a savepoint
+        with self.assertNumQueries(6):
+            ledger.contribute(self.one, self.cycle, 100000)
+
+    def test_snapshots_move_a_query_each_where_updates_cannot_join_values(self):
+        ledger.contribute(self.one, self.cycle, 100000)
+        with mock.patch("esusu.ledger._updates_from_values", return_value=False):
+            ledger.contribute(self.two, self.cycle, 50000)
+            with self.assertNumQueries(9):
+                ledger.contribute(self.one, self.cycle, 100000)
+        self.assertEqual(self.net(Balance.Scope.CYCLE, self.cycle.pk), 250000)
+        self.assertEqual(ledger.balance(Balance.Scope.CYCLE, self.cycle.pk).last_posting_id, Posting.objects.latest("pk").pk)
+
+    def test_postings_are_two_entries_adding_up_to_zero(self):
+        posting = ledger.contribute(self.one, self.cycle, 100000)
+        self.assertEqual(
+            sorted(posting.entries.values_list("account", "amount")),
+            [(Entry.Account.MEMBER, -100000), (Entry.Account.POT, 100000)],
+        )
+
+    def test_a_key_is_posted_once(self):
+        first = ledger.contribute(self.one, self.cycle, 100000, key="deadline-1")
+        again = ledger.contribute(self.one, self.cycle, 100000, key="deadline-1")
+        self.assertEqual(again.pk, first.pk)
+        self.assertEqual(self.net(Balance.Scope.CYCLE, self.cycle.pk), 100000)
+
+    def test_a_key_is_refused_for_a_different_contribution(self):
+        ledger.contribute(self.one, self.cycle, 100000, key="deadline-1")
+        for membership, amount in ((self.two, 100000), (self.one, 50000)):
+            with self.assertRaises(ValueError):
+                ledger.contribute(membership, self.cycle, amount, key="deadline-1")
+        self.assertEqual(self.net(Balance.Scope.CYCLE, self.cycle.pk), 100000)
+
+    def test_refuses_members_of_other_groups(self):
+        other = Group.objects.create(name="Other", contribution=100000, interval=Interval.WEEKLY)
+        stranger = Membership.objects.create(group=other, user=self.first, slot=1)
+        with self.assertRaises(ValueError):
+            ledger.contribute(stranger, self.cycle, 100000)
+
+    def test_payouts_come_out_of_the_pot_once(self):
+        payout = self.cycle.payouts.get(position=1)
+        with self.assertRaises(ValueError):
+            ledger.pay_out(payout)
+        ledger.contribute(self.one, self.cycle, 100000)
+        ledger.contribute(self.two, self.cycle, 100000)
+        ledger.pay_out(payout)
+        with self.assertRaises(ValueError):
+            ledger.pay_out(payout)
+        payout.refresh_from_db()
+        self.assertIsNotNone(payout.paid_at)
+        self.assertEqual(self.net(Balance.Scope.CYCLE, self.cycle.pk), 0)
+        snapshot = ledger.balance(Balance.Scope.MEMBERSHIP, payout.membership_id)
+        self.assertEqual((snapshot.paid_in, snapshot.paid_out), (100000, 200000))
+
+    def test_rows_are_append_only(self):
+        posting = ledger.contribute(self.one, self.cycle, 100000)
+        with self.assertRaises(TypeError):
+            posting.save()
+        with self.assertRaises(TypeError):
+            posting.delete()
+        with self.assertRaises(TypeError):
+            Entry.objects.filter(posting=posting).update(amount=0)
+        with self.assertRaises(TypeError):
+            Posting.objects.all().delete()
+
+    def test_balance_of_an_owner_without_postings_is_empty(self):
+        snapshot = ledger.balance(Balance.Scope.USER, self.second.pk)
+        self.assertIsNone(snapshot.pk)
+        self.assertEqual(snapshot.net, 0)
+
+
+@skipIf(connection.vendor == "sqlite", "SQLite's in-memory test database locks tables under concurrent writes")
+class ConcurrentPayoutTests(TransactionTestCase):
+
+    def test_concurrent_payouts_cannot_overdraw_the_pot(self):
+        group = Group.objects.create(name="Market", contribution=100000, interval=Interval.WEEKLY)
+        memberships = [
+            Membership.objects.create(group=group, user=factories.create_user(), slot=slot) for slot in (1, 2)
+        ]
+        cycle = rotation.start_cycle(group, datetime.date(2026, 1, 1))
+        for membership in memberships:
+            ledger.contribute(membership, cycle, 100000)
+        # The pot holds one payout, and both are asked for at once
+        payouts = list(cycle.payouts.order_by("position"))
+        start = threading.Barrier(len(payouts))
+        outcomes = []
+
+        def pay(payout):
+            try:
+                start.wait()
+                ledger.pay_out(payout)
+                outcomes.append("paid")
+            except ValueError:
+                outcomes.append("refused")
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=pay, args=(payout,)) for payout in payouts]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(outcomes), ["paid", "refused"])
+        self.assertEqual(ledger.balance(Balance.Scope.CYCLE, cycle.pk).net, 0)
+
+
+def snapshots(path, **options):
+    return override_settings(ESUSU_LEDGER={"SNAPSHOTS": f"esusu.ledger.{path}", "OPTIONS": options})
+
+
+class SnapshotsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        group = Group.objects.create(name="Market", contribution=100000, interval=Interval.WEEKLY)
+        cls.one = Membership.objects.create(group=group, user=factories.create_user(), slot=1)
+        cls.two = Membership.objects.create(group=group, user=factories.create_user(), slot=2)
+        cls.cycle = rotation.start_cycle(group, datetime.date(2026, 1, 1))
+
+    def assertConsistent(self, net):
+        self.assertEqual(ledger.balance(Balance.Scope.CYCLE, self.cycle.pk).net, net)
+        _, errors, drifts = ledger.recompute()
+        self.assertEqual((errors, drifts), ([], []))
+
+    @snapshots("ShardedSnapshots", shards=4)
+    def test_sharded_pots_add_up_on_read(self):
+        with mock.patch("esusu.ledger.random.randrange", side_effect=cycle(range(4))):
+            for _ in range(3):
+                ledger.contribute(self.one, self.cycle, 100000)
+                ledger.contribute(self.two, self.cycle, 50000)
+        self.assertEqual(Balance.objects.filter(scope=Balance.Scope.CYCLE).count(), 4)
+        self.assertEqual(Balance.objects.filter(scope=Balance.Scope.MEMBERSHIP, owner_id=self.one.pk).count(), 1)
+        snapshot = ledger.balance(Balance.Scope.GROUP, self.cycle.group_id)
+        self.assertEqual((snapshot.paid_in, snapshot.postings), (450000, 6))
+        self.assertEqual(snapshot.last_posting_id, Posting.objects.latest("pk").pk)
+        self.assertConsistent(450000)
+
+    @snapshots("ShardedSnapshots", shards=4)
+    def test_fixing_a_sharded_pot_collapses_it(self):
+        with mock.patch("esusu.ledger.random.randrange", side_effect=[0, 1]):
+            ledger.contribute(self.one, self.cycle, 100000)
+            ledger.contribute(self.two, self.cycle, 100000)
+        Balance.objects.filter(scope=Balance.Scope.CYCLE, shard=1).update(paid_in=1)
+        _, _, drifts = ledger.recompute(fix=True)
+        self.assertEqual([drift.recorded[0] for drift in drifts], [100001])
+        self.assertEqual(list(Balance.objects.filter(scope=Balance.Scope.CYCLE).values_list("shard", "paid_in")), [
+            (0, 200000),
+        ])
+        self.assertConsistent(200000)
+
+    @snapshots("VersionedSnapshots")
+    def test_versioned_snapshots_count_their_updates(self):
+        ledger.contribute(self.one, self.cycle, 100000)
+        ledger.contribute(self.two, self.cycle, 100000)
+        # Reading and writing the snapshots, in a savepoint of their own
+        with self.assertNumQueries(8):
+            ledger.contribute(self.two, self.cycle, 100000)
+        self.assertEqual(ledger.balance(Balance.Scope.CYCLE, self.cycle.pk).version, 3)
+        self.assertEqual(ledger.balance(Balance.Scope.MEMBERSHIP, self.two.pk).version, 2)
+        self.assertConsistent(300000)
+
+    @snapshots("VersionedSnapshots", backoff=0)
+    def test_versioned_snapshots_retry_when_changed_under_them(self):
+        read = ledger._read
+
+        def concurrently(keys):
+            recorded = read(keys)
+            if len(reads.mock_calls) == 1:
+                Balance.objects.filter(scope=Balance.Scope.CYCLE).update(version=F("version") + 1)
+            return recorded
+
+        ledger.contribute(self.one, self.cycle, 100000)
+        for values in (True, False):
+            with self.subTest(updates_from_values=values), \
+                    mock.patch("esusu.ledger._updates_from_values", return_value=values), \
+                    mock.patch("esusu.ledger._read", side_effect=concurrently) as reads:
+                ledger.contribute(self.two, self.cycle, 100000)
+            self.assertEqual(len(reads.mock_calls), 2)
+        self.assertConsistent(300000)
+
+    @snapshots("VersionedSnapshots", retries=1, backoff=0)
+    def test_versioned_snapshots_give_up_after_their_retries(self):
+        ledger.contribute(self.one, self.cycle, 100000)
+        read = ledger._read
+
+        def concurrently(keys):
+            recorded = read(keys)
+            Balance.objects.filter(scope=Balance.Scope.CYCLE).update(version=F("version") + 1)
+            return recorded
+
+        with mock.patch("esusu.ledger._read", side_effect=concurrently) as reads:
+            with self.assertRaises(ledger.SnapshotConflict):
+                ledger.contribute(self.two, self.cycle, 100000)
+        self.assertEqual(len(reads.mock_calls), 2)
+        self.assertEqual(Posting.objects.count(), 1)
+        self.assertConsistent(100000)
+
+    def test_deployments_can_switch_between_them(self):
+        for path in ("ShardedSnapshots", "LockedSnapshots", "VersionedSnapshots", "ShardedSnapshots"):
+            with snapshots(path, shards=2) if path == "ShardedSnapshots" else snapshots(path):
+                ledger.contribute(self.one, self.cycle, 100000)
+        ledger.pay_out(self.cycle.payouts.get(position=1))
+        self.assertConsistent(200000)
+
+
+class VerifyLedgerTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        group = Group.objects.create(name="Market", contribution=100000, interval=Interval.WEEKLY)
+        cls.membership = Membership.objects.create(group=group, user=factories.create_user(), slot=1)
+        cls.cycle = rotation.start_cycle(group, datetime.date(2026, 1, 1))
+        for _ in range(3):
+            ledger.contribute(cls.membership, cls.cycle, 100000)
+
+    def verify(self, *args):
+        stdout, stderr = StringIO(), StringIO()
+        call_command("verify_ledger", *args, "--chunk-size", "2", stdout=stdout, stderr=stderr)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_a_consistent_ledger(self):
+        stdout, stderr = self.verify()
+        self.assertIn("Checked 3 postings: 0 unbalanced, 0 drifted snapshots", stdout)
+        self.assertEqual(stderr, "")
+
+    def test_reports_and_fixes_drifted_snapshots(self):
+        Balance.objects.filter(scope=Balance.Scope.CYCLE).update(paid_in=1)
+        Balance.objects.filter(scope=Balance.Scope.USER).delete()
+        with self.assertRaises(CommandError):
+            self.verify()
+        stdout, stderr = self.verify("--fix")
+        self.assertIn("2 drifted snapshots", stdout)
+        self.assertIn(f"cycle {self.cycle.pk}: recorded (1, 0, 3,", stderr)
+        self.assertEqual(ledger.balance(Balance.Scope.CYCLE, self.cycle.pk).paid_in, 300000)
+        self.assertEqual(ledger.balance(Balance.Scope.USER, self.membership.user_id).paid_in, 300000)
+        stdout, _ = self.verify()
+        self.assertIn("0 drifted snapshots", stdout)
+
+    def test_reports_unbalanced_postings(self):
+        Entry.objects.create(posting=Posting.objects.first(), account=Entry.Account.POT, amount=5)
+        with self.assertRaises(CommandError):
+            self.verify("--fix")
@@ -0,0 +1,129 @@
+import datetime
+from django.test import SimpleTestCase, TestCase
+from account.tests import factories
+from esusu import rotation
+from esusu.models import WHOLE_SHARE, Cycle, Group, Interval, Membership, Payout
+
+
+class DueDateTests(SimpleTestCase):
+
+    def test_daily_weekly_and_fortnightly_dates(self):
+        start = datetime.date(2026, 1, 1)
+        for interval, days in ((Interval.DAILY, 1), (Interval.WEEKLY, 7), (Interval.FORTNIGHTLY, 14)):
+            with self.subTest(interval):
+                dates = [datetime.date.fromordinal(due) for due in rotation.due_dates(start, interval, 3)]
+                self.assertEqual(dates, [start + datetime.timedelta(days=days * turn) for turn in (1, 2, 3)])
+
+    def test_monthly_dates_keep_the_day_or_end_the_month(self):
+        dates = [datetime.date.fromordinal(due) for due in rotation.due_dates(datetime.date(2026, 1, 31), Interval.MONTHLY, 4)]
+        self.assertEqual(dates, [
+            datetime.date(2026, 2, 28), datetime.date(2026, 3, 31), datetime.date(2026, 4, 30), datetime.date(2026, 5, 31),
+        ])
+
+    def test_bimonthly_dates_cross_years(self):
+        dates = [datetime.date.fromordinal(due) for due in rotation.due_dates(datetime.date(2026, 10, 15), Interval.BIMONTHLY, 2)]
+        self.assertEqual(dates, [datetime.date(2026, 12, 15), datetime.date(2027, 2, 15)])
+
+
+class ComputeScheduleTests(SimpleTestCase):
+
+    start = datetime.date(2026, 1, 1)
+
+    def cycle(self, cycle_id=1, group_id=1, ordering=Cycle.Ordering.SLOT, seed=7, contribution=100000):
+        return (cycle_id, group_id, self.start, Interval.WEEKLY, contribution, ordering, seed)
+
+    def test_every_slot_collects_the_whole_pot_once(self):
+        memberships = [(1, slot, 10 + slot, WHOLE_SHARE) for slot in (1, 2, 3)]
+        schedule = rotation.compute_schedule([self.cycle()], memberships)
+        rows = list(schedule.rows())
+        self.assertEqual([row[1] for row in rows], [11, 12, 13])
+        self.assertEqual([row[2] for row in rows], [1, 2, 3])
+        self.assertEqual({row[4] for row in rows}, {300000})
+        self.assertEqual(rows[0][3], self.start + datetime.timedelta(days=7))
+
+    def test_ballot_is_a_permutation_drawn_from_the_seed(self):
+        memberships = [(1, slot, slot, WHOLE_SHARE) for slot in range(1, 21)]
+        first = rotation.compute_schedule([self.cycle(ordering=Cycle.Ordering.BALLOT)], memberships)
+        again = rotation.compute_schedule([self.cycle(ordering=Cycle.Ordering.BALLOT)], memberships)
+        other = rotation.compute_schedule([self.cycle(ordering=Cycle.Ordering.BALLOT, seed=8)], memberships)
+        self.assertEqual(sorted(first.positions), list(range(1, 21)))
+        self.assertNotEqual(list(first.positions), list(range(1, 21)))
+        self.assertEqual(first.positions, again.positions)
+        self.assertNotEqual(first.positions, other.positions)
+
+    def test_ballot_dates_follow_the_turns(self):
+        memberships = [(1, slot, slot, WHOLE_SHARE) for slot in range(1, 6)]
+        schedule = rotation.compute_schedule([self.cycle(ordering=Cycle.Ordering.BALLOT)], memberships)
+        for position, due in zip(schedule.positions, schedule.due_dates):
+            self.assertEqual(due, (self.start + datetime.timedelta(days=7 * position)).toordinal())
+
+    def test_groups_are_worked_on_in_chunks(self):
+        memberships = [(group_id, slot, group_id * 10 + slot, WHOLE_SHARE) for group_id in (1, 2, 3) for slot in (1, 2)]
+        cycles = [self.cycle(cycle_id, cycle_id) for cycle_id in (1, 2, 3)]
+        whole = rotation.compute_schedule(cycles, memberships)
+        chunked = rotation.compute_schedule(cycles, memberships, chunk_size=1)
+        self.assertEqual(list(whole.rows()), list(chunked.rows()))
+        self.assertEqual(len(whole), 6)
+
+    def test_shared_slots_split_the_pot_by_share(self):
+        memberships = [
+            (1, 1, 11, WHOLE_SHARE),
+            (1, 2, 21, WHOLE_SHARE // 3),
+            (1, 2, 22, WHOLE_SHARE // 3),
+            (1, 2, 23, WHOLE_SHARE - 2 * (WHOLE_SHARE // 3)),
+        ]
+        schedule = rotation.compute_schedule([self.cycle(contribution=50000)], memberships)
+        rows = list(schedule.rows())
+        self.assertEqual([row[1] for row in rows], [11, 21, 22, 23])
+        self.assertEqual([row[2] for row in rows], [1, 2, 2, 2])
+        self.assertEqual(rows[0][4], 100000)
+        self.assertEqual(sum(row[4] for row in rows[1:]), 100000)
+        self.assertEqual([row[4] for row in rows[1:]], [33330, 33330, 33340])
+
+    def test_multiple_memberships_collect_once_each(self):
+        # The same user holding slots 1 and 2 has a membership for each
+        memberships = [(1, 1, 11, WHOLE_SHARE), (1, 2, 12, WHOLE_SHARE)]
+        schedule = rotation.compute_schedule([self.cycle()], memberships)
+        self.assertEqual(list(schedule.membership_ids), [11, 12])
+
+    def test_groups_with_partly_held_slots_are_left_out(self):
+        memberships = [(1, 1, 11, WHOLE_SHARE), (2, 1, 21, WHOLE_SHARE // 2)]
+        schedule = rotation.compute_schedule([self.cycle(1, 1), self.cycle(2, 2), self.cycle(3, 3)], memberships)
+        self.assertEqual(list(schedule.cycle_ids), [1])
+        self.assertEqual(schedule.incomplete, [2, 3])
+
+
+class StartCycleTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.group = Group.objects.create(name="Market", contribution=100000, interval=Interval.MONTHLY)
+        first, second = factories.create_user(), factories.create_user()
+        Membership.objects.create(group=cls.group, user=first, slot=1)
+        Membership.objects.create(group=cls.group, user=second, slot=2, share=WHOLE_SHARE // 2)
+        Membership.objects.create(group=cls.group, user=first, slot=2, share=WHOLE_SHARE // 2)
+
+    def test_saves_the_cycle_and_its_payouts(self):
+        with self.assertNumQueries(8):
+            cycle = rotation.start_cycle(self.group, datetime.date(2026, 1, 15))
+        self.assertEqual(cycle.number, 1)
+        self.assertEqual(cycle.contribution, self.group.contribution)
+        payouts = list(cycle.payouts.order_by("position", "membership_id").values_list("position", "due_on", "amount"))
+        self.assertEqual(payouts, [
+            (1, datetime.date(2026, 2, 15), 200000),
+            (2, datetime.date(2026, 3, 15), 100000),
+            (2, datetime.date(2026, 3, 15), 100000),
+        ])
+
+    def test_numbers_cycles_and_reschedules_harmlessly(self):
+        rotation.start_cycle(self.group, datetime.date(2026, 1, 15))
+        cycle = rotation.start_cycle(self.group, datetime.date(2026, 3, 15))
+        self.assertEqual(cycle.number, 2)
+        rotation.schedule_payouts(Cycle.objects.all())
+        self.assertEqual(Payout.objects.count(), 6)
+
+    def test_refuses_groups_with_partly_held_slots(self):
+        Membership.objects.filter(group=self.group, slot=2).first().delete()
+        with self.assertRaises(ValueError):
+            rotation.start_cycle(self.group, datetime.date(2026, 1, 15))
+        self.assertFalse(Cycle.objects.exists())
@@ -0,0 +1,170 @@
+import datetime
+import threading
+from unittest import mock
+from django.db import OperationalError
+from django.test import TestCase
+from django.utils import timezone
+from account.tests import factories
+from esusu import ledger, rotation, scheduler
+from esusu.models import Balance, Deadline, Group, Interval, Membership
+
+
+def at(date):
+    return timezone.make_aware(datetime.datetime.combine(date, datetime.time()))
+
+
+class SchedulerTests(TestCase):
+
+    start = datetime.date(2026, 1, 1)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.group = Group.objects.create(name="Market", contribution=100000, interval=Interval.WEEKLY)
+        cls.memberships = [
+            Membership.objects.create(group=cls.group, user=factories.create_user(), slot=slot) for slot in (1, 2)
+        ]
+        cls.cycle = rotation.start_cycle(cls.group, cls.start)
+
+    def setUp(self):
+        self.dues = []
+        scheduler.contribution_due.connect(self.receive)
+        self.addCleanup(scheduler.contribution_due.disconnect, self.receive)
+
+    def receive(self, sender, dues, **kwargs):
+        self.dues.extend(dues)
+
+    def deadlines(self, kind):
+        return list(self.cycle.deadlines.filter(kind=kind).order_by("membership_id").values_list("turn", "due_at"))
+
+    def contribute_all(self):
+        for membership in self.memberships:
+            ledger.contribute(membership, self.cycle, 100000)
+
+    def test_cycles_start_with_their_deadlines(self):
+        first, second = at(datetime.date(2026, 1, 9)), at(datetime.date(2026, 1, 16))
+        self.assertEqual(self.deadlines(Deadline.Kind.CONTRIBUTION), [(1, first), (1, first)])
+        self.assertEqual(self.deadlines(Deadline.Kind.PAYOUT), [(1, first), (2, second)])
+        self.assertEqual(set(self.cycle.deadlines.values_list("turns", flat=True)), {2})
+
+    def test_nothing_is_done_before_it_is_due(self):
+        self.assertEqual(scheduler.run_due(at(datetime.date(2026, 1, 8))), [])
+        self.assertEqual(self.dues, [])
+
+    def test_contributions_fall_due_and_move_on_to_the_next_turn(self):
+        now = at(datetime.date(2026, 1, 9))
+        self.contribute_all()
+        done = scheduler.run_due(now)
+        self.assertEqual(len(done), 3)
+        self.assertEqual(sorted(due[:3] for due in self.dues), [
+            (membership.pk, self.cycle.pk, 1) for membership in self.memberships
+        ])
+        second = at(datetime.date(2026, 1, 16))
+        self.assertEqual(self.deadlines(Deadline.Kind.CONTRIBUTION), [(2, second), (2, second)])
+        self.assertEqual(self.deadlines(Deadline.Kind.PAYOUT), [(1, None), (2, second)])
+        self.assertIsNotNone(self.cycle.payouts.get(position=1).paid_at)
+
+    def test_the_last_turn_clears_the_deadlines(self):
+        self.contribute_all()
+        scheduler.run_due(at(datetime.date(2026, 1, 9)))
+        self.contribute_all()
+        scheduler.run_due(at(datetime.date(2026, 1, 16)))
+        self.assertFalse(Deadline.objects.filter(due_at__isnull=False).exists())
+        self.assertEqual(len(self.dues), 4)
+        self.assertEqual(ledger.balance(Balance.Scope.CYCLE, self.cycle.pk).net, 0)
+        # Rescheduling doesn't bring them back
+        rotation.schedule_payouts(self.group.cycles.all())
+        self.assertEqual(scheduler.run_due(at(datetime.date(2026, 2, 1))), [])
+
+    def test_payouts_the_pot_cannot_cover_are_retried(self):
+        now = at(datetime.date(2026, 1, 9))
+        scheduler.run_due(now)
+        self.assertEqual(self.deadlines(Deadline.Kind.PAYOUT)[0], (1, now + scheduler.PAYOUT_RETRY))
+        self.contribute_all()
+        scheduler.run_due(now + scheduler.PAYOUT_RETRY)
+        self.assertIsNotNone(self.cycle.payouts.get(position=1).paid_at)
+
+    def test_late_runs_catch_up_in_batches(self):
+        done = scheduler.run_due(at(datetime.date(2026, 1, 16)), batch_size=1)
+        # Both turns of both contributions, and the payouts' first attempts
+        self.assertEqual(len(self.dues), 4)
+        self.assertEqual(len(done), 6)
+
+    def test_claims_take_a_batch_in_due_order(self):
+        with self.assertNumQueries(1):
+            batch = scheduler.claim(at(datetime.date(2026, 1, 16)), 3)
+        self.assertEqual([deadline.due_at for deadline in batch], [at(datetime.date(2026, 1, 9))] * 3)
+
+
+class WorkerTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        group = Group.objects.create(name="Market", contribution=100000, interval=Interval.DAILY)
+        Membership.objects.create(group=group, user=factories.create_user(), slot=1)
+        cls.cycle = rotation.start_cycle(group, datetime.date(2026, 1, 1))
+        cls.due_at = at(datetime.date(2026, 1, 3))
+
+    def test_waits_for_the_first_deadline(self):
+        worker = scheduler.Worker(idle=3600)
+        self.assertEqual(worker.seconds_to_wait(self.due_at - datetime.timedelta(minutes=5)), 300)
+        self.assertEqual(worker.seconds_to_wait(self.due_at), 0)
+
+    def test_keeps_the_queue_up_to_date_without_reading_it_again(self):
+        worker = scheduler.Worker(queue=scheduler.DeadlineQueue(refresh=3600))
+        self.assertEqual(worker.queue.next_due(self.due_at), self.due_at)
+        ledger.contribute(self.cycle.group.memberships.get(), self.cycle, 100000)
+        worker.run_once(self.due_at)
+        # The contribution is done after its only turn, the payout made
+        with self.assertNumQueries(1):
+            self.assertIsNone(worker.queue.next_due(self.due_at))
+
+    def test_runs_until_stopped(self):
+        stop, raised = threading.Event(), []
+
+        def run():
+            try:
+                scheduler.Worker(queue=Queue(None), idle=0.01).run(stop)
+            except Exception as e:
+                raised.append(e)
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        stop.set()
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(raised, [])
+
+    def test_survives_failed_steps(self):
+        stop = threading.Event()
+        steps = []
+
+        def run_due(now, batch_size):
+            steps.append(now)
+            if len(steps) == 1:
+                raise OperationalError("server closed the connection unexpectedly")
+            stop.set()
+            return []
+
+        worker = scheduler.Worker(queue=Queue(self.due_at), idle=0.01, backoff=0.001)
+        with mock.patch("esusu.scheduler.run_due", side_effect=run_due), \
+                mock.patch("esusu.scheduler.close_old_connections") as close_old_connections, \
+                self.assertLogs("esusu.scheduler", "ERROR"):
+            worker.run(stop)
+        self.assertEqual(len(steps), 2)
+        close_old_connections.assert_called_once_with()
+
+
+class Queue:
+    # A DeadlineQueue that doesn't read the database
+
+    def __init__(self, due_at):
+        self.due_at = due_at
+
+    def next_due(self, now):
+        return self.due_at
+
+    def read(self, now):
+        pass
+
+    def update(self, deadlines, now):
+        pass
@@ -0,0 +1,6 @@
+from django.urls import path
+from esusu import views
+
+urlpatterns = [
+    path("contributions", views.ContributionImportAPIView.as_view(), name="contribution_import"),
+]
@@ -0,0 +1,36 @@
+from collections import Counter
+from django.conf import settings
+from rest_framework import permissions, response, status
+from rest_framework.generics import GenericAPIView
+from esusu.importers import CREATED, DUPLICATE, REJECTED, import_contributions
+
+
+class ContributionImportAPIView(GenericAPIView):
+    """
+    Post contributions in bulk, {"contributions": [{"key", "membership",
+    "cycle", "amount"}, ...]}, with a result per item in the response. Staff
+    post to any group, other users to the groups they created.
+    """
+
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def post(self, request):
+        items = request.data.get("contributions") if isinstance(request.data, dict) else None
+        if not isinstance(items, list):
+            return response.Response({"contributions": ["Expected a list of items."]}, status=status.HTTP_400_BAD_REQUEST)
+        max_items = settings.ESUSU_CONTRIBUTIONS["MAX_ITEMS"]
+        if len(items) > max_items:
+            return response.Response(
+                {"contributions": [f"Ensure this field has no more than {max_items} elements."]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        collector = None if request.user.is_staff else request.user
+        results = list(import_contributions(items, collector, settings.ESUSU_CONTRIBUTIONS["CHUNK_SIZE"]))
+        counts = Counter(result["status"] for result in results)
+        return response.Response({
+            "created": counts[CREATED],
+            "duplicates": counts[DUPLICATE],
+            "rejected": counts[REJECTED],
+            "results": results,
+        })
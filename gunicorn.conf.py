@@ -0,0 +1,58 @@
+"""
+gunicorn settings for Credity, from the environment like Credity.settings.
+
+    gunicorn --config gunicorn.conf.py
+
+GUNICORN_WORKER_CLASS picks the workers: "gthread" (the default),
+GUNICORN_THREADS threads sharing each worker; "sync", a request at a time
+per worker; or "uvicorn", serving Credity.asgi instead of Credity.wsgi.
+
+The application is preloaded: Django, DRF and the apps are imported once by
+the master and shared copy-on-write by the workers, so forking one takes
+milliseconds instead of a full import. `manage.py startup_time` reports what
+that import spends its time on. Workers are recycled after
+GUNICORN_MAX_REQUESTS requests, jittered so they don't all restart at once,
+to bound the memory a long lived worker can grow to.
+"""
+import os
+
+# Not `from decouple import config`: every global here is read as a setting,
+# and gunicorn has one called config
+import decouple
+
+
+WORKER_CLASSES = {
+    "sync": ("sync", "Credity.wsgi:application"),
+    "gthread": ("gthread", "Credity.wsgi:application"),
+    "uvicorn": ("uvicorn.workers.UvicornWorker", "Credity.asgi:application"),
+}
+
+worker_class, wsgi_app = WORKER_CLASSES[decouple.config("GUNICORN_WORKER_CLASS", default="gthread")]
+workers = decouple.config("WEB_CONCURRENCY", default=2, cast=int)
+threads = decouple.config("GUNICORN_THREADS", default=4, cast=int)
+
+# Credity.settings splits the host's cores between this many workers for
+# password hashing
+os.environ["WEB_CONCURRENCY"] = str(workers)
+
+preload_app = decouple.config("GUNICORN_PRELOAD", default=True, cast=bool)
+max_requests = decouple.config("GUNICORN_MAX_REQUESTS", default=1000, cast=int)
+max_requests_jitter = decouple.config("GUNICORN_MAX_REQUESTS_JITTER", default=max_requests // 10, cast=int)
+
+timeout = decouple.config("GUNICORN_TIMEOUT", default=30, cast=int)
+graceful_timeout = timeout
+keepalive = 5
+
+# Workers touch a heartbeat file every second, which can stall on a busy disk
+if os.path.isdir("/dev/shm"):
+    worker_tmp_dir = "/dev/shm"
+
+
+def pre_fork(server, worker):
+    # Anything the preloaded master connected to the database for would be
+    # inherited by the worker, and two processes talking over one socket
+    # corrupt each other's conversations. Closed here, every worker opens
+    # its own.
+    if server.cfg.preload_app:
+        from django.db import connections
+        connections.close_all()
@@ -0,0 +1,80 @@
+"""
+Views whose handlers are coroutines, for the ASGI deployment.
+
+DRF 3.13 dispatches synchronously, so under ASGI a regular APIView runs on
+a thread for the whole request. AsyncAPIView goes through the same steps
+(negotiation, authentication, permissions, throttles, the handler,
+exception handling) on the event loop instead. Only what blocks is handed
+off: database work through helpers.database.database_sync_to_async(), and
+password hashing to the hashing service's processes.
+"""
+import asyncio
+
+from asgiref.sync import markcoroutinefunction, sync_to_async
+from rest_framework import exceptions
+from rest_framework.generics import GenericAPIView
+
+
+class AsyncAPIView(GenericAPIView):
+    """
+    GenericAPIView dispatched on the event loop. Handlers are coroutines;
+    authenticators may provide an async authenticate_async(), the others
+    are run on a thread. Permission and throttle checks stay synchronous,
+    they don't block.
+    """
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        # Django 4.0 has no async class-based views: marked, the handler
+        # awaits the view instead of calling it on a thread. Under WSGI it's
+        # run with async_to_sync().
+        return markcoroutinefunction(view)
+
+    async def perform_authentication_async(self, request):
+        try:
+            for authenticator in request.authenticators:
+                if hasattr(authenticator, "authenticate_async"):
+                    user_auth = await authenticator.authenticate_async(request)
+                else:
+                    user_auth = await sync_to_async(authenticator.authenticate)(request)
+                if user_auth is not None:
+                    request._authenticator = authenticator
+                    request.user, request.auth = user_auth
+                    return
+        except exceptions.APIException:
+            request._not_authenticated()
+            raise
+        request._not_authenticated()
+
+    async def initial_async(self, request, *args, **kwargs):
+        # APIView.initial(), with authentication awaited
+        self.format_kwarg = self.get_format_suffix(**kwargs)
+        request.accepted_renderer, request.accepted_media_type = self.perform_content_negotiation(request)
+        request.version, request.versioning_scheme = self.determine_version(request, *args, **kwargs)
+        await self.perform_authentication_async(request)
+        self.check_permissions(request)
+        self.check_throttles(request)
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await self.initial_async(request, *args, **kwargs)
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+            response = handler(request, *args, **kwargs)
+            # options() and http_method_not_allowed() aren't coroutines
+            if asyncio.iscoroutine(response):
+                response = await response
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
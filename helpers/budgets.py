@@ -0,0 +1,232 @@
+"""
+Query budgets: how many SQL queries, rows and (optionally) seconds a view
+may spend on one request.
+
+Views declare theirs as a `query_budget` attribute, either a QueryBudget or
+a dict of them by HTTP method. Tests enforce them with QueryBudget as a
+context manager or decorator, which fails with a report of every query,
+where it came from, and which ones repeat.
+"""
+import re
+import time
+import traceback
+from collections import Counter, defaultdict
+from contextlib import ContextDecorator
+from pathlib import Path
+
+from django.db import connections
+
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+# Query text with the length of IN lists and VALUES rows taken out
+_PLACEHOLDERS = re.compile(r"\((?:%s|\?)(?:,\s*(?:%s|\?))*\)")
+
+
+class CapturedQuery:
+
+    __slots__ = ("sql", "params", "many", "seconds", "fetched", "written", "origin")
+
+    def __init__(self, sql, params, many, origin):
+        self.sql = sql
+        self.params = params
+        self.many = many
+        self.seconds = 0.0
+        self.fetched = 0
+        self.written = 0
+        self.origin = origin
+
+    @property
+    def rows(self):
+        # An INSERT ... RETURNING both writes and fetches its rows
+        return max(self.fetched, self.written)
+
+    @property
+    def pattern(self):
+        return _PLACEHOLDERS.sub("(...)", self.sql)
+
+
+class _RowCountingCursor:
+    """
+    Counts the rows fetched through a cursor against the query that was
+    last run on it.
+    """
+
+    def __init__(self, cursor, capture):
+        self._cursor = cursor
+        self._capture = capture
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def _count(self, rows):
+        if self._capture.queries:
+            self._capture.queries[-1].fetched += rows
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        self._count(row is not None)
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        rows = self._cursor.fetchmany(*args, **kwargs)
+        self._count(len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        self._count(len(rows))
+        return rows
+
+    def __iter__(self):
+        for row in self._cursor:
+            self._count(1)
+            yield row
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return self._cursor.__exit__(*exc_info)
+
+
+def _origin():
+    # The innermost frame of project code outside this module
+    for frame in reversed(traceback.extract_stack()[:-3]):
+        path = Path(frame.filename)
+        if path == Path(__file__) or PROJECT_ROOT not in path.parents:
+            continue
+        return f"{path.relative_to(PROJECT_ROOT)}:{frame.lineno} in {frame.name}"
+    return "<unknown>"
+
+
+class capture_queries:
+    """
+    Record every query run on any database connection of this thread, with
+    its time, the rows fetched and the line of project code that ran it.
+    """
+
+    def __init__(self):
+        self.queries = []
+        self.seconds = 0.0
+        self._undo = []
+
+    def __enter__(self):
+        self.queries = []
+        self._started = time.perf_counter()
+        for connection in connections.all():
+            wrapper = connection.execute_wrapper(self._execute)
+            wrapper.__enter__()
+            self._undo.append(lambda wrapper=wrapper: wrapper.__exit__(None, None, None))
+            self._count_rows(connection)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.seconds = time.perf_counter() - self._started
+        while self._undo:
+            self._undo.pop()()
+
+    def _count_rows(self, connection):
+        previous = connection.__dict__.get("_prepare_cursor")
+        prepare = connection._prepare_cursor
+        connection._prepare_cursor = lambda cursor: _RowCountingCursor(prepare(cursor), self)
+
+        def undo():
+            if previous is None:
+                del connection._prepare_cursor
+            else:
+                connection._prepare_cursor = previous
+
+        self._undo.append(undo)
+
+    def _execute(self, execute, sql, params, many, context):
+        query = CapturedQuery(sql, params, many, _origin())
+        self.queries.append(query)
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            query.seconds = time.perf_counter() - start
+            rowcount = getattr(context["cursor"], "rowcount", -1)
+            if not sql.lstrip().upper().startswith("SELECT") and rowcount and rowcount > 0:
+                query.written = rowcount
+
+    @property
+    def rows(self):
+        return sum(query.rows for query in self.queries)
+
+    def repeated(self):
+        """
+        Queries run more than once: exact duplicates (same SQL and
+        parameters) and N+1 patterns (same SQL, different parameters).
+        """
+        duplicates = Counter((query.sql, repr(query.params)) for query in self.queries)
+        patterns = defaultdict(list)
+        for query in self.queries:
+            patterns[query.pattern].append(query)
+        return {
+            "duplicates": [(sql, count) for (sql, _), count in duplicates.items() if count > 1],
+            "patterns": [
+                (pattern, len(queries), sorted({query.origin for query in queries}))
+                for pattern, queries in patterns.items()
+                if len(queries) > 1
+            ],
+        }
+
+    def report(self):
+        lines = [f"{len(self.queries)} queries, {self.rows} rows, {self.seconds * 1000:.1f}ms"]
+        for number, query in enumerate(self.queries, start=1):
+            lines.append(f"{number}. [{query.rows} rows, {query.seconds * 1000:.1f}ms] {query.origin}")
+            lines.append(f"   {query.sql}")
+        repeated = self.repeated()
+        for sql, count in repeated["duplicates"]:
+            lines.append(f"Duplicate, run {count} times: {sql}")
+        for pattern, count, origins in repeated["patterns"]:
+            lines.append(f"Repeated {count} times (N+1?) from {', '.join(origins)}: {pattern}")
+        return "\n".join(lines)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryBudget(ContextDecorator):
+    """
+    At most `queries` queries fetching or writing at most `rows` rows, in at
+    most `seconds` of wall time. Unset limits aren't checked.
+    """
+
+    def __init__(self, queries, rows=None, seconds=None):
+        self.queries = queries
+        self.rows = rows
+        self.seconds = seconds
+
+    def __repr__(self):
+        return f"QueryBudget(queries={self.queries}, rows={self.rows}, seconds={self.seconds})"
+
+    def __enter__(self):
+        self._capture = capture_queries().__enter__()
+        return self._capture
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._capture.__exit__(exc_type, exc_value, traceback)
+        if exc_type is None:
+            self.check(self._capture)
+
+    def check(self, capture):
+        exceeded = []
+        if len(capture.queries) > self.queries:
+            exceeded.append(f"{len(capture.queries)} queries, budget {self.queries}")
+        if self.rows is not None and capture.rows > self.rows:
+            exceeded.append(f"{capture.rows} rows, budget {self.rows}")
+        if self.seconds is not None and capture.seconds > self.seconds:
+            exceeded.append(f"{capture.seconds:.3f}s, budget {self.seconds}s")
+        if exceeded:
+            raise QueryBudgetExceeded(f"Query budget exceeded: {'; '.join(exceeded)}\n{capture.report()}")
+
+
+def get_view_budget(view_class, method):
+    budget = getattr(view_class, "query_budget", None)
+    if isinstance(budget, dict):
+        budget = budget.get(method.upper())
+    return budget
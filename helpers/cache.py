@@ -0,0 +1,75 @@
+import pickle
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.locmem import LocMemCache
+
+from helpers import metrics
+
+
+# Bytes held per cache name, shared like LocMemCache's own stores
+_sizes = {}
+
+
+class BoundedLocMemCache(LocMemCache):
+    """
+    LocMemCache bounded by the bytes it holds as well as by its entries.
+    Past either bound the least recently used entries are evicted one at a
+    time, instead of LocMemCache dropping a CULL_FREQUENCY'th of the cache at
+    once, so a full cache keeps its hot entries. A value bigger than
+    MAX_BYTES on its own isn't kept.
+
+    OPTIONS are MAX_ENTRIES (300 by default, as for every backend) and
+    MAX_BYTES (unbounded by default), counting pickled values. Evictions are
+    counted in helpers.metrics by the cache's LOCATION.
+    """
+
+    def __init__(self, name, params):
+        super().__init__(name, params)
+        max_bytes = params.get("OPTIONS", {}).get("MAX_BYTES")
+        self._max_bytes = None if max_bytes is None else int(max_bytes)
+        self._size = _sizes.setdefault(name, [0])
+        self._labels = (("cache", name),)
+
+    def _set(self, key, value, timeout=DEFAULT_TIMEOUT):
+        self._delete(key)
+        self._cache[key] = value
+        self._cache.move_to_end(key, last=False)
+        self._expire_info[key] = self.get_backend_timeout(timeout)
+        self._size[0] += len(value)
+
+        # Most recently used entries are at the front
+        while self._cache and (
+            len(self._cache) > self._max_entries
+            or (self._max_bytes is not None and self._size[0] > self._max_bytes)
+        ):
+            evicted, value = self._cache.popitem()
+            del self._expire_info[evicted]
+            self._size[0] -= len(value)
+            metrics.registry.inc("credity_cache_evictions_total", self._labels)
+
+    def incr(self, key, delta=1, version=None):
+        # LocMemCache.incr() swaps the value behind _set()'s back, which would
+        # throw the byte count off
+        key = self.make_and_validate_key(key, version=version)
+        with self._lock:
+            if self._has_expired(key):
+                self._delete(key)
+                raise ValueError("Key '%s' not found" % key)
+            new_value = pickle.loads(self._cache[key]) + delta
+            expires = self._expire_info[key]
+            self._set(key, pickle.dumps(new_value, self.pickle_protocol))
+            if key in self._expire_info:
+                self._expire_info[key] = expires
+        return new_value
+
+    def _delete(self, key):
+        value = self._cache.get(key)
+        if value is not None:
+            self._size[0] -= len(value)
+        return super()._delete(key)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self._expire_info.clear()
+            self._size[0] = 0
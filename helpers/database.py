@@ -0,0 +1,141 @@
+import functools
+import io
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.db import NotSupportedError, connections, transaction
+from django.utils import timezone
+
+from helpers import metrics
+
+
+def database_sync_to_async(func):
+    """
+    sync_to_async() for ORM work. Runs on the request's thread, the one
+    Django keeps its connections on, and counts the queries for
+    MetricsMiddleware.
+    """
+
+    @functools.wraps(func)
+    def counted(*args, **kwargs):
+        with metrics.counting_queries():
+            return func(*args, **kwargs)
+
+    return sync_to_async(counted)
+
+
+def _insert_statement(connection, model, field_names, ignore_conflicts, conflict_target=()):
+    # INSERT up to VALUES, a row's placeholders, what goes after the rows,
+    # and the values of the auto_now and auto_now_add fields not listed
+    opts = model._meta
+    fields = [opts.get_field(name) for name in field_names]
+    stamped = [
+        field for field in opts.concrete_fields
+        if (getattr(field, "auto_now", False) or getattr(field, "auto_now_add", False)) and field not in fields
+    ]
+    now = timezone.now()
+    stamps = tuple(field.get_db_prep_save(now, connection) for field in stamped)
+    columns = fields + stamped
+
+    quote_name = connection.ops.quote_name
+    table = "%s (%s)" % (quote_name(opts.db_table), ", ".join(quote_name(field.column) for field in columns))
+    placeholders = "(%s)" % ", ".join(["%s"] * len(columns))
+    if ignore_conflicts and conflict_target:
+        if connection.vendor not in ("postgresql", "sqlite"):
+            raise NotSupportedError(f"{connection.vendor} can't ignore conflicts on a given index")
+        head = "INSERT INTO %s VALUES " % table
+        suffix = "ON CONFLICT (%s) DO NOTHING" % ", ".join(conflict_target)
+    else:
+        head = "%s %s VALUES " % (connection.ops.insert_statement(ignore_conflicts=ignore_conflicts), table)
+        suffix = connection.ops.ignore_conflicts_suffix_sql(ignore_conflicts=ignore_conflicts)
+    return table, head, placeholders, suffix, stamps
+
+
+def _copy_value(value):
+    # PostgreSQL's COPY text format
+    if value is None:
+        return "\\N"
+    if isinstance(value, int):
+        return str(value)
+    return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
+def insert_rows(model, field_names, rows, batch_size=1000, ignore_conflicts=False, using="default"):
+    """
+    Insert rows of plain values, tuples in the order of field_names (the
+    fields' attnames), without building model instances. Values go to the
+    driver as they are, so they must be ones it adapts itself: ints, strings,
+    dates. auto_now and auto_now_add fields not listed are set to now. The
+    rows are inserted in a single transaction. Return the number of rows
+    sent.
+
+    Rows go in multi-row INSERTs of batch_size, except on backends that cap
+    the parameters of a query (SQLite), which run a single-row INSERT through
+    executemany() instead, their fastest way in, and on PostgreSQL, where
+    rows that can't conflict are streamed with COPY.
+    """
+    connection = connections[using]
+    table, head, placeholders, suffix, stamps = _insert_statement(connection, model, field_names, ignore_conflicts)
+    copy = connection.vendor == "postgresql" and not ignore_conflicts
+
+    sent = 0
+    rows = iter(rows)
+    # One transaction, rather than one per statement under autocommit; in
+    # someone else's, no savepoint, as a failure fails it all anyway
+    with transaction.atomic(using=using, savepoint=False), connection.cursor() as cursor:
+        while True:
+            batch = [row + stamps for row in islice(rows, batch_size)]
+            if not batch:
+                return sent
+            if copy:
+                buffer = io.StringIO()
+                buffer.writelines("\t".join(map(_copy_value, row)) + "\n" for row in batch)
+                buffer.seek(0)
+                cursor.copy_expert(f"COPY {table} FROM STDIN", buffer)
+            elif connection.features.max_query_params:
+                cursor.executemany(f"{head}{placeholders} {suffix}", batch)
+            else:
+                cursor.execute(
+                    f"{head}{', '.join([placeholders] * len(batch))} {suffix}",
+                    [value for row in batch for value in row],
+                )
+            sent += len(batch)
+
+
+def insert_returning(model, field_names, rows, returning=("id",), batch_size=1000, ignore_conflicts=False,
+                     conflict_target=(), using="default"):
+    """
+    insert_rows() for when the values the database generates are needed:
+    return a list of the `returning` fields of each row inserted, in no
+    particular order. Rows skipped as conflicts aren't in it. Rows go in
+    multi-row INSERT ... RETURNING, so the backend must support it
+    (PostgreSQL, SQLite 3.35+).
+
+    With conflict_target, the columns or SQL expressions of a unique index,
+    only conflicts on that index are skipped, with ON CONFLICT (...) DO
+    NOTHING; any other failure raises. Without it SQLite's INSERT OR IGNORE
+    also skips rows that break NOT NULL or CHECK constraints.
+    """
+    connection = connections[using]
+    if not connection.features.can_return_rows_from_bulk_insert:
+        raise NotSupportedError(f"{connection.vendor} can't return rows from an INSERT")
+    _, head, placeholders, suffix, stamps = _insert_statement(
+        connection, model, field_names, ignore_conflicts, conflict_target,
+    )
+    opts = model._meta
+    returned = ", ".join(connection.ops.quote_name(opts.get_field(name).column) for name in returning)
+    if connection.features.max_query_params:
+        batch_size = min(batch_size, connection.features.max_query_params // (len(field_names) + len(stamps)))
+
+    results = []
+    rows = iter(rows)
+    with transaction.atomic(using=using, savepoint=False), connection.cursor() as cursor:
+        while True:
+            batch = [row + stamps for row in islice(rows, batch_size)]
+            if not batch:
+                return results
+            cursor.execute(
+                f"{head}{', '.join([placeholders] * len(batch))} {suffix} RETURNING {returned}",
+                [value for row in batch for value in row],
+            )
+            results.extend(cursor.fetchall())
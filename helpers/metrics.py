@@ -0,0 +1,353 @@
+import contextvars
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+
+# name -> (type, help, histogram buckets)
+METRICS = {
+    "credity_http_requests_total": ("counter", "Requests by route, method and status.", None),
+    "credity_http_request_duration_seconds": ("histogram", "Time to build the response.", LATENCY_BUCKETS),
+    "credity_http_response_size_bytes": ("histogram", "Response body size, streamed responses excluded.", SIZE_BUCKETS),
+    "credity_db_queries_per_request": ("histogram", "SQL queries run per request.", QUERY_BUCKETS),
+    "credity_db_query_duration_seconds_total": ("counter", "Time spent running SQL queries.", None),
+    "credity_request_phase_seconds_total": ("counter", "Time spent in named phases such as password hashing.", None),
+    "credity_request_phase_calls_total": ("counter", "Calls to named phases such as password hashing.", None),
+    "credity_response_cache_requests_total": ("counter", "Response cache lookups by cache and result.", None),
+    "credity_cache_evictions_total": ("counter", "Entries evicted from bounded caches to make room.", None),
+}
+
+
+class _RequestStats:
+
+    __slots__ = ("queries", "query_seconds", "phases")
+
+    def __init__(self):
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.phases = {}
+
+    def wrap_query(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.query_seconds += time.perf_counter() - start
+
+
+_current = contextvars.ContextVar("metrics_request", default=None)
+
+
+def record_phase(phase, seconds):
+    """
+    Add time spent in a phase (password hashing, validation, ...) to the
+    request being served. Does nothing outside a request.
+    """
+    stats = _current.get()
+    if stats is not None:
+        calls, total = stats.phases.get(phase, (0, 0.0))
+        stats.phases[phase] = (calls + 1, total + seconds)
+
+
+@contextmanager
+def counting_queries():
+    """
+    Count the queries run on this thread's connections against the request
+    being served. MetricsMiddleware does it for sync views; async views
+    run their queries on other threads, see helpers.async_views.
+    """
+    stats = _current.get()
+    if stats is None:
+        yield
+        return
+    with ExitStack() as stack:
+        for connection in connections.all():
+            # Async views run under WSGI get back to the middleware's thread
+            if stats.wrap_query not in connection.execute_wrappers:
+                stack.enter_context(connection.execute_wrapper(stats.wrap_query))
+        yield
+
+
+@contextmanager
+def timer(phase):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_phase(phase, time.perf_counter() - start)
+
+
+class Registry:
+    """
+    Counters and histograms for this process. Every thread writes to its own
+    shard, so recording takes no lock; shards are only summed when the
+    metrics are collected.
+
+    Samples are keyed by (name, labels, le). Histogram buckets are stored
+    per bucket and only made cumulative when rendered.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._shards = []
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    def _shard(self):
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = defaultdict(float)
+            with self._lock:
+                self._shards.append(shard)
+            return shard
+
+    def inc(self, name, labels, value=1):
+        self._shard()[(name, labels, None)] += value
+
+    def observe(self, name, labels, value):
+        buckets = METRICS[name][2]
+        index = bisect_left(buckets, value)
+        shard = self._shard()
+        shard[(name, labels, buckets[index] if index < len(buckets) else "+Inf")] += 1
+        shard[(name + "_sum", labels, None)] += value
+
+    def snapshot(self):
+        samples = defaultdict(float)
+        with self._lock:
+            shards = list(self._shards)
+        for shard in shards:
+            for key, value in shard.copy().items():
+                samples[key] += value
+        return samples
+
+    def flush(self, directory):
+        """
+        Write this process's samples to the directory, where the worker that
+        serves /metrics merges them with the other workers'.
+        """
+        self._last_flush = time.monotonic()
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{os.getpid()}.json")
+        # Named after the pid too, so collect() can tell whose it is if we die mid-write
+        prefix = f"{os.getpid()}."
+        with tempfile.NamedTemporaryFile("w", dir=directory, prefix=prefix, suffix=".tmp", delete=False) as f:
+            json.dump([[name, labels, le, value] for (name, labels, le), value in self.snapshot().items()], f)
+        os.replace(f.name, path)
+
+    def flush_due(self, interval):
+        return time.monotonic() - self._last_flush >= interval
+
+    def reset(self):
+        self._local = threading.local()
+        self._shards = []
+        self._lock = threading.Lock()
+
+
+registry = Registry()
+
+os.register_at_fork(after_in_child=registry.reset)
+
+
+def _default_base():
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(base, "credity-metrics")
+
+
+def get_directory():
+    """
+    Where workers dump their samples. By default a directory per parent
+    process, so gunicorn workers share one and a restart starts afresh.
+    """
+    directory = settings.METRICS["DIRECTORY"]
+    if directory is None:
+        directory = os.path.join(_default_base(), str(os.getppid()))
+    return directory
+
+
+def _is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Someone else's process
+        return True
+    return True
+
+
+def _owner(filename):
+    pid = filename.split(".", 1)[0]
+    return int(pid) if pid.isdigit() else None
+
+
+def prune(directory):
+    """
+    Remove the dumps of workers that have exited, and with the default
+    directory those of masters that have, so restarts and recycled workers
+    don't pile up files in /dev/shm. A dead worker's counts go with its
+    dump, which Prometheus takes as a counter reset.
+
+    Liveness is checked by pid, so the directory must not be shared between
+    hosts.
+    """
+    for filename in os.listdir(directory):
+        pid = _owner(filename)
+        if pid is not None and pid != os.getpid() and not _is_alive(pid):
+            try:
+                os.remove(os.path.join(directory, filename))
+            except FileNotFoundError:
+                # Another worker got there first
+                pass
+    if settings.METRICS["DIRECTORY"] is None:
+        base = _default_base()
+        for name in os.listdir(base):
+            pid = _owner(name)
+            if pid is not None and pid != os.getppid() and not _is_alive(pid):
+                shutil.rmtree(os.path.join(base, name), ignore_errors=True)
+
+
+def collect():
+    """
+    Samples of every live worker, this one's up to date.
+    """
+    directory = get_directory()
+    registry.flush(directory)
+    prune(directory)
+    samples = defaultdict(float)
+    for filename in os.listdir(directory):
+        if not filename.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(directory, filename)) as f:
+                rows = json.load(f)
+        except (OSError, ValueError):
+            # A worker went away mid-write
+            continue
+        for name, labels, le, value in rows:
+            samples[(name, tuple(map(tuple, labels)), le)] += value
+    return samples
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels, le=None):
+    pairs = list(labels) + ([("le", le)] if le is not None else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+
+def _format_value(value):
+    return str(int(value)) if value == int(value) else repr(value)
+
+
+def render(samples):
+    """
+    Samples in the Prometheus text exposition format.
+    """
+    by_name = defaultdict(list)
+    for (name, labels, le), value in samples.items():
+        by_name[name].append((labels, le, value))
+
+    lines = []
+    for name, (kind, help, buckets) in METRICS.items():
+        if name not in by_name:
+            continue
+        lines.append(f"# HELP {name} {help}")
+        lines.append(f"# TYPE {name} {kind}")
+        if kind == "counter":
+            for labels, _, value in sorted(by_name[name]):
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+            continue
+
+        counts = defaultdict(dict)
+        for labels, le, value in by_name[name]:
+            counts[labels][le] = value
+        sums = {labels: value for labels, _, value in by_name[name + "_sum"]}
+        for labels in sorted(counts):
+            total = 0
+            for le in buckets + ("+Inf",):
+                total += counts[labels].get(le, 0)
+                lines.append(f"{name}_bucket{_format_labels(labels, le)} {_format_value(total)}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(sums.get(labels, 0))}")
+            lines.append(f"{name}_count{_format_labels(labels)} {_format_value(total)}")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """
+    Records latency, SQL queries, phase timings and response size for every
+    request, labelled by URL route. Goes first in MIDDLEWARE so the whole
+    stack is timed. Works in both modes, so it doesn't pin ASGI requests to
+    a thread.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            # How Django's MiddlewareMixin marks itself async
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        stats = _RequestStats()
+        token = _current.set(stats)
+        start = time.perf_counter()
+        try:
+            with counting_queries():
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.record(request, response, stats, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        stats = _RequestStats()
+        token = _current.set(stats)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.record(request, response, stats, time.perf_counter() - start)
+        return response
+
+    def record(self, request, response, stats, elapsed):
+        match = request.resolver_match
+        # Unmatched paths share a label so scanners can't blow up the series
+        labels = (("route", match.route if match else "unmatched"), ("method", request.method))
+        registry.inc("credity_http_requests_total", labels + (("status", response.status_code),))
+        registry.observe("credity_http_request_duration_seconds", labels, elapsed)
+        registry.observe("credity_db_queries_per_request", labels, stats.queries)
+        registry.inc("credity_db_query_duration_seconds_total", labels, stats.query_seconds)
+        for phase, (calls, seconds) in stats.phases.items():
+            registry.inc("credity_request_phase_calls_total", labels + (("phase", phase),), calls)
+            registry.inc("credity_request_phase_seconds_total", labels + (("phase", phase),), seconds)
+        if not response.streaming:
+            registry.observe("credity_http_response_size_bytes", labels, len(response.content))
+
+        config = settings.METRICS
+        if registry.flush_due(config["FLUSH_INTERVAL"]):
+            registry.flush(get_directory())
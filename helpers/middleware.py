@@ -0,0 +1,86 @@
+"""
+Django's middleware, without the trips to a thread under ASGI.
+
+In async mode Django 4.0's MiddlewareMixin runs each process_request() and
+process_response() with sync_to_async(), two thread hand-offs per
+middleware and request, whether or not the hook can block. The hooks of
+these middleware only read and set headers and attributes, so here they
+run on the event loop. The exceptions are the ones that touch the session
+or store messages, which go to a thread when a request actually needs them.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import middleware as auth
+from django.contrib.messages import middleware as messages
+from django.contrib.sessions import middleware as sessions
+from django.middleware import clickjacking, common, csrf, security
+
+
+class InlineMiddlewareMixin:
+    """
+    For MiddlewareMixin subclasses whose hooks don't block, except when
+    request_blocks() or response_blocks() say so.
+    """
+
+    def request_blocks(self, request):
+        return False
+
+    def response_blocks(self, request, response):
+        return False
+
+    async def __acall__(self, request):
+        response = None
+        if hasattr(self, "process_request"):
+            if self.request_blocks(request):
+                response = await sync_to_async(self.process_request, thread_sensitive=True)(request)
+            else:
+                response = self.process_request(request)
+        response = response or await self.get_response(request)
+        if hasattr(self, "process_response"):
+            if self.response_blocks(request, response):
+                response = await sync_to_async(self.process_response, thread_sensitive=True)(request, response)
+            else:
+                response = self.process_response(request, response)
+        return response
+
+
+class SecurityMiddleware(InlineMiddlewareMixin, security.SecurityMiddleware):
+    pass
+
+
+class SessionMiddleware(InlineMiddlewareMixin, sessions.SessionMiddleware):
+
+    def response_blocks(self, request, response):
+        # The session is loaded lazily, so one that wasn't read can't be saved
+        return request.session.accessed
+
+
+class CommonMiddleware(InlineMiddlewareMixin, common.CommonMiddleware):
+    pass
+
+
+class CsrfViewMiddleware(InlineMiddlewareMixin, csrf.CsrfViewMiddleware):
+    """
+    With CSRF_USE_SESSIONS the token is kept in the session.
+    """
+
+    def request_blocks(self, request):
+        return settings.CSRF_USE_SESSIONS
+
+    def response_blocks(self, request, response):
+        return settings.CSRF_USE_SESSIONS and request.META.get("CSRF_COOKIE_NEEDS_UPDATE", False)
+
+
+class AuthenticationMiddleware(InlineMiddlewareMixin, auth.AuthenticationMiddleware):
+    pass
+
+
+class MessageMiddleware(InlineMiddlewareMixin, messages.MessageMiddleware):
+
+    def response_blocks(self, request, response):
+        storage = getattr(request, "_messages", None)
+        return storage is not None and (storage.used or storage.added_new)
+
+
+class XFrameOptionsMiddleware(InlineMiddlewareMixin, clickjacking.XFrameOptionsMiddleware):
+    pass
@@ -1,10 +1,22 @@
 from django.db import models
 
 
+class TrackingQuerySet(models.QuerySet):
+
+    def unordered(self):
+        """
+        Drop the default ordering, for internal queries (exports, batch jobs)
+        that don't need it and shouldn't pay for the sort.
+        """
+        return self.order_by()
+
+
 class TrackingModel(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = TrackingQuerySet.as_manager()
+
     class Meta:
         abstract = True
-        ordering = ('-created_at',)
\ No newline at end of file
+        ordering = ('-created_at',)
@@ -0,0 +1,27 @@
+import io
+
+import orjson
+from django.conf import settings
+from rest_framework.parsers import JSONParser
+
+from helpers.renderers import ORJSONRenderer
+
+
+class ORJSONParser(JSONParser):
+    """
+    JSONParser on orjson. Bodies orjson refuses are handed to JSONParser, to
+    raise its usual ParseError. Unlike json, orjson reads integers past 64
+    bits as floats; nothing we accept is a number that big.
+    """
+
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+
+        body = stream.read()
+        try:
+            return orjson.loads(body if encoding.lower().replace("-", "") == "utf8" else body.decode(encoding))
+        except (orjson.JSONDecodeError, UnicodeDecodeError):
+            return super().parse(io.BytesIO(body), media_type, parser_context)
@@ -0,0 +1,36 @@
+import orjson
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+
+
+_encoder = encoders.JSONEncoder()
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer on orjson: the same compact UTF-8 output, in a fraction of
+    the time. Datetimes and anything orjson doesn't know go through DRF's
+    encoder so they come out as before; indented output is always two
+    spaces.
+    """
+
+    options = orjson.OPT_PASSTHROUGH_DATETIME
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+
+        option = self.options
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            option |= orjson.OPT_INDENT_2
+        try:
+            ret = orjson.dumps(data, default=_encoder.default, option=option)
+        except orjson.JSONEncodeError:
+            # Non-string keys, integers past 64 bits, ...
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Like JSONRenderer, escape the two characters JSON allows in strings
+        # but javascript doesn't
+        if b"\xe2\x80\xa8" in ret or b"\xe2\x80\xa9" in ret:
+            ret = ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
+        return ret
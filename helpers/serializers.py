@@ -0,0 +1,68 @@
+from operator import attrgetter
+
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework import fields as drf_fields
+from rest_framework import relations, serializers
+
+
+# Fields whose to_representation() is a plain conversion of the value
+_CONVERSIONS = {
+    drf_fields.CharField.to_representation: str,
+    drf_fields.IntegerField.to_representation: int,
+}
+
+
+class CompiledSerializerMixin:
+    """
+    For read-only serializers on hot paths. The first time the class
+    serializes anything, its fields are compiled into a list of (name,
+    getter, conversion) steps, and every representation after that is a loop
+    over them instead of Serializer.to_representation()'s per field
+    get_attribute()/to_representation() calls. The output is the same.
+
+    Every field must be read-only, and plain: nested serializers, related
+    and method fields need the serializer at hand and can't be compiled.
+    Instances missing an attribute take the regular path, which knows what
+    to do about it.
+    """
+
+    @classmethod
+    def compiled(cls):
+        steps = cls.__dict__.get("_compiled_steps")
+        if steps is None:
+            steps = cls._compiled_steps = cls._compile()
+        return steps
+
+    @classmethod
+    def _compile(cls):
+        model = getattr(getattr(cls, "Meta", None), "model", None)
+        steps = []
+        for name, field in cls().fields.items():
+            if field.write_only:
+                continue
+            if not field.read_only:
+                raise ImproperlyConfigured(f"{cls.__name__}.{name} isn't read-only, {cls.__name__} can't be compiled")
+            if isinstance(field, (serializers.BaseSerializer, relations.RelatedField, relations.ManyRelatedField,
+                                  drf_fields.SerializerMethodField)):
+                raise ImproperlyConfigured(f"{cls.__name__}.{name} can't be compiled, it's a {type(field).__name__}")
+
+            getter = field.get_attribute
+            if model is not None and len(field.source_attrs) == 1:
+                attribute = getattr(model, field.source_attrs[0], None)
+                # Methods are called by get_attribute(), properties and
+                # model fields are just read
+                if not callable(attribute) or isinstance(attribute, type):
+                    getter = attrgetter(field.source_attrs[0])
+            convert = _CONVERSIONS.get(type(field).to_representation, field.to_representation)
+            steps.append((name, getter, convert))
+        return steps
+
+    def to_representation(self, instance):
+        ret = {}
+        try:
+            for name, getter, convert in self.compiled():
+                value = getter(instance)
+                ret[name] = None if value is None else convert(value)
+        except (AttributeError, drf_fields.SkipField):
+            return super().to_representation(instance)
+        return ret
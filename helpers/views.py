@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.crypto import constant_time_compare
+from rest_framework import permissions
+from rest_framework.views import APIView
+
+from helpers import metrics
+
+
+class IsInternalRequest(permissions.BasePermission):
+    """
+    Requests from METRICS["ALLOWED_IPS"], or carrying METRICS["TOKEN"] in
+    an X-Metrics-Token header.
+    """
+
+    def has_permission(self, request, view):
+        config = settings.METRICS
+        if request.META.get("REMOTE_ADDR") in config["ALLOWED_IPS"]:
+            return True
+        token = request.META.get("HTTP_X_METRICS_TOKEN")
+        return bool(config["TOKEN"] and token and constant_time_compare(token, config["TOKEN"]))
+
+
+class MetricsView(APIView):
+
+    permission_classes = (permissions.IsAdminUser | IsInternalRequest,)
+
+    def get(self, request):
+        return HttpResponse(metrics.render(metrics.collect()), content_type="text/plain; version=0.0.4; charset=utf-8")